@@ -1,12 +1,19 @@
-import pandas as pd
+import os
+
 import streamlit as st
 from utils import load_css
 
 from dapgpt.agent import DataAnalysisAgent
+from dapgpt.outofcore import open_upload
+from dapgpt.prefetch import profile_prefetcher
+from dapgpt.profile import profile_cache
+from dapgpt.uploads import upload_cache
 
 # from src.agent import DataAnalysisAgent
 
 st.set_page_config(page_title="AI Data Analyst", layout="wide")
+# Uploads larger than this are queried on disk with DuckDB instead of being loaded into pandas
+OUT_OF_CORE_BYTES = int(os.getenv("DAPGPT_OUT_OF_CORE_MB", "256")) << 20
 # st.markdown(load_css(), unsafe_allow_html=True)
 
 
@@ -16,12 +23,31 @@ def main():
     # File upload
     uploaded_file = st.file_uploader("Upload your CSV file", type=["csv"])
 
+    # A changed or removed upload cancels the profiling started for the previous one
+    prefetch = st.session_state.get("profile_prefetch")
+    file_id = uploaded_file.file_id if uploaded_file is not None else None
+    if prefetch is not None and prefetch[0] != file_id:
+        profile_prefetcher.cancel(prefetch[1])
+        del st.session_state["profile_prefetch"]
+
     if uploaded_file is not None:
-        # Read and display the data
-        df = pd.read_csv(uploaded_file)
+        if uploaded_file.size > OUT_OF_CORE_BYTES:
+            # Spooled to disk and profiled with streaming SQL; the preview is a LIMIT query
+            df = open_upload(uploaded_file)
+            st.caption(f"Large file: {df.shape[0]:,} rows analyzed out of core")
+        else:
+            # Parsed and compacted once per distinct file, shared across reruns and sessions; read-only
+            df = upload_cache.load(uploaded_file)
+            if (report := upload_cache.report(uploaded_file)) is not None:
+                st.caption(f"Memory: {report}")
         st.subheader("Data Preview")
         st.dataframe(df.head())
 
+        # Profile the data in the background while the user types the question
+        agent = DataAnalysisAgent()
+        if "profile_prefetch" not in st.session_state:
+            st.session_state["profile_prefetch"] = (file_id, profile_prefetcher.submit(agent, df))
+
         # User query input
         user_query = st.text_area(
             "What would you like to know about your data?",
@@ -31,17 +57,23 @@ def main():
 
         if st.button("Analyze"):
             if user_query:
-                with st.spinner("Analyzing your data..."):
-                    # Initialize agent and get response
-                    agent = DataAnalysisAgent()
-                    response = agent.analyze(df, user_query)
-
-                    # Display response
-                    st.subheader("Analysis Results")
-                    st.write(response)
+                # Await the prefetched profile and stream the response as it is generated
+                profile = profile_prefetcher.result(st.session_state["profile_prefetch"][1])
+                st.subheader("Analysis Results")
+                st.write_stream(agent.analyze_stream(df, user_query, profile=profile))
+                if agent.last_context is not None:
+                    st.caption(
+                        f"Prompt context: {agent.last_context.tokens} tokens "
+                        f"({agent.last_context.saved_tokens} saved by compact encoding)"
+                    )
             else:
                 st.warning("Please enter a query about your data.")
 
+        # Profile, prefetch and upload cache counters
+        st.sidebar.json(profile_cache.stats(), expanded=False)
+        st.sidebar.json(profile_prefetcher.stats(), expanded=False)
+        st.sidebar.json(upload_cache.stats(), expanded=False)
+
 
 if __name__ == "__main__":
     main()
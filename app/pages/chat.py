@@ -1,23 +1,41 @@
 import streamlit as st
-from langchain.chat_models import ChatOpenAI
-from langchain.schema import AIMessage, HumanMessage, SystemMessage
 from utils import load_css
 
+from dapgpt.cache import make_key, normalize_query, response_cache
+from dapgpt.history import ChatHistory, llm_summarizer
+from dapgpt.lazy import lazy_import
+
+# LangChain is imported when the page first talks to the model, not when the app starts
+chat_models = lazy_import("langchain.chat_models")
+schema = lazy_import("langchain.schema")
+
 # st.markdown(load_css(), unsafe_allow_html=True)
 
 
 def init_chat():
-    if "messages" not in st.session_state:
-        st.session_state.messages = [SystemMessage(content="You are a helpful AI data analysis assistant.")]
+    if "history" not in st.session_state:
+        # Only the recent turns plus a running summary of older ones are sent to the model
+        summarizer = llm_summarizer(chat_models.ChatOpenAI(temperature=0, model_name="gpt-3.5-turbo"))
+        st.session_state.history = ChatHistory("You are a helpful AI data analysis assistant.", summarizer)
+        st.session_state.prompt_tokens = []
+
+
+def display_prompt_metrics():
+    tokens = st.session_state.get("prompt_tokens", [])
+    if tokens:
+        delta = tokens[-1] - tokens[-2] if len(tokens) > 1 else None
+        st.sidebar.metric("Prompt tokens (last turn)", tokens[-1], delta=delta, delta_color="inverse")
+        st.sidebar.line_chart(tokens)
 
 
 def display_chat_history():
-    messages = st.session_state.get("messages", [])
+    history = st.session_state.get("history")
+    messages = history.messages if history else []
     for message in messages:
-        if isinstance(message, AIMessage):
+        if isinstance(message, schema.AIMessage):
             with st.chat_message("assistant"):
                 st.markdown(message.content)
-        elif isinstance(message, HumanMessage):
+        elif isinstance(message, schema.HumanMessage):
             with st.chat_message("user"):
                 st.markdown(message.content)
 
@@ -30,11 +48,15 @@ def chat_page():
 
     # Display chat history
     display_chat_history()
+    display_prompt_metrics()
 
     # Chat input
     if prompt := st.chat_input("Ask me anything about data analysis..."):
         # Add user message to chat history
-        st.session_state.messages.append(HumanMessage(content=prompt))
+        history = st.session_state.history
+        history.append(schema.HumanMessage(content=prompt))
+        messages = history.prompt_messages()
+        st.session_state.prompt_tokens.append(history.prompt_tokens())
 
         # Display user message
         with st.chat_message("user"):
@@ -42,11 +64,22 @@ def chat_page():
 
         # Generate AI response
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                llm = ChatOpenAI(temperature=0, model_name="gpt-3.5-turbo")
-                response = llm(st.session_state.messages)
-                st.session_state.messages.append(AIMessage(content=response.content))
-                st.markdown(response.content)
+            llm = chat_models.ChatOpenAI(temperature=0, model_name="gpt-3.5-turbo", streaming=True)
+            # Identical conversations (up to whitespace) are answered from the cache
+            key = make_key(
+                "chat",
+                llm.model_name,
+                llm.temperature,
+                [(message.type, normalize_query(message.content)) for message in messages],
+            )
+            response = response_cache.get(key)
+            if response is not None:
+                st.markdown(response)
+            else:
+                # Render tokens as they arrive; write_stream returns the full text once done
+                response = st.write_stream(llm.stream(messages))
+                response_cache.put(key, response)
+            history.append(schema.AIMessage(content=response))
 
 
 if __name__ == "__main__":
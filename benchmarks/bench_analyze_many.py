@@ -0,0 +1,53 @@
+"""Throughput of DataAnalysisAgent.analyze_many against the local mock server"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import pandas as pd
+
+from benchmarks.mock_openai import MockSettings, base_url, start_server
+from dapgpt.agent import DataAnalysisAgent
+
+
+def parse_user_args():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent batch analysis")
+    parser.add_argument("--requests", type=int, default=100, help="Number of (df, query) pairs")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16], help="Worker counts to compare")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock response latency in seconds")
+    parser.add_argument("--rate-limit-prob", type=float, default=0.05, help="Probability of a mock 429")
+    parser.add_argument("--rpm", type=float, default=6000, help="Requests-per-minute budget")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_user_args()
+    settings = MockSettings(latency=args.latency, tokens=50, rate_limit_prob=args.rate_limit_prob)
+    server = start_server(settings)
+    os.environ["OPENAI_BASE_URL"] = base_url(server)
+    os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+    df = pd.DataFrame({"a": range(1000), "b": [i * 0.5 for i in range(1000)]})
+    items = [(df, f"question {i}") for i in range(args.requests)]
+    # No response cache: every worker count must send its requests to the mock server
+    agent = DataAnalysisAgent(response_cache=None)
+
+    results = []
+    for workers in args.workers:
+        settings.requests = settings.rate_limited = 0
+        start = time.perf_counter()
+        answers = asyncio.run(agent.analyze_many(items, max_workers=workers, requests_per_minute=args.rpm))
+        elapsed = time.perf_counter() - start
+        results.append({
+            "workers": workers,
+            "requests": len(items),
+            "errors": sum(a.answer.startswith("Error during analysis") for a in answers),
+            "rate_limited": settings.rate_limited,
+            "seconds": round(elapsed, 3),
+            "throughput_rps": round(len(items) / elapsed, 2),
+        })
+
+    print(json.dumps(results, indent=2))
+    server.shutdown()
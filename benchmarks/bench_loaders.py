@@ -0,0 +1,51 @@
+"""Ingestion throughput (rows/s) per storage backend and load path on synthetic extracts"""
+
+import argparse
+import json
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from benchmarks.synthetic import write_dataset
+from scripts import load_to_duckdb, load_to_sqlite
+
+LOADERS: dict[str, tuple[str, Callable[..., int]]] = {
+    "duckdb-native": ("duckdb", load_to_duckdb.load_dataset_native),
+    "duckdb-arrow": ("duckdb", load_to_duckdb.load_dataset),
+    "sqlite": ("sqlite", load_to_sqlite.load_dataset),
+}
+
+
+def parse_user_args():
+    parser = argparse.ArgumentParser(description="Benchmark loader throughput per backend")
+    parser.add_argument("--rows", type=int, default=200_000, help="Rows of synthetic data per dataset")
+    parser.add_argument("--repeat", type=int, default=3, help="Loads per backend; the best run is reported")
+    parser.add_argument("--loaders", nargs="+", choices=sorted(LOADERS), default=sorted(LOADERS), help="Load paths")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_user_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        csv_paths = {dataset: write_dataset(dataset, args.rows, workdir) for dataset in ("amazon", "zomato")}
+        for name in args.loaders:
+            suffix, load = LOADERS[name]
+            for dataset, csv_path in csv_paths.items():
+                timings, rows = [], 0
+                for i in range(args.repeat):
+                    start = time.perf_counter()
+                    rows = load(dataset, csv_path, workdir / f"{name}-{i}.{suffix}")
+                    timings.append(time.perf_counter() - start)
+                results.append({
+                    "loader": name,
+                    "dataset": dataset,
+                    "rows": rows,
+                    "seconds": round(min(timings), 3),
+                    "rows_per_s": round(rows / min(timings)),
+                })
+
+    print(json.dumps(results, indent=2))
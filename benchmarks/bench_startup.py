@@ -0,0 +1,149 @@
+"""Cold-start import time per entry point, failing on regressions
+
+Each entry point's top-level imports (not the rest of the module, which would start the
+app or call an LLM) run in fresh interpreters under `python -X importtime`. The median
+import time and the heaviest imports are reported, and the run fails when an entry point
+imports a dependency it must defer, or gets slower than a baseline written by an earlier run:
+
+    uv run python -m benchmarks.bench_startup --output benchmarks/results/startup.json
+    uv run python -m benchmarks.bench_startup --baseline benchmarks/results/startup.json
+"""
+
+import argparse
+import ast
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+ENTRY_POINTS = {
+    "app": "app/app.py",
+    "chat": "app/pages/chat.py",
+    "sql_agent": "scripts/udemy_pdic_sqlagent.py",
+    "pandas_agent": "scripts/udemy_pdic_pdagent.py",
+    "sql_interactions": "scripts/llm_sql_interactions.py",
+}
+
+# Heavy dependencies an entry point must not import at startup; dapgpt imports them lazily
+DEFERRED = {
+    "app": ["openai", "pandas", "pyarrow", "duckdb", "tiktoken", "langchain_core"],
+    "chat": ["langchain", "langchain_core", "openai"],
+}
+
+
+def entry_imports(path: Path) -> str:
+    """The module-level import statements of a file, as code to run on their own"""
+    tree = ast.parse(path.read_text())
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, ast.Import | ast.ImportFrom))
+
+
+def importtime(code: str) -> list[tuple[int, int, str]]:
+    """(depth, cumulative µs, module) of every import `code` makes, as reported by -X importtime"""
+    # Streamlit puts the main script's directory on the path, for pages too
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([str(ROOT / "src"), str(ROOT / "app"), str(ROOT)])}
+    process = subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if process.returncode:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1])
+    imports = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name[1:]
+        imports.append(((len(name) - len(name.lstrip())) // 2, int(cumulative), name.strip()))
+    return imports
+
+
+def measure(path: Path, repeat: int, startup: set[str]) -> dict:
+    """Median import time of an entry point and its heaviest top-level imports"""
+    code = entry_imports(path)
+    totals = []
+    for _ in range(repeat):
+        imports = importtime(code)
+        # Interpreter startup (site, encodings, .pth files) is the same for every entry point
+        top = {name: us for depth, us, name in imports if depth == 0 and name not in startup}
+        totals.append(sum(top.values()) / 1000)
+    heaviest = sorted(top.items(), key=lambda item: item[1], reverse=True)[:5]
+    return {
+        "import_ms": round(statistics.median(totals), 1),
+        "min_ms": round(min(totals), 1),
+        "heaviest_ms": {name: round(us / 1000, 1) for name, us in heaviest},
+        "modules": sorted({name for _, _, name in imports}),
+    }
+
+
+def check(results: dict, baseline: dict | None, threshold: float, slack_ms: float) -> list[str]:
+    """Deferred dependencies imported at startup, and import times beyond the baseline"""
+    failures = []
+    for entry, result in results.items():
+        loaded = {module.split(".")[0] for module in result["modules"]}
+        for module in DEFERRED.get(entry, []):
+            if module in loaded:
+                failures.append(f"{entry}: imports {module} at startup")
+        base = (baseline or {}).get("results", {}).get(entry)
+        if base is None:
+            continue
+        allowed = base["import_ms"] * (1 + threshold) + slack_ms
+        if result["import_ms"] > allowed:
+            failures.append(f"{entry}: {base['import_ms']} ms -> {result['import_ms']} ms (allowed {allowed:.1f} ms)")
+    return failures
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()  # noqa: S603, S607
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def parse_user_args():
+    parser = argparse.ArgumentParser(description="Benchmark cold-start import time per entry point")
+    parser.add_argument("--entries", nargs="+", choices=sorted(ENTRY_POINTS), default=list(ENTRY_POINTS))
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per entry point; the median is kept")
+    parser.add_argument("--baseline", type=Path, default=None, help="Results JSON of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.20, help="Allowed relative regression")
+    parser.add_argument("--slack-ms", type=float, default=20.0, help="Allowed absolute regression on top, for noise")
+    parser.add_argument("--output", type=Path, default=None, help="Where to write the JSON results")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_user_args()
+
+    startup = {name for depth, _, name in importtime("pass") if depth == 0}
+    results = {}
+    errors = []
+    print(f"{'entry':<18}{'median ms':>10}{'min ms':>10}  heaviest imports")
+    for entry in args.entries:
+        try:
+            results[entry] = measure(ROOT / ENTRY_POINTS[entry], args.repeat, startup)
+        except RuntimeError as e:
+            errors.append(f"{entry}: import failed: {e}")
+            print(f"{entry:<18}{'failed':>10}")
+            continue
+        heaviest = ", ".join(f"{name} {ms}" for name, ms in results[entry]["heaviest_ms"].items())
+        print(f"{entry:<18}{results[entry]['import_ms']:>10}{results[entry]['min_ms']:>10}  {heaviest}")
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "results": results,
+    }
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2))
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+    failures = errors + check(results, baseline, args.threshold, args.slack_ms)
+    if failures:
+        print("\nRegressions:\n" + "\n".join(failures))
+        sys.exit(1)
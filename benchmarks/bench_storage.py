@@ -0,0 +1,55 @@
+"""Agent-style query latency on a DuckDB table vs. date-partitioned Parquet behind a view"""
+
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import duckdb
+
+from benchmarks.synthetic import write_dataset
+from dapgpt.duckdb_pool import configure_duckdb
+from scripts.load_to_duckdb import load_dataset_native
+
+QUERIES = {
+    "entries_per_date": "SELECT order_date, COUNT(*) AS entries FROM amazon GROUP BY order_date ORDER BY order_date",
+    "one_day_avg": "SELECT AVG(delivery_time) FROM amazon WHERE order_date = DATE '2022-03-01'",
+    "one_week_by_category": """
+        SELECT category, COUNT(*), AVG(agent_rating) FROM amazon
+        WHERE order_date BETWEEN DATE '2022-03-01' AND DATE '2022-03-07' GROUP BY category
+    """,
+    "full_row_lookup": "SELECT * FROM amazon WHERE order_date = DATE '2022-03-01' AND order_id = 'ord000000042'",
+}
+
+
+def parse_user_args():
+    parser = argparse.ArgumentParser(description="Benchmark query latency per storage layout")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows of synthetic amazon data")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per query; the median is reported")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_user_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        csv_path = write_dataset("amazon", args.rows, workdir)
+        for layout in ("table", "parquet"):
+            db_path = workdir / f"{layout}.duckdb"
+            load_dataset_native("amazon", csv_path, db_path, layout=layout, parquet_dir=workdir / "parquet")
+            con = duckdb.connect(str(db_path), read_only=True)
+            configure_duckdb(con)
+            for name, query in QUERIES.items():
+                timings = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    con.execute(query).fetchall()
+                    timings.append(time.perf_counter() - start)
+                results.append({"layout": layout, "query": name, "median_ms": round(statistics.median(timings) * 1000, 2)})
+            con.close()
+
+    print(json.dumps(results, indent=2))
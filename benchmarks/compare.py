@@ -0,0 +1,47 @@
+"""Compare two benchmark result files and fail on regressions
+
+    uv run python -m benchmarks.compare benchmarks/results/base.json benchmarks/results/head.json
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Metric -> whether a larger value is better
+METRICS = {"p50_ms": False, "p95_ms": False, "throughput_per_s": True, "peak_rss_mb": False}
+
+
+def compare(base: dict, head: dict, threshold: float) -> list[str]:
+    """Print a per-case table and return the regressions beyond `threshold` (relative change)"""
+    regressions = []
+    print(f"{'case':<16}{'metric':<18}{'base':>12}{'head':>12}{'change':>10}")
+    for case, head_metrics in head["results"].items():
+        base_metrics = base["results"].get(case)
+        if base_metrics is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old, new = base_metrics[metric], head_metrics[metric]
+            change = (new - old) / old if old else 0.0
+            worse = -change if higher_is_better else change
+            flag = " !" if worse > threshold else ""
+            print(f"{case:<16}{metric:<18}{old:>12}{new:>12}{change:>+10.1%}{flag}")
+            if worse > threshold:
+                regressions.append(f"{case}.{metric}: {old} -> {new} ({change:+.1%})")
+    return regressions
+
+
+def parse_user_args():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("base", type=Path, help="Baseline results JSON")
+    parser.add_argument("head", type=Path, help="Candidate results JSON")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative regression")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_user_args()
+    regressions = compare(json.loads(args.base.read_text()), json.loads(args.head.read_text()), args.threshold)
+    if regressions:
+        print("\nRegressions:\n" + "\n".join(regressions))
+        sys.exit(1)
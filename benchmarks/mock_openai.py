@@ -0,0 +1,131 @@
+"""Local stand-in for the OpenAI chat-completions endpoint, used by the benchmarks"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockSettings:
+    def __init__(
+        self,
+        latency: float = 0.5,
+        tokens: int = 200,
+        rate_limit_prob: float = 0.0,
+        content: str | None = None,
+    ):
+        self.latency = latency
+        self.tokens = tokens
+        # Fixed reply text (e.g. a SQL query for the SQL chains) instead of `tokens` filler words
+        self.content = content
+        self.rate_limit_prob = rate_limit_prob
+        self.requests = 0
+        self.rate_limited = 0
+        self.lock = threading.Lock()
+
+
+def make_handler(settings: MockSettings) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):  # noqa: A002
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            with settings.lock:
+                settings.requests += 1
+                limited = random.random() < settings.rate_limit_prob  # noqa: S311
+                settings.rate_limited += limited
+
+            if limited:
+                self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests"}}, {"retry-after": "0.05"})
+                return
+
+            time.sleep(settings.latency)
+            if settings.content is not None:
+                words = settings.content.split(" ")
+            else:
+                words = ["token"] * min(settings.tokens, body.get("max_tokens") or settings.tokens)
+            prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+            if body.get("stream"):
+                self._send_stream(body.get("model", "mock"), words)
+            else:
+                self._send_json(
+                    200,
+                    {
+                        "id": "chatcmpl-mock",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": body.get("model", "mock"),
+                        "choices": [
+                            {
+                                "index": 0,
+                                "message": {"role": "assistant", "content": " ".join(words)},
+                                "finish_reason": "stop",
+                            }
+                        ],
+                        "usage": {
+                            "prompt_tokens": prompt_tokens,
+                            "completion_tokens": len(words),
+                            "total_tokens": prompt_tokens + len(words),
+                        },
+                    },
+                )
+
+        def _send_json(self, status: int, payload: dict, headers: dict | None = None):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_stream(self, model: str, words: list[str]):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for i, word in enumerate(words):
+                chunk = {
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": word if i == 0 else f" {word}"}, "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+
+    return Handler
+
+
+def start_server(settings: MockSettings, port: int = 0) -> ThreadingHTTPServer:
+    """Start the mock server on a background thread and return it (base URL via server_address)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(settings))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def base_url(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/v1"
+
+
+def parse_user_args():
+    parser = argparse.ArgumentParser(description="Run a mock OpenAI chat-completions server")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds to wait before responding")
+    parser.add_argument("--tokens", type=int, default=200, help="Completion tokens per response")
+    parser.add_argument("--rate-limit-prob", type=float, default=0.0, help="Probability of answering with a 429")
+    parser.add_argument("--content", type=str, default=None, help="Fixed reply text instead of filler tokens")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_user_args()
+    server = start_server(MockSettings(args.latency, args.tokens, args.rate_limit_prob, args.content), args.port)
+    print(f"Mock OpenAI server listening on {base_url(server)}")
+    threading.Event().wait()
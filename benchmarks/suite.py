@@ -0,0 +1,175 @@
+"""Offline end-to-end benchmarks: agent, SQL chain and loaders against synthetic data and a mock OpenAI server
+
+Each case runs in its own subprocess so peak RSS is measured per case. Results are written
+as JSON that `benchmarks.compare` can diff across commits:
+
+    uv run python -m benchmarks.suite --rows 100000 --output benchmarks/results/base.json
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from benchmarks.mock_openai import MockSettings, base_url, start_server
+from benchmarks.synthetic import make_amazon, write_dataset
+
+SQL_REPLY = "SELECT order_date, COUNT(*) AS entries FROM amazon GROUP BY order_date ORDER BY order_date"
+
+
+def _start_mock(args: argparse.Namespace, content: str | None = None) -> str:
+    server = start_server(MockSettings(latency=args.latency, tokens=args.tokens, content=content))
+    url = base_url(server)
+    os.environ["OPENAI_BASE_URL"] = url
+    os.environ.setdefault("OPENAI_API_KEY", "mock")
+    return url
+
+
+def case_agent_analyze(args: argparse.Namespace, workdir: Path) -> Callable[[], object]:
+    from dapgpt.agent import DataAnalysisAgent
+
+    _start_mock(args)
+    df = make_amazon(args.rows)
+    agent = DataAnalysisAgent(response_cache=None)
+    return lambda: agent.analyze(df, "What drives delivery time?")
+
+
+def case_sql_chain(args: argparse.Namespace, workdir: Path) -> Callable[[], object]:
+    from langchain_openai import ChatOpenAI
+
+    from dapgpt.sqlchain import build_sql_answer_chain
+    from dapgpt.sqldb import open_sql_database
+    from scripts.load_to_duckdb import load_dataset
+
+    url = _start_mock(args, content=SQL_REPLY)
+    db_path = workdir / "bench.duckdb"
+    load_dataset("amazon", write_dataset("amazon", args.rows, workdir), db_path)
+    db = open_sql_database(f"duckdb:///{db_path}")
+    chain = build_sql_answer_chain(ChatOpenAI(model="gpt-3.5-turbo", temperature=0, base_url=url, api_key="mock"), db)
+    return lambda: chain.invoke({"question": "How many entries per date in the amazon table?"})
+
+
+def _loader_case(
+    module: str, suffix: str, loader: str = "load_dataset"
+) -> Callable[[argparse.Namespace, Path], Callable[[], object]]:
+    def case(args: argparse.Namespace, workdir: Path) -> Callable[[], object]:
+        load_dataset = getattr(importlib.import_module(f"scripts.{module}"), loader)
+        csv_paths = {dataset: write_dataset(dataset, args.rows, workdir) for dataset in ("amazon", "zomato")}
+        runs = iter(range(sys.maxsize))
+
+        def run() -> None:
+            db_path = workdir / f"load_{next(runs)}.{suffix}"
+            for dataset, csv_path in csv_paths.items():
+                load_dataset(dataset, csv_path, db_path)
+
+        return run
+
+    return case
+
+
+def case_load_noop(args: argparse.Namespace, workdir: Path) -> Callable[[], object]:
+    from scripts.load_to_duckdb import load_dataset_native
+
+    db_path = workdir / "noop.duckdb"
+    csv_paths = {dataset: write_dataset(dataset, args.rows, workdir) for dataset in ("amazon", "zomato")}
+    for dataset, csv_path in csv_paths.items():
+        load_dataset_native(dataset, csv_path, db_path)
+    # Re-running an incremental load on unchanged input should only consult the manifest
+    return lambda: [load_dataset_native(dataset, csv_path, db_path) for dataset, csv_path in csv_paths.items()]
+
+
+CASES = {
+    "agent_analyze": case_agent_analyze,
+    "sql_chain": case_sql_chain,
+    "load_duckdb": _loader_case("load_to_duckdb", "duckdb"),
+    "load_duckdb_native": _loader_case("load_to_duckdb", "duckdb", "load_dataset_native"),
+    "load_noop": case_load_noop,
+    "load_sqlite": _loader_case("load_to_sqlite", "sqlite"),
+}
+
+
+def run_case(name: str, args: argparse.Namespace) -> dict:
+    """Run one case in the current process and summarize its latencies"""
+    with tempfile.TemporaryDirectory() as tmp:
+        run = CASES[name](args, Path(tmp))
+        for _ in range(args.warmup):
+            run()
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            t0 = time.perf_counter()
+            run()
+            latencies.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - start
+
+    quantiles = statistics.quantiles(latencies, n=20, method="inclusive") if len(latencies) > 1 else latencies * 19
+    return {
+        "iterations": args.iterations,
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p95_ms": round(quantiles[18] * 1000, 3),
+        "throughput_per_s": round(args.iterations / elapsed, 3),
+        # ru_maxrss is reported in KiB on Linux and bytes on macOS
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024**2 if sys.platform == "darwin" else 1024), 1
+        ),
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()  # noqa: S603, S607
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def parse_user_args():
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=sorted(CASES), help="Cases to run")
+    parser.add_argument("--rows", type=int, default=50_000, help="Rows of synthetic data per dataset")
+    parser.add_argument("--iterations", type=int, default=10, help="Timed iterations per case")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed iterations per case")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock LLM latency in seconds")
+    parser.add_argument("--tokens", type=int, default=200, help="Mock LLM completion tokens")
+    parser.add_argument("--output", type=Path, default=None, help="Where to write the JSON results")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_user_args()
+
+    if args.child:
+        print(json.dumps(run_case(args.cases[0], args)))
+        sys.exit(0)
+
+    results = {}
+    for name in args.cases:
+        cmd = [sys.executable, "-m", "benchmarks.suite", "--child", "--cases", name]
+        for option in ("rows", "iterations", "warmup", "latency", "tokens"):
+            cmd += [f"--{option}", str(getattr(args, option))]
+        print(f"🚀 Running {name}...", file=sys.stderr)
+        output = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout  # noqa: S603
+        results[name] = json.loads(output.strip().splitlines()[-1])
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "rows": args.rows,
+        "mock_latency_s": args.latency,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text)
+    print(text)
@@ -0,0 +1,87 @@
+"""Synthetic amazon / zomato extracts with the same raw CSV layout as the Kaggle downloads"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+WEATHER = ["Sunny", "Stormy", "Sandstorms", "Cloudy", "Fog", "Windy"]
+TRAFFIC = ["Low", "Medium", "High", "Jam"]
+VEHICLES = ["motorcycle", "scooter", "van", "bicycle"]
+AREAS = ["Urban", "Metropolitian", "Semi-Urban", "Other"]
+CATEGORIES = ["Clothing", "Electronics", "Sports", "Cosmetics", "Toys", "Snacks", "Grocery", "Books"]
+ORDER_TYPES = ["Snack", "Meal", "Drinks", "Buffet"]
+CITIES = ["Urban", "Metropolitian", "Semi-Urban"]
+
+
+def _times(rng: np.random.Generator, n: int) -> pd.Series:
+    minutes = rng.integers(8 * 60, 23 * 60, n)
+    return pd.Series([f"{m // 60:02d}:{m % 60:02d}" for m in minutes])
+
+
+def _dates(rng: np.random.Generator, n: int) -> pd.DatetimeIndex:
+    return pd.Timestamp("2022-02-11") + pd.to_timedelta(rng.integers(0, 60, n), unit="D")
+
+
+def make_amazon(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Order_ID": [f"ord{i:09d}" for i in range(n)],
+        "Agent_Age": rng.integers(20, 40, n),
+        "Agent_Rating": rng.uniform(2.5, 5, n).round(1),
+        "Store_Latitude": rng.uniform(10, 30, n),
+        "Store_Longitude": rng.uniform(70, 90, n),
+        "Drop_Latitude": rng.uniform(10, 30, n),
+        "Drop_Longitude": rng.uniform(70, 90, n),
+        "Order_Date": _dates(rng, n).strftime("%Y-%m-%d"),
+        "Order_Time": _times(rng, n),
+        "Pickup_Time": _times(rng, n),
+        "Weather": rng.choice(WEATHER, n),
+        "Traffic": rng.choice(TRAFFIC, n),
+        "Vehicle": rng.choice(VEHICLES, n),
+        "Area": rng.choice(AREAS, n),
+        "Delivery_Time": rng.integers(10, 270, n),
+        "Category": rng.choice(CATEGORIES, n),
+    })
+
+
+def make_zomato(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "ID": [f"0x{i:06x}" for i in range(n)],
+        "Delivery_person_ID": [f"CITYRES{i % 997:03d}DEL0{i % 3 + 1}" for i in range(n)],
+        "Delivery_person_Age": rng.integers(18, 40, n).astype(float),
+        "Delivery_person_Ratings": rng.uniform(2.5, 5, n).round(1),
+        "Restaurant_latitude": rng.uniform(10, 30, n),
+        "Restaurant_longitude": rng.uniform(70, 90, n),
+        "Delivery_location_latitude": rng.uniform(10, 30, n),
+        "Delivery_location_longitude": rng.uniform(70, 90, n),
+        "Order_Date": _dates(rng, n).strftime("%d-%m-%Y"),
+        "Time_Orderd": _times(rng, n),
+        "Time_Order_picked": _times(rng, n),
+        "Weather_conditions": rng.choice(WEATHER, n),
+        "Road_traffic_density": rng.choice(TRAFFIC, n),
+        "Vehicle_condition": rng.integers(0, 3, n),
+        "Type_of_order": rng.choice(ORDER_TYPES, n),
+        "Type_of_vehicle": rng.choice(VEHICLES, n),
+        "multiple_deliveries": rng.integers(0, 4, n).astype(float),
+        "Festival": rng.choice(["No", "Yes"], n, p=[0.98, 0.02]),
+        "City": rng.choice(CITIES, n),
+        "Time_taken (min)": rng.integers(10, 55, n),
+    })
+    # Mimic the dirty rows of the real extract: missing values and malformed times
+    dirty = rng.random(n) < 0.02
+    df.loc[dirty, "Time_Orderd"] = rng.choice(["NaN", "0.458333333", "1"], int(dirty.sum()))
+    df.loc[rng.random(n) < 0.01, "Weather_conditions"] = None
+    return df
+
+
+GENERATORS = {"amazon": make_amazon, "zomato": make_zomato}
+
+
+def write_dataset(dataset: str, n: int, directory: Path, seed: int = 0) -> Path:
+    """Write a synthetic dataset to `directory/<dataset>/<dataset>.csv` and return the path"""
+    path = directory / dataset / f"{dataset}.csv"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    GENERATORS[dataset](n, seed).to_csv(path, index=False)
+    return path
@@ -1,17 +1,21 @@
-from operator import itemgetter
 from pprint import pprint
 
 from langchain.chains import create_sql_query_chain
-from langchain.prompts import PromptTemplate
 from langchain_community.agent_toolkits import create_sql_agent
 from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
 from langchain_community.tools.sql_database.tool import QuerySQLDataBaseTool
-from langchain_community.utilities import SQLDatabase
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.globals import set_llm_cache
 from langchain_openai import ChatOpenAI
 from pyprojroot import here
 
+from dapgpt.callbacks import MetricsCallbackHandler
+from dapgpt.catalog import schema_context
+from dapgpt.langchain_cache import LangChainResponseCache
+from dapgpt.query_cache import query_cache
+from dapgpt.results import to_pandas
+from dapgpt.sqlchain import HybridSQLExecutor, build_sql_answer_chain
+from dapgpt.sqldb import open_sql_database
+
 """
 # ==============================================================
 # Define LLM to use
@@ -21,6 +25,12 @@ llm = ChatOpenAI(model="gpt-3.5-turbo", temperature=0)
 # llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
 # llm = ChatOpenAI(model="gpt-4o", temperature=0)
 
+# Serve repeated prompts from the shared response cache (set DAPGPT_RESPONSE_CACHE to persist it)
+set_llm_cache(LangChainResponseCache())
+
+# Per-step timings and token usage go to the shared recorder (DAPGPT_METRICS_JSONL / DAPGPT_METRICS_PROM)
+metrics_config = {"callbacks": [MetricsCallbackHandler()]}
+
 """
 # ==============================================================
 # Define SQL Database
@@ -28,14 +38,17 @@ llm = ChatOpenAI(model="gpt-3.5-turbo", temperature=0)
 """
 sqldb_directory = here("data/myduckdb.db")
 
-db = SQLDatabase.from_uri(f"duckdb:///{sqldb_directory}")
+db = open_sql_database(f"duckdb:///{sqldb_directory}")
 print(db.dialect)
 print(db.get_usable_table_names())
 context = db.get_context()
 pprint(context)
 table_info = db.get_table_info(["amazon"])
 pprint(table_info)
-db.run("SELECT * FROM amazon LIMIT 10;")
+# run returns what the LLM sees: the rows, or a row count, column aggregates and leading rows for big results
+print(db.run("SELECT * FROM amazon LIMIT 10;"))
+# For display, fetch the result as Arrow and view it as a DataFrame without copying
+to_pandas(db.run_arrow("SELECT * FROM amazon LIMIT 10;"))
 
 """
 # ==============================================================
@@ -48,7 +61,7 @@ chain.get_prompts()[0].pretty_print()
 response = chain.invoke({"question": "How many entries per date in the amazon table? Don't limit the results"})
 # response holds the query object
 print(response)
-# here is how to run the query - manually
+# here is how to run the query - manually; big results come back summarized for the LLM (see dapgpt.results)
 db.run(response)
 
 """
@@ -79,23 +92,13 @@ print(execute_query.description)
 # Enhance SQL Query Chain with Query Execution and Answering
 # ==============================================================
 """
-system_role = """Given the following user question, corresponding SQL query, and SQL result, answer the user question.\n
-    Question: {question}\n
-    SQL Query: {query}\n
-    SQL Result: {result}\n
-    Answer:
-    """
+# The chain is built by dapgpt.sqlchain (so the benchmarks drive the same code) as:
+# RunnablePassthrough.assign(query=write_query).assign(result=itemgetter("query") | execute_query) | answer
+# Even though the query key is not explicitly mentioned in the answer template at this point, it is being prepared for later use.
+# The answer template does not need to know about the query key initially; it is filled with the actual values at the end of the chain.
+chain = build_sql_answer_chain(llm, db)
 
-write_query = create_sql_query_chain(llm, db)
-execute_query = QuerySQLDataBaseTool(db=db)
-answer_prompt = PromptTemplate.from_template(system_role)
-answer = answer_prompt | llm | StrOutputParser()
-
-# Even though the query key is not explicitly mentioned in the system_role template at this point, it is being prepared for later use.
-# The system_role template does not need to know about the query key initially; it is filled with the actual values at the end of the chain.
-chain = RunnablePassthrough.assign(query=write_query).assign(result=itemgetter("query") | execute_query) | answer
-
-chain.invoke({"question": "How many entries per date in the amazon table?"})
+chain.invoke({"question": "How many entries per date in the amazon table?"}, config=metrics_config)
 
 """
 # ==============================================================
@@ -104,29 +107,36 @@ chain.invoke({"question": "How many entries per date in the amazon table?"})
 """
 # agent_executor = create_sql_agent(llm, db=db, agent_type="openai-tools", verbose=True, top_k=100)
 
-my_suffix = """
-    As a final step, I MUST ALWAYS respond with JUST the results - NOTHING ELSE - in a json format.
-    """
-
-my_suffix = """
-    I should look at the tables in the database to see what I can query.
-    Then I should query the schema of the most relevant tables.\n
-    As a final step, I MUST ALWAYS respond with JUST the results - NOTHING ELSE - in a json format.
-    """
-
-my_suffix = """
-    I should look at the tables in the database to see what I can query.
-    Then I should query the schema of the most relevant tables.\n
+# The schema catalog already holds the tables and their schemas, which saves the agent the
+# list-tables and schema tool calls (one LLM round trip each)
+my_suffix = (
+    schema_context(db)
+    + """
     As a final step, I MUST ALWAYS respond with JUST the RAW RESULTS WITHOUT any further processing or ADDING extra text.
     """
+)
 
 message = "What's the count and agent rating by category in the amazon dataset? Order results in descending order based on count"
 
 agent_executor = create_sql_agent(llm, db=db, agent_type="tool-calling", verbose=True, top_k=100, suffix=my_suffix)
 # To check the prompt of the agent, you can use the following code:
 agent_executor.agent.runnable.get_prompts()[0].pretty_print()
-response = agent_executor.invoke({"input": message})
+response = agent_executor.invoke({"input": message}, config=metrics_config)
 print(response["output"])
+# Queries the agent re-ran (e.g. after double checking them) were served from the result cache
+print(query_cache.stats())
+
+"""
+# ==============================================================
+# Single-shot chain first, agent only as a fallback
+# ==============================================================
+"""
+# Two LLM calls when the generated SQL validates and runs; the agent above (4-8 calls) otherwise
+hybrid = HybridSQLExecutor(llm, db, agent=agent_executor)
+result = hybrid.invoke(message, config=metrics_config)
+print(result.path, f"{result.latency_s:.1f}s", result.fallback_reason)
+print(result.answer)
+print(hybrid.stats())
 
 """
 # ==============================================================
@@ -219,5 +229,5 @@ agent_executor.agent.runnable.get_prompts()[0].pretty_print()
 
 message = "What's the average rating and average delivery time per day in the amazon dataset? Order the results by date ascending"
 
-response = agent_executor.invoke(message)
+response = agent_executor.invoke(message, config=metrics_config)
 print(response["output"])
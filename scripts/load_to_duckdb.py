@@ -2,55 +2,12 @@ import argparse
 from pathlib import Path
 
 import duckdb
-import pandas as pd
-
-# Define the schemas
-schemas = {
-    "amazon": """
-        CREATE TABLE IF NOT EXISTS amazon (
-            order_id STRING,
-            agent_age INTEGER,
-            agent_rating FLOAT,
-            store_latitude FLOAT,
-            store_longitude FLOAT,
-            drop_latitude FLOAT,
-            drop_longitude FLOAT,
-            order_date DATE,
-            order_time TIME,
-            pickup_time TIME,
-            weather STRING,
-            traffic STRING,
-            vehicle STRING,
-            area STRING,
-            delivery_time INTEGER,
-            category STRING
-        )
-        """,
-    "zomato": """
-        CREATE TABLE IF NOT EXISTS zomato (
-            id STRING,
-            delivery_person_id STRING,
-            delivery_person_age FLOAT,
-            delivery_person_ratings FLOAT,
-            restaurant_latitude FLOAT,
-            restaurant_longitude FLOAT,
-            delivery_location_latitude FLOAT,
-            delivery_location_longitude FLOAT,
-            order_date DATE,
-            time_ordered TIME,
-            time_order_picked TIME,
-            weather_conditions STRING,
-            road_traffic_density STRING,
-            vehicle_condition STRING,
-            type_of_order STRING,
-            type_of_vehicle STRING,
-            multiple_deliveries FLOAT,
-            festival BOOLEAN,
-            city STRING,
-            time_taken INTEGER
-        )
-        """,
-}
+import pyarrow as pa
+
+from dapgpt import catalog, ingest, storage
+from dapgpt.cleaning import NULL_STRINGS, literal
+from dapgpt.duckdb_pool import pool_for
+from dapgpt.schemas import DATASETS, TYPES, Dataset
 
 
 def parse_user_args():
@@ -61,39 +18,221 @@ def parse_user_args():
         required=True,
         help="The dataset to load into DuckDB (amazon or zomato)",
     )
+    parser.add_argument(
+        "--mode",
+        choices=["native", "arrow"],
+        default="native",
+        help="native: DuckDB's parallel CSV reader with SQL cleaning; arrow: clean in Arrow chunks, then append",
+    )
+    parser.add_argument(
+        "--csv",
+        type=str,
+        default=None,
+        help="CSV file or glob of shards to load (defaults to data/<dataset>/*.csv)",
+    )
+    parser.add_argument(
+        "--full-refresh",
+        action="store_true",
+        help="Drop the table and reload every file instead of loading only new files and rows",
+    )
+    parser.add_argument("--threads", type=int, default=None, help="DuckDB worker threads (defaults to all cores)")
+    parser.add_argument("--memory-limit", type=str, default=None, help="DuckDB memory limit, e.g. 2GB")
+    parser.add_argument("--report", action="store_true", help="Print the rows dropped by each cleaning rule")
+    parser.add_argument(
+        "--storage",
+        choices=["table", "parquet"],
+        default="table",
+        help="table: rows live in the DuckDB file; parquet: Parquet files partitioned by order_date behind a view",
+    )
+    parser.add_argument("--parquet-dir", type=Path, default=storage.PARQUET_DIR, help="Root of the Parquet partitions")
     return parser.parse_args()
 
 
-if __name__ == "__main__":
-    # Define the table name
-    dataset = parse_user_args().dataset
+def _prepare(con: duckdb.DuckDBPyConnection, spec: Dataset, incremental: bool, layout: str, parquet_dir: Path) -> None:
+    # Create the table, or the view over the Parquet partitions, starting over on a full refresh
+    if layout == "parquet":
+        if not incremental:
+            ingest.reset(con, spec.name, kind="VIEW")
+            storage.drop_partitions(parquet_dir, spec)
+        storage.create_view(con, parquet_dir, spec)
+    else:
+        if not incremental:
+            ingest.reset(con, spec.name)
+        con.execute(spec.ddl("duckdb"))
+
+
+def _write_parquet(
+    con: duckdb.DuckDBPyConnection, spec: Dataset, batches: pa.RecordBatchReader, parquet_dir: Path, basename: str
+) -> int:
+    rows = 0
+
+    def counted():
+        nonlocal rows
+        for batch in batches:
+            rows += batch.num_rows
+            yield batch
+
+    storage.write_partitions(pa.RecordBatchReader.from_batches(batches.schema, counted()), parquet_dir, spec, basename)
+    storage.create_view(con, parquet_dir, spec)
+    return rows
 
-    # Dynamically determine the path relative to the script's location
-    script_dir = Path(__file__).parent  # Directory where the script resides
-    data_dir = script_dir.parent / "data" / dataset  # ../data/dataset relative to the script
-    csv_path = data_dir / f"{dataset}.csv"
 
-    # Load the CSV files into DataFrames
-    df = pd.read_csv(csv_path).dropna()
+def load_dataset(
+    dataset: str,
+    csv_path: Path,
+    db_path: Path = Path("data/myduckdb.db"),
+    incremental: bool = True,
+    report: bool = False,
+    layout: str = "table",
+    parquet_dir: Path = storage.PARQUET_DIR,
+) -> int:
+    """Load a dataset CSV into its DuckDB table and return the number of new rows
 
-    # Preprocess the data
-    if dataset == "zomato":
-        df["Order_Date"] = pd.to_datetime(df["Order_Date"], format="%d-%m-%Y").dt.strftime("%Y-%m-%d")
-        df = df[
-            (df["Time_Orderd"].str.contains(":"))
-            & (df["Time_Orderd"].str.len() == 5)
-            & (df["Time_Order_picked"].str.contains(":"))
-            & (df["Time_Order_picked"].str.len() == 5)
-        ].copy()
+    Incremental loads skip files already in the manifest and rows already in the table, so
+    re-running on the same input is a no-op. With `layout="parquet"` the rows are written as
+    date-partitioned Parquet files and the table becomes a view over them.
+    """
+    spec = DATASETS[dataset]
 
-    # Connect to DuckDB (creates or opens the database file)
-    con = duckdb.connect("data/myduckdb.db")
+    # Take the process's DuckDB writer (creates or opens the database file)
+    with pool_for(db_path).writer() as con:
+        _prepare(con, spec, incremental, layout, parquet_dir)
+        if not incremental:
+            catalog.invalidate(db_path, dataset)
 
-    # Execute the schema creation
-    con.execute(schemas[dataset])
+        pending = ingest.pending_files(con, dataset, [csv_path])
+        if not pending:
+            return 0
+        _, checksum = pending[0]
 
-    # Insert the DataFrame into the DuckDB table
-    con.execute(f"INSERT INTO {dataset} SELECT * FROM df")
+        # Clean the CSV chunk by chunk with the dataset's rules, straight into typed Arrow columns
+        arrow_table, cleaning = spec.pipeline.run(csv_path)
+        if report:
+            print(f"{csv_path}: {cleaning}")
+        arrow_table = ingest.new_rows(con, dataset, arrow_table)
 
-    # # Print the first 5 rows of the table
-    # print(con.execute(f"SELECT * FROM {dataset} LIMIT 5").fetchdf())
+        if layout == "parquet":
+            _write_parquet(con, spec, arrow_table.to_reader(), parquet_dir, checksum)
+            ingest.record_file(con, dataset, Path(csv_path), checksum, arrow_table.num_rows)
+            catalog.invalidate(db_path, dataset)
+            return arrow_table.num_rows
+
+        # Insert the new rows and record the file in one transaction; DuckDB scans Arrow without copying
+        con.execute("BEGIN TRANSACTION")
+        con.execute(f"INSERT INTO {dataset} SELECT * FROM arrow_table")
+        ingest.record_file(con, dataset, Path(csv_path), checksum, arrow_table.num_rows)
+        con.execute("COMMIT")
+
+        # # Print the first 5 rows of the table
+        # print(con.execute(f"SELECT * FROM {dataset} LIMIT 5").fetchdf())
+        # Cached schemas and sample rows of the table are stale now
+        catalog.invalidate(db_path, dataset)
+        return arrow_table.num_rows
+
+
+def load_dataset_native(
+    dataset: str,
+    csv_glob: str | Path,
+    db_path: Path = Path("data/myduckdb.db"),
+    threads: int | None = None,
+    memory_limit: str | None = None,
+    incremental: bool = True,
+    report: bool = False,
+    layout: str = "table",
+    parquet_dir: Path = storage.PARQUET_DIR,
+) -> int:
+    """Load one or more CSV shards straight into DuckDB, cleaning them in SQL, and return the number of new rows
+
+    The CSV is never materialized in pandas: DuckDB reads each file with its parallel
+    reader and streams it through the dataset's cleaning rules, pushed down as SQL, into the
+    table, so peak memory does not grow with file size. Columns are read as text and cast by
+    the INSERT, so the table schema (not type sniffing) decides the types, e.g. hex ids stay
+    strings. With `report`, an extra aggregate scan counts the rows each rule drops.
+
+    Incremental loads skip files already in the manifest; new files only contribute rows
+    whose keys are not in the table yet, whatever their date.
+    """
+    spec = DATASETS[dataset]
+    pipeline = spec.pipeline
+
+    with pool_for(db_path).writer() as con:
+        if threads:
+            con.execute(f"SET threads = {int(threads)}")
+        if memory_limit:
+            con.execute(f"SET memory_limit = {literal(memory_limit)}")
+        # Row order is irrelevant for the tables and keeping it would buffer data across threads
+        con.execute("SET preserve_insertion_order = false")
+
+        _prepare(con, spec, incremental, layout, parquet_dir)
+        if not incremental:
+            catalog.invalidate(db_path, dataset)
+
+        loaded = 0
+        for csv_path, checksum in ingest.pending_files(con, dataset, ingest.expand_paths(csv_glob)):
+            source = f"""read_csv(
+                {literal(str(csv_path))},
+                header = true,
+                nullstr = [{", ".join(literal(s) for s in NULL_STRINGS)}],
+                all_varchar = true
+            )"""
+            if report:
+                cleaning = pipeline.report_from_row(con.execute(pipeline.report_sql(source)).fetchone())
+                print(f"{csv_path}: {cleaning}")
+
+            new_rows = f"""
+                SELECT * FROM (
+                    SELECT {pipeline.select_sql(TYPES["duckdb"])}
+                    FROM {source}
+                    WHERE {pipeline.where_sql()}
+                )
+                WHERE {spec.key} NOT IN (SELECT {spec.key} FROM {dataset})
+                QUALIFY row_number() OVER (PARTITION BY {spec.key}) = 1
+                """
+            if layout == "parquet":
+                batches = con.execute(new_rows).fetch_record_batch()
+                rows = _write_parquet(con, spec, batches, parquet_dir, checksum)
+                ingest.record_file(con, dataset, csv_path, checksum, rows)
+            else:
+                con.execute("BEGIN TRANSACTION")
+                (rows,) = con.execute(f"INSERT INTO {dataset} {new_rows}").fetchone()
+                ingest.record_file(con, dataset, csv_path, checksum, rows)
+                con.execute("COMMIT")
+            loaded += rows
+        if loaded:
+            catalog.invalidate(db_path, dataset)
+        return loaded
+
+
+if __name__ == "__main__":
+    # Define the table name
+    args = parse_user_args()
+    dataset = args.dataset
+
+    # Dynamically determine the path relative to the script's location
+    script_dir = Path(__file__).parent  # Directory where the script resides
+    data_dir = script_dir.parent / "data" / dataset  # ../data/dataset relative to the script
+    csv_glob = args.csv or data_dir / "*.csv"
+
+    if args.mode == "native":
+        rows = load_dataset_native(
+            dataset,
+            csv_glob,
+            threads=args.threads,
+            memory_limit=args.memory_limit,
+            incremental=not args.full_refresh,
+            report=args.report,
+            layout=args.storage,
+            parquet_dir=args.parquet_dir,
+        )
+    else:
+        rows = 0
+        for i, csv_path in enumerate(ingest.expand_paths(csv_glob)):
+            rows += load_dataset(
+                dataset,
+                csv_path,
+                incremental=not args.full_refresh or i > 0,
+                report=args.report,
+                layout=args.storage,
+                parquet_dir=args.parquet_dir,
+            )
+    print(f"Loaded {rows} new rows into {dataset}")
@@ -2,55 +2,11 @@ import argparse
 import sqlite3
 from pathlib import Path
 
-import pandas as pd
-
-# Define the schemas
-schemas = {
-    "amazon": """
-        CREATE TABLE IF NOT EXISTS amazon (
-            order_id TEXT,
-            agent_age INTEGER,
-            agent_rating REAL,
-            store_latitude REAL,
-            store_longitude REAL,
-            drop_latitude REAL,
-            drop_longitude REAL,
-            order_date DATE,
-            order_time TIME,
-            pickup_time TIME,
-            weather TEXT,
-            traffic TEXT,
-            vehicle TEXT,
-            area TEXT,
-            delivery_time INTEGER,
-            category TEXT
-        )
-        """,
-    "zomato": """
-        CREATE TABLE IF NOT EXISTS zomato (
-            id TEXT,
-            delivery_person_id TEXT,
-            delivery_person_age REAL,
-            delivery_person_ratings REAL,
-            restaurant_latitude REAL,
-            restaurant_longitude REAL,
-            delivery_location_latitude REAL,
-            delivery_location_longitude REAL,
-            order_date DATE,
-            time_ordered TIME,
-            time_order_picked TIME,
-            weather_conditions TEXT,
-            road_traffic_density TEXT,
-            vehicle_condition TEXT,
-            type_of_order TEXT,
-            type_of_vehicle TEXT,
-            multiple_deliveries REAL,
-            festival INTEGER,
-            city TEXT,
-            time_taken INTEGER
-        )
-        """,
-}
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from dapgpt import catalog, ingest
+from dapgpt.schemas import DATASETS
 
 
 def parse_user_args():
@@ -61,42 +17,104 @@ def parse_user_args():
         required=True,
         help="The dataset to load into SQLite (amazon or zomato)",
     )
+    parser.add_argument(
+        "--csv",
+        type=str,
+        default=None,
+        help="CSV file or glob of daily extracts to load (defaults to data/<dataset>/*.csv)",
+    )
+    parser.add_argument(
+        "--full-refresh",
+        action="store_true",
+        help="Drop the table and reload every file instead of loading only new files and rows",
+    )
+    parser.add_argument("--chunksize", type=int, default=50_000, help="Rows per executemany batch")
+    parser.add_argument("--report", action="store_true", help="Print the rows dropped by each cleaning rule")
     return parser.parse_args()
 
 
-if __name__ == "__main__":
-    # Define the table name
-    dataset = parse_user_args().dataset
+def _sqlite_values(column: pa.ChunkedArray) -> list:
+    # SQLite keeps dates and times as ISO text
+    if pa.types.is_date(column.type) or pa.types.is_time(column.type):
+        column = pc.cast(column, pa.string())
+    return column.to_pylist()
 
-    # Dynamically determine the path relative to the script's location
-    script_dir = Path(__file__).parent  # Directory where the script resides
-    data_dir = script_dir.parent / "data" / dataset  # ../data/dataset relative to the script
-    csv_path = data_dir / f"{dataset}.csv"
 
-    # Load the CSV files into DataFrames
-    df = pd.read_csv(csv_path).dropna()
+def load_dataset(
+    dataset: str,
+    csv_path: Path,
+    db_path: Path = Path("data/mysqlite.db"),
+    incremental: bool = True,
+    chunksize: int = 50_000,
+    report: bool = False,
+) -> int:
+    """Load a dataset CSV into its SQLite table and return the number of new rows
 
-    # Preprocess the data
-    if dataset == "zomato":
-        df["Order_Date"] = pd.to_datetime(df["Order_Date"], format="%d-%m-%Y").dt.strftime("%Y-%m-%d")
-        df = df[
-            (df["Time_Orderd"].str.contains(":"))
-            & (df["Time_Orderd"].str.len() == 5)
-            & (df["Time_Order_picked"].str.contains(":"))
-            & (df["Time_Order_picked"].str.len() == 5)
-        ].copy()
+    Incremental loads skip files already in the manifest and rows already in the table, so
+    re-running on the same input is a no-op.
+    """
+    spec = DATASETS[dataset]
 
     # Connect to SQLite (creates or opens the database file)
-    db_path = Path("data/mysqlite.db")
     db_path.parent.mkdir(parents=True, exist_ok=True)
     con = sqlite3.connect(str(db_path))
+    # WAL lets readers keep querying during the load; skipping fsyncs is safe for a reloadable copy
+    con.execute("PRAGMA journal_mode = WAL")
+    con.execute("PRAGMA synchronous = OFF")
+    if not incremental:
+        ingest.reset(con, dataset)
+        catalog.invalidate(db_path, dataset)
 
-    # Execute the schema creation
-    con.execute(schemas[dataset])
+    # Execute the schema creation; the indexes keep watermark and key lookups cheap
+    con.execute(spec.ddl("sqlite"))
+    con.execute(f"CREATE INDEX IF NOT EXISTS {dataset}_order_date_idx ON {dataset} (order_date)")
+    con.execute(f"CREATE INDEX IF NOT EXISTS {dataset}_{spec.key}_idx ON {dataset} ({spec.key})")
 
-    # Insert the DataFrame into the SQLite table
-    df.to_sql(dataset, con, if_exists="replace", index=False)
+    pending = ingest.pending_files(con, dataset, [csv_path])
+    if not pending:
+        con.commit()
+        con.close()
+        return 0
+    _, checksum = pending[0]
+
+    # Clean the CSV chunk by chunk with the dataset's rules, straight into typed Arrow columns
+    table, cleaning = spec.pipeline.run(csv_path)
+    if report:
+        print(f"{csv_path}: {cleaning}")
+    table = ingest.new_rows(con, dataset, table)
+
+    # Append the new rows in chunks and record the file, all in one transaction
+    insert = f"INSERT INTO {dataset} VALUES ({', '.join('?' * table.num_columns)})"
+    for start in range(0, table.num_rows, chunksize):
+        chunk = table.slice(start, chunksize)
+        con.executemany(insert, zip(*(_sqlite_values(column) for column in chunk.columns)))
+    ingest.record_file(con, dataset, Path(csv_path), checksum, table.num_rows)
 
     # Commit the changes and close the connection
     con.commit()
     con.close()
+    # Cached schemas and sample rows of the table are stale now
+    catalog.invalidate(db_path, dataset)
+    return table.num_rows
+
+
+if __name__ == "__main__":
+    # Define the table name
+    args = parse_user_args()
+    dataset = args.dataset
+
+    # Dynamically determine the path relative to the script's location
+    script_dir = Path(__file__).parent  # Directory where the script resides
+    data_dir = script_dir.parent / "data" / dataset  # ../data/dataset relative to the script
+    csv_glob = args.csv or data_dir / "*.csv"
+
+    rows = 0
+    for i, csv_path in enumerate(ingest.expand_paths(csv_glob)):
+        rows += load_dataset(
+            dataset,
+            csv_path,
+            incremental=not args.full_refresh or i > 0,
+            chunksize=args.chunksize,
+            report=args.report,
+        )
+    print(f"Loaded {rows} new rows into {dataset}")
@@ -11,7 +11,8 @@ from langchain.tools import Tool
 from langchain.tools.render import render_text_description
 from langchain_openai import ChatOpenAI
 
-from scripts.udemy_eden_callbacks import AgentCallbackHandler
+from dapgpt.callbacks import MetricsCallbackHandler
+from dapgpt.metrics import metrics
 
 load_dotenv()
 
@@ -66,7 +67,7 @@ if __name__ == "__main__":
     llm = ChatOpenAI(
         temperature=0,
         stop=["\nObservation", "Observation"],
-        callbacks=[AgentCallbackHandler()],
+        callbacks=[MetricsCallbackHandler()],
     )
     intermediate_steps = []
     agent = (
@@ -80,21 +81,26 @@ if __name__ == "__main__":
     )
 
     agent_step = ""
-    while not isinstance(agent_step, AgentFinish):
-        agent_step: Union[AgentAction, AgentFinish] = agent.invoke({
-            "input": "What is the length of the word: DOG",
-            "agent_scratchpad": intermediate_steps,
-        })
-        print(agent_step)
-
-        if isinstance(agent_step, AgentAction):
-            tool_name = agent_step.tool
-            tool_to_use = find_tool_by_name(tools, tool_name)
-            tool_input = agent_step.tool_input
-
-            observation = tool_to_use.func(str(tool_input))
-            print(f"{observation=}")
-            intermediate_steps.append((agent_step, str(observation)))
+    # Each ReAct iteration is a span; the LLM call (via the callback) and the tool call nest under it
+    with metrics.span("react_agent", kind="agent"):
+        while not isinstance(agent_step, AgentFinish):
+            with metrics.span("agent_step", kind="step") as step:
+                agent_step: Union[AgentAction, AgentFinish] = agent.invoke({
+                    "input": "What is the length of the word: DOG",
+                    "agent_scratchpad": intermediate_steps,
+                })
+                print(agent_step)
+
+                if isinstance(agent_step, AgentAction):
+                    tool_name = agent_step.tool
+                    tool_to_use = find_tool_by_name(tools, tool_name)
+                    tool_input = agent_step.tool_input
+                    step.attributes["tool"] = tool_name
+
+                    with metrics.span(tool_name, kind="tool"):
+                        observation = tool_to_use.func(str(tool_input))
+                    print(f"{observation=}")
+                    intermediate_steps.append((agent_step, str(observation)))
 
     if isinstance(agent_step, AgentFinish):
         print(agent_step.return_values)
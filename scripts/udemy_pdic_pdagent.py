@@ -5,6 +5,8 @@ from dotenv import load_dotenv
 from langchain.schema import HumanMessage, SystemMessage
 from langchain_openai import ChatOpenAI
 
+from dapgpt.compact import compact_frame
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -13,8 +15,9 @@ openai_key = os.getenv("OPENAI_API_KEY")
 llm_name = "gpt-3.5-turbo"
 model = ChatOpenAI(api_key=openai_key, model=llm_name)
 
-# read csv file
-df = pd.read_csv("./data/salaries_2023.csv").fillna(value=0)
+# read csv file, compacting dtypes (categoricals, narrow numerics) to hold less memory per session
+df, report = compact_frame(pd.read_csv("./data/salaries_2023.csv").fillna(value=0))
+print(f"Memory: {report}")
 
 # print(df.head())
 
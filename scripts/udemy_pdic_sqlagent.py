@@ -5,6 +5,12 @@ from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from sqlalchemy import create_engine
 
+from dapgpt import catalog
+from dapgpt.callbacks import MetricsCallbackHandler
+from dapgpt.catalog import schema_context
+from dapgpt.sqlchain import HybridSQLExecutor
+from dapgpt.sqldb import open_sql_database
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -16,7 +22,6 @@ model = ChatOpenAI(api_key=openai_key, model=llm_name)
 
 from langchain.agents import create_sql_agent
 from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
-from langchain_community.utilities import SQLDatabase
 
 # create a db from csv file
 
@@ -31,6 +36,8 @@ file_url = "./data/salaries_2023.csv"
 os.makedirs(os.path.dirname(database_file_path), exist_ok=True)
 df = pd.read_csv(file_url).fillna(value=0)
 df.to_sql("salaries_2023", con=engine, if_exists="replace", index=False)
+# The table was rewritten: drop its cached schema and the query results cached for it
+catalog.invalidate(database_file_path, "salaries_2023")
 
 # print(f"Database created successfully! {df}")
 
@@ -68,8 +75,6 @@ below tools to construct your query and final answer.
 tools below.
 - as part of your final answer, please include the SQL query you used in json format or code format
 
-## Tools:
-
 """
 
 MSSQL_AGENT_FORMAT_INSTRUCTIONS = """
@@ -115,13 +120,15 @@ SELECT [salary] FROM xyztable WHERE department = 'IGM' AND date LIKE '2020%'"
 """
 
 
-db = SQLDatabase.from_uri(f"sqlite:///{database_file_path}")
+db = open_sql_database(f"sqlite:///{database_file_path}")
 toolkit = SQLDatabaseToolkit(db=db, llm=model)
 
 QUESTION = """what is the highest average salary by department, and give me the number?"
 """
+# The schema catalog already holds the tables and their schemas, which saves the agent the
+# list-tables and schema tool calls (one LLM round trip each)
 sql_agent = create_sql_agent(
-    prefix=MSSQL_AGENT_PREFIX,
+    prefix=MSSQL_AGENT_PREFIX + schema_context(db) + "\n## Tools:\n\n",
     format_instructions=MSSQL_AGENT_FORMAT_INSTRUCTIONS,
     llm=model,
     toolkit=toolkit,
@@ -129,6 +136,9 @@ sql_agent = create_sql_agent(
     verbose=True,
 )
 
+# Try the single-shot query chain first and fall back to the agent only when its SQL fails
+hybrid = HybridSQLExecutor(model, db, agent=sql_agent)
+
 # res = sql_agent.invoke(QUESTION)
 
 # print(res)
@@ -141,8 +151,9 @@ question = st.text_input("Enter your query:")
 
 if st.button("Run Query"):
     if question:
-        res = sql_agent.invoke(question)
+        res = hybrid.invoke(question, config={"callbacks": [MetricsCallbackHandler()]})
 
-        st.markdown(res["output"])
+        st.markdown(res.answer)
+        st.caption(f"Answered by the {res.path.replace('_', '-')} path in {res.latency_s:.1f}s")
 else:
     st.error("Please enter a query.")
@@ -1,50 +1,274 @@
-import json
+from __future__ import annotations
+
+import asyncio
 import os
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from dapgpt.cache import ResponseCache, make_key, normalize_query, response_cache
+from dapgpt.lazy import lazy_import
+from dapgpt.metrics import MetricsRecorder, Span, metrics
+from dapgpt.outofcore import CSVDataset
+from dapgpt.profile import DatasetProfile, ProfileCache, profile_cache
+from dapgpt.prompt import PromptContext, build_context
+from dapgpt.ratelimit import TokenBucket, backoff_delay
+
+if TYPE_CHECKING:
+    import dotenv
+    import openai
+    import pandas as pd
+    from openai.types.chat import ChatCompletionMessageParam
+else:
+    openai = lazy_import("openai")
+    pd = lazy_import("pandas")
+    dotenv = lazy_import("dotenv")
+
+
+def _retry_delay(error: openai.RateLimitError, attempt: int) -> float:
+    """Honour the server's Retry-After header, falling back to jittered exponential backoff"""
+    try:
+        return float(error.response.headers["retry-after"])
+    except (KeyError, ValueError):
+        return backoff_delay(attempt)
+
 
-import openai
-import pandas as pd
-from dotenv import load_dotenv
+def _record_usage(span: Span, usage: object | None) -> None:
+    """Copy token usage from an OpenAI response onto a span"""
+    if usage is not None:
+        span.prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        span.completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+
+
+@dataclass
+class Analysis:
+    """An answer from `analyze_many` and the prompt context it was answered from (None for cached answers and errors)"""
+
+    answer: str
+    context: PromptContext | None = None
 
 
 class DataAnalysisAgent:
-    def __init__(self):
+    def __init__(
+        self,
+        model: str = "gpt-4",
+        temperature: float = 0.7,
+        max_tokens: int = 1500,
+        token_budget: int = 3000,
+        profile_cache: ProfileCache = profile_cache,
+        response_cache: ResponseCache | None = response_cache,
+        metrics: MetricsRecorder = metrics,
+    ):
         # Make sure to set your OpenAI API key in streamlit secrets
-        load_dotenv()
+        dotenv.load_dotenv()
         openai_key = os.getenv("OPENAI_KEY")
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        # Dataset context is compacted to fit this many prompt tokens
+        self.token_budget = token_budget
+        # Context of the latest analyze/analyze_stream prompt, e.g. to show its token count
+        self.last_context: PromptContext | None = None
+        # Profiles are cached by dataset content, so repeat questions skip describe()/head()
+        self.profile_cache = profile_cache
+        # Answers are cached per (dataset, normalized query, model settings); pass None to disable
+        self.response_cache = response_cache
+        # Timing and token usage of every analysis and LLM call
+        self.metrics = metrics
 
-    def _create_system_prompt(self, df: pd.DataFrame) -> str:
+    def _create_system_prompt(self) -> str:
         """Create system prompt with dataset context"""
-        columns_info = {col: str(df[col].dtype) for col in df.columns}
+        return (
+            "You are a data analysis expert. "
+            "You will be provided with a dataset summary in pipe-separated tables.\n"
+            "Analyze the data based on the user's query and provide insights. "
+            "Include relevant statistics and explanations in your response."
+        )
 
-        return f"""You are a data analysis expert. \
-            You will be provided with a dataset that has the following columns:
-            {json.dumps(columns_info, indent=2)}
+    def _prepare_data_context(self, profile: DatasetProfile, context: PromptContext) -> str:
+        """Prepare dataset context for the API call"""
+        sections = [f"Shape: {profile.shape[0]} rows x {profile.shape[1]} columns"]
+        if context.statistics:
+            sections.append(f"Column statistics:\n{context.statistics}")
+        if context.schema:
+            sections.append(f"Other columns (column|dtype):\n{context.schema}")
+        if context.sample:
+            sections.append(f"Representative sample rows (csv):\n{context.sample}")
+        return "\n\n".join(sections)
 
-            Analyze the data based on the user's query and provide insights.
-            Include relevant statistics and explanations in your response."""
+    def _build_messages(
+        self, profile: DatasetProfile, query: str
+    ) -> tuple[list[ChatCompletionMessageParam], PromptContext]:
+        """Build the chat messages for a query against a profiled dataset, with the context they carry"""
+        context = build_context(profile, query, self.token_budget, self.model)
+        messages: list[ChatCompletionMessageParam] = [
+            {"role": "system", "content": self._create_system_prompt()},
+            {"role": "user", "content": f"Data Context:\n{self._prepare_data_context(profile, context)}\n\nQuery: {query}"},
+        ]
+        return messages, context
 
-    def _prepare_data_context(self, df: pd.DataFrame) -> str:
-        """Prepare dataset context for the API call"""
-        return f"""Dataset Summary:
-            - Shape: {df.shape}
-            - Column Statistics:
-            {df.describe().to_string()}
+    def _profile(self, data: pd.DataFrame | CSVDataset) -> DatasetProfile:
+        """Cached profile of an in-memory frame or of a CSV queried out of core"""
+        if isinstance(data, CSVDataset):
+            return data.cached_profile(self.profile_cache)
+        return self.profile_cache.get_or_compute(data)
+
+    def _cache_key(self, profile: DatasetProfile, query: str) -> str:
+        """Response cache key for a query against a profiled dataset"""
+        return make_key(profile.key, normalize_query(query), self.model, self.temperature, self.max_tokens, self.token_budget)
 
-            Sample of data (first 5 rows):
-            {df.head().to_string()}"""
+    def _cached(self, key: str, use_cache: bool) -> str | None:
+        if not use_cache or self.response_cache is None:
+            return None
+        return self.response_cache.get(key)
 
-    def analyze(self, df: pd.DataFrame, query: str) -> str:
-        """Analyze the dataset based on user query"""
+    def _store(self, key: str, answer: str | None, use_cache: bool) -> None:
+        if use_cache and self.response_cache is not None and answer:
+            self.response_cache.put(key, answer)
+
+    def analyze(
+        self,
+        df: pd.DataFrame | CSVDataset,
+        query: str,
+        use_cache: bool = True,
+        profile: DatasetProfile | None = None,
+    ) -> str:
+        """Analyze the dataset (a DataFrame, or a CSVDataset too large to load) based on user query
+
+        Pass `profile` when it was computed ahead of time (see `prefetch.ProfilePrefetcher`).
+        """
+        with self.metrics.span("analyze", kind="agent", model=self.model) as step:
+            try:
+                if profile is None:
+                    with self.metrics.span("profile"):
+                        profile = self._profile(df)
+                key = self._cache_key(profile, query)
+                if (cached := self._cached(key, use_cache)) is not None:
+                    step.attributes["cache"] = "hit"
+                    return cached
+
+                messages, self.last_context = self._build_messages(profile, query)
+                with self.metrics.span("chat.completions", kind="llm") as call:
+                    response = openai.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        temperature=self.temperature,
+                        max_tokens=self.max_tokens,
+                    )
+                    _record_usage(call, response.usage)
+                answer = response.choices[0].message.content or ""
+                self._store(key, answer, use_cache)
+                return answer
+            except Exception as e:
+                step.error = str(e)
+                return f"Error during analysis: {e!s}"
+
+    def analyze_stream(
+        self,
+        df: pd.DataFrame | CSVDataset,
+        query: str,
+        use_cache: bool = True,
+        profile: DatasetProfile | None = None,
+    ) -> Iterator[str]:
+        """Analyze the dataset based on user query, yielding the response as it is generated"""
+        # Spans are started and finished explicitly: a context manager would stay active in the
+        # caller's context between yields
+        step = self.metrics.start("analyze_stream", "agent", model=self.model)
         try:
-            response = openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": self._create_system_prompt(df)},
-                    {"role": "user", "content": f"Data Context:\n{self._prepare_data_context(df)}\n\nQuery: {query}"},
-                ],
-                temperature=0.7,
-                max_tokens=1500,
-            )
-            return response.choices[0].message.content
+            if profile is None:
+                profile = self._profile(df)
+            key = self._cache_key(profile, query)
+            if (cached := self._cached(key, use_cache)) is not None:
+                step.attributes["cache"] = "hit"
+                yield cached
+                return
+
+            parts: list[str] = []
+            messages, self.last_context = self._build_messages(profile, query)
+            call = self.metrics.start("chat.completions", "llm", parent=step, stream=True)
+            try:
+                stream = openai.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                )
+                for chunk in stream:
+                    _record_usage(call, chunk.usage)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        if not parts:
+                            call.attributes["first_token_s"] = round(call.elapsed_s, 3)
+                        parts.append(chunk.choices[0].delta.content)
+                        yield parts[-1]
+            finally:
+                self.metrics.finish(call)
+            self._store(key, "".join(parts), use_cache)
         except Exception as e:
-            return f"Error during analysis: {e!s}"
+            step.error = str(e)
+            yield f"Error during analysis: {e!s}"
+        finally:
+            self.metrics.finish(step)
+
+    async def analyze_many(
+        self,
+        items: Iterable[tuple[pd.DataFrame | CSVDataset, str]],
+        max_workers: int = 8,
+        requests_per_minute: float = 500,
+        max_retries: int = 5,
+        use_cache: bool = True,
+        client: openai.AsyncOpenAI | None = None,
+    ) -> list[Analysis]:
+        """Analyze many (df, query) pairs concurrently, returning the analyses in input order
+
+        At most `max_workers` requests are in flight, request starts are paced by a token
+        bucket and 429 responses are retried with exponential backoff. Each analysis carries
+        the prompt context it was answered from; `last_context` is left alone.
+        """
+        owned = client is None
+        client = client or openai.AsyncOpenAI(max_retries=0)
+        bucket = TokenBucket.per_minute(requests_per_minute)
+        workers = asyncio.Semaphore(max_workers)
+
+        async def run(df: pd.DataFrame | CSVDataset, query: str) -> Analysis:
+            async with workers:
+                with self.metrics.span("analyze", kind="agent", model=self.model) as step:
+                    try:
+                        profile = await asyncio.to_thread(self._profile, df)
+                        key = self._cache_key(profile, query)
+                        if (cached := self._cached(key, use_cache)) is not None:
+                            step.attributes["cache"] = "hit"
+                            return Analysis(cached)
+
+                        messages, context = self._build_messages(profile, query)
+                        attempt = 0
+                        while True:
+                            await bucket.acquire()
+                            try:
+                                with self.metrics.span("chat.completions", kind="llm") as call:
+                                    response = await client.chat.completions.create(
+                                        model=self.model,
+                                        messages=messages,
+                                        temperature=self.temperature,
+                                        max_tokens=self.max_tokens,
+                                    )
+                                    _record_usage(call, response.usage)
+                                answer = response.choices[0].message.content or ""
+                                self._store(key, answer, use_cache)
+                                return Analysis(answer, context)
+                            except openai.RateLimitError as e:
+                                if attempt >= max_retries:
+                                    raise
+                                self.metrics.record_retry(step)
+                                await asyncio.sleep(_retry_delay(e, attempt))
+                                attempt += 1
+                    except Exception as e:
+                        step.error = str(e)
+                        return Analysis(f"Error during analysis: {e!s}")
+
+        try:
+            return await asyncio.gather(*(run(df, query) for df, query in items))
+        finally:
+            if owned:
+                await client.close()
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+
+def normalize_query(query: str) -> str:
+    """Collapse whitespace in prompt text so reformatted copies share a cache entry
+
+    Case is kept: the model sees the text as written, and "Sunny" and "sunny" can ask
+    about different values.
+    """
+    return " ".join(query.split())
+
+
+def make_key(*parts: Any) -> str:
+    """Stable cache key from any JSON-serializable parts"""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class ResponseCache:
+    """LLM response cache with an in-memory LRU in front of an optional SQLite file
+
+    Entries older than `ttl` seconds are treated as misses, the memory tier keeps at most
+    `maxsize` entries and the SQLite tier at most `max_disk_entries` (least recently used
+    rows are evicted first). Hits served from memory are written through to the SQLite access
+    times in batches of `touch_batch` and before every eviction, so entries that stay hot in
+    memory are not evicted from disk as stale.
+    """
+
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        maxsize: int = 1024,
+        ttl: float | None = None,
+        max_disk_entries: int = 100_000,
+        touch_batch: int = 64,
+    ):
+        self.path = Path(path) if path else None
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self.touch_batch = touch_batch
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        # Access times of memory hits not yet written to SQLite
+        self._touched: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._con: sqlite3.Connection | None = None
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._con = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._con.execute("PRAGMA journal_mode=WAL")
+            self._con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )
+                """
+            )
+            self._con.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            self._con.commit()
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl is not None and now - created > self.ttl
+
+    def get(self, key: str) -> str | None:
+        """Return the cached response for key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[1], now):
+                del self._entries[key]
+                entry = None
+
+            if entry is None and self._con is not None:
+                row = self._con.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None and self._expired(row[1], now):
+                    self._con.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    row = None
+                if row is not None:
+                    self._con.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                    entry = (row[0], row[1])
+                    self._remember(key, entry)
+                self._con.commit()
+            elif entry is not None and self._con is not None:
+                self._touched[key] = now
+                if len(self._touched) >= self.touch_batch:
+                    self._flush_touched()
+                    self._con.commit()
+
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, value: str) -> None:
+        """Store a response in memory and, when configured, in SQLite"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, (value, now))
+            if self._con is not None:
+                self._flush_touched()
+                self._con.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now),
+                )
+                self._con.execute(
+                    """
+                    DELETE FROM responses WHERE key IN (
+                        SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?
+                    )
+                    """,
+                    (self.max_disk_entries,),
+                )
+                self._con.commit()
+
+    def clear(self) -> None:
+        """Drop every entry from both tiers and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._touched.clear()
+            self.hits = self.misses = 0
+            if self._con is not None:
+                self._con.execute("DELETE FROM responses")
+                self._con.commit()
+
+    def stats(self) -> dict[str, int]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "maxsize": self.maxsize}
+
+    def _flush_touched(self) -> None:
+        if self._con is not None and self._touched:
+            self._con.executemany(
+                "UPDATE responses SET accessed = max(accessed, ?) WHERE key = ?",
+                [(accessed, key) for key, accessed in self._touched.items()],
+            )
+        self._touched.clear()
+
+    def _remember(self, key: str, entry: tuple[str, float]) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+# Process-wide cache shared by the agent, the chat page and the LangChain scripts
+response_cache = ResponseCache(
+    path=os.getenv("DAPGPT_RESPONSE_CACHE"),
+    ttl=float(os.environ["DAPGPT_RESPONSE_CACHE_TTL"]) if os.getenv("DAPGPT_RESPONSE_CACHE_TTL") else None,
+)
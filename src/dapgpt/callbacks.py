@@ -0,0 +1,107 @@
+from typing import Any
+from uuid import UUID
+
+from langchain_core.agents import AgentAction, AgentFinish
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import LLMResult
+
+from dapgpt.metrics import MetricsRecorder, Span, current_span, metrics
+
+
+def _token_usage(response: LLMResult) -> tuple[int, int]:
+    """Prompt and completion tokens from an LLM result, whichever way the provider reports them"""
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage:
+        return usage.get("prompt_tokens", 0) or 0, usage.get("completion_tokens", 0) or 0
+    prompt = completion = 0
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            prompt += metadata.get("input_tokens", 0)
+            completion += metadata.get("output_tokens", 0)
+    return prompt, completion
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Records LangChain chain, LLM and tool runs as nested spans on a MetricsRecorder
+
+    Attach it via `callbacks=[MetricsCallbackHandler()]` on a model, or per call with
+    `config={"callbacks": [...]}` for agents and chains.
+    """
+
+    def __init__(self, recorder: MetricsRecorder = metrics):
+        self.recorder = recorder
+        self._spans: dict[UUID, Span] = {}
+
+    def _start(self, run_id: UUID, parent_run_id: UUID | None, name: str, kind: str, **attributes: Any) -> None:
+        # Runs without a LangChain parent nest under whatever span the caller has open
+        parent = self._spans.get(parent_run_id) if parent_run_id else current_span()
+        self._spans[run_id] = self.recorder.start(name, kind, parent=parent, **attributes)
+
+    def _finish(self, run_id: UUID, error: BaseException | None = None) -> Span | None:
+        span = self._spans.pop(run_id, None)
+        if span is not None:
+            self.recorder.finish(span, error)
+        return span
+
+    def on_llm_start(
+        self, serialized: dict[str, Any], prompts: list[str], *, run_id: UUID, parent_run_id: UUID | None = None, **kwargs: Any
+    ) -> None:
+        self._start(run_id, parent_run_id, (serialized or {}).get("name") or "llm", "llm")
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],
+        messages: list[list[BaseMessage]],
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        **kwargs: Any,
+    ) -> None:
+        self._start(run_id, parent_run_id, (serialized or {}).get("name") or "chat_model", "llm")
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._spans.get(run_id)
+        if span is not None:
+            span.prompt_tokens, span.completion_tokens = _token_usage(response)
+        self._finish(run_id)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, error)
+
+    def on_retry(self, retry_state: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self.recorder.record_retry(self._spans.get(run_id))
+
+    def on_chain_start(
+        self, serialized: dict[str, Any], inputs: Any, *, run_id: UUID, parent_run_id: UUID | None = None, **kwargs: Any
+    ) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name") or "chain"
+        self._start(run_id, parent_run_id, name, "chain")
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, error)
+
+    def on_agent_action(self, action: AgentAction, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._spans.get(run_id)
+        if span is not None:
+            span.attributes.setdefault("actions", []).append(action.tool)
+
+    def on_agent_finish(self, finish: AgentFinish, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._spans.get(run_id)
+        if span is not None:
+            span.attributes["finished"] = True
+
+    def on_tool_start(
+        self, serialized: dict[str, Any], input_str: str, *, run_id: UUID, parent_run_id: UUID | None = None, **kwargs: Any
+    ) -> None:
+        self._start(run_id, parent_run_id, (serialized or {}).get("name") or "tool", "tool")
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, error)
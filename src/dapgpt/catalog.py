@@ -0,0 +1,246 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Literal
+
+import sqlalchemy as sa
+from langchain_community.utilities import SQLDatabase
+
+from dapgpt.query_cache import QueryResultCache, is_cacheable, query_cache, referenced_tables
+from dapgpt.query_guard import GuardedSQLDatabase, QueryRejected
+
+
+def catalog_path(db_path: str | Path) -> Path:
+    """Where the catalog of a database file lives"""
+    return Path(f"{db_path}.catalog.json")
+
+
+class SchemaCatalog:
+    """Table info (DDL, sample rows) and column stats per table, persisted next to the database
+
+    Entries are built once from the database and reused by every process until a loader
+    invalidates the table, which also bumps the table's data version. Entries are re-read
+    only when the file's mtime, size or inode changes, so serving one costs a stat call
+    rather than a query; data versions, which key cached query results, are re-read on every
+    lookup and write, so a bump from another process is never missed.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._stamp: tuple[int, int, int] | None = None
+        self._data: dict[str, dict[str, Any]] = {"tables": {}, "versions": {}}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, table: str) -> dict[str, Any] | None:
+        """The table's entry, or None if it was never built or has been invalidated"""
+        with self._lock:
+            self._reload()
+            entry = self._data["tables"].get(table)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def put(self, table: str, entry: dict[str, Any], version: int) -> dict[str, Any]:
+        """Store an entry built from data `version`; it is dropped if a loader bumped the version meanwhile"""
+        with self._lock:
+            self._reload(force=True)
+            entry = {**entry, "version": version, "built_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+            if self._data["versions"].get(table, 0) == version:
+                self._data["tables"][table] = entry
+                self._save()
+            return entry
+
+    def version(self, table: str) -> int:
+        """Data version of a table; loaders bump it on every write"""
+        with self._lock:
+            self._reload(force=True)
+            return int(self._data["versions"].get(table, 0))
+
+    def versions(self, tables: list[str] | None = None) -> dict[str, int]:
+        """Data versions of several tables (every table a loader wrote to by default), read in one go"""
+        with self._lock:
+            self._reload(force=True)
+            if tables is None:
+                return dict(self._data["versions"])
+            return {table: self._data["versions"].get(table, 0) for table in tables}
+
+    def invalidate(self, *tables: str) -> None:
+        """Drop the tables' entries and bump their data versions"""
+        with self._lock:
+            self._reload(force=True)
+            for table in tables:
+                self._data["tables"].pop(table, None)
+                self._data["versions"][table] = self._data["versions"].get(table, 0) + 1
+            self._save()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "tables": len(self._data["tables"])}
+
+    def _reload(self, force: bool = False) -> None:
+        # Two writes within one mtime tick can leave the mtime unchanged, hence size and inode too
+        try:
+            stat = self.path.stat()
+            stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        except FileNotFoundError:
+            stamp = None
+        if force or stamp != self._stamp:
+            self._data = json.loads(self.path.read_text()) if stamp else {"tables": {}, "versions": {}}
+            self._stamp = stamp
+
+    def _save(self) -> None:
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(json.dumps(self._data, default=str))
+        tmp_path.replace(self.path)
+        stat = self.path.stat()
+        self._stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+_catalogs: dict[Path, SchemaCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def catalog_for(db_path: str | Path) -> SchemaCatalog:
+    """The process-wide catalog of a database file"""
+    path = catalog_path(Path(db_path).resolve())
+    with _catalogs_lock:
+        if path not in _catalogs:
+            _catalogs[path] = SchemaCatalog(path)
+        return _catalogs[path]
+
+
+def invalidate(db_path: str | Path, *tables: str) -> None:
+    """Called by loaders after writing to tables"""
+    catalog_for(db_path).invalidate(*tables)
+
+
+class CatalogSQLDatabase(GuardedSQLDatabase):
+    """SQLDatabase that serves table info from a SchemaCatalog and query results from a cache
+
+    The stock implementation reflects the tables and queries sample rows on every
+    `get_table_info` call (i.e. on every chain invocation and schema tool call); here that
+    happens once per data version, and column stats are added to the table info. Results of
+    read-only queries are cached per data version of the tables they mention, so the SQL
+    tools don't re-run a query the agent retries or another user already asked.
+    """
+
+    def __init__(
+        self,
+        engine: sa.Engine,
+        catalog: SchemaCatalog,
+        include_stats: bool = True,
+        results: QueryResultCache | None = query_cache,
+        **kwargs: Any,
+    ):
+        kwargs.setdefault("lazy_table_reflection", True)
+        super().__init__(engine, **kwargs)
+        self.catalog = catalog
+        self.include_stats = include_stats
+        self.results = results
+
+    def run(
+        self,
+        command: Any,
+        fetch: Literal["all", "one", "cursor"] = "all",
+        include_columns: bool = False,
+        *,
+        parameters: dict[str, Any] | None = None,
+        execution_options: dict[str, Any] | None = None,
+    ) -> Any:
+        results = self.results
+        cacheable = (
+            isinstance(command, str)
+            and fetch in ("all", "one")
+            and not parameters
+            and not execution_options
+            and is_cacheable(command)
+        )
+        if results is None or not cacheable:
+            return super().run(
+                command, fetch, include_columns, parameters=parameters, execution_options=execution_options
+            )
+
+        # Versions are read before the query runs, so a result is never filed under newer data
+        tables = referenced_tables(command, self.get_usable_table_names()) or list(self.get_usable_table_names())
+        options = (fetch, include_columns, self.summary_tokens, self.guard and self.guard.max_result_rows)
+        key = results.key(str(self.catalog.path), command, self.catalog.versions(tables), *options)
+        result = results.get(key)
+        if result is None:
+            result = super().run(command, fetch, include_columns)
+            results.put(key, result)
+        return result
+
+    def get_table_info(self, table_names: list[str] | None = None, get_col_comments: bool = False) -> str:
+        all_table_names = self.get_usable_table_names()
+        if table_names is not None:
+            missing_tables = set(table_names).difference(all_table_names)
+            if missing_tables:
+                raise ValueError(f"table_names {missing_tables} not found in database")
+            all_table_names = table_names
+
+        tables = []
+        for name in all_table_names:
+            entry = self.table_entry(name)
+            info = entry["info"]
+            if self.include_stats and entry["stats"]:
+                lines = [
+                    f"{column}: {s['count']} values, {s['distinct']} distinct, {s['min']} .. {s['max']}"
+                    for column, s in entry["stats"].items()
+                ]
+                info += "\n\n/*\nColumn stats:\n" + "\n".join(lines) + "\n*/"
+            tables.append(info)
+        return "\n\n".join(sorted(tables))
+
+    def table_entry(self, name: str) -> dict[str, Any]:
+        """The table's catalog entry, built from the database on a miss"""
+        entry = self.catalog.get(name)
+        if entry is None:
+            version = self.catalog.version(name)
+            info = super().get_table_info([name])
+            entry = self.catalog.put(name, {"info": info, "stats": self._column_stats(name)}, version)
+        return entry
+
+    def _column_stats(self, name: str) -> dict[str, dict[str, Any]]:
+        table = next(table for table in self._metadata.sorted_tables if table.name == name)
+        aggregates = []
+        for column in table.columns:
+            aggregates += [
+                sa.func.count(column),
+                sa.func.count(sa.distinct(column)),
+                sa.func.min(column),
+                sa.func.max(column),
+            ]
+        try:
+            with self._engine.connect() as connection:
+                row = connection.execute(sa.select(*aggregates).select_from(table)).one()
+        except QueryRejected:
+            # Too slow for the guard's timeout on a large table: the table info goes without stats
+            return {}
+        stats = {}
+        for i, column in enumerate(table.columns):
+            count, distinct, low, high = row[4 * i : 4 * i + 4]
+            stats[column.name] = {
+                "count": count,
+                "distinct": distinct,
+                "min": str(low)[:40],
+                "max": str(high)[:40],
+            }
+        return stats
+
+
+def schema_context(db: SQLDatabase) -> str:
+    """Table list and table info for an agent prompt, so the agent can skip the list/schema tool calls"""
+    context = (
+        f"The database has the tables: {', '.join(db.get_usable_table_names())}.\n"
+        "Their schemas, sample rows and column stats are below; use them instead of calling "
+        "the list-tables or schema tools.\n\n"
+        f"{db.get_table_info()}\n"
+    )
+    # The text ends up in prompt templates
+    return context.replace("{", "{{").replace("}", "}}")
@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import datetime
+import functools
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Protocol
+
+from dapgpt.lazy import lazy_import
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pcsv
+
+    from dapgpt.schemas import Column
+else:
+    pa = lazy_import("pyarrow")
+    pc = lazy_import("pyarrow.compute")
+    pcsv = lazy_import("pyarrow.csv")
+
+# Strings pandas.read_csv treats as missing by default, so both paths drop the same rows as .dropna() did
+NULL_STRINGS = ["", "#N/A", "#NA", "-NaN", "-nan", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"]
+
+# Spellings DuckDB accepts when casting text to BOOLEAN
+TRUE_STRINGS = ["true", "t", "yes", "y", "1"]
+FALSE_STRINGS = ["false", "f", "no", "n", "0"]
+
+
+@functools.cache
+def arrow_types() -> dict[str, pa.DataType]:
+    """Logical column types -> Arrow types of the cleaned tables"""
+    return {
+        "text": pa.string(),
+        "integer": pa.int64(),
+        "float": pa.float64(),
+        "date": pa.date32(),
+        "time": pa.time32("s"),
+        "boolean": pa.bool_(),
+    }
+
+
+def quote(identifier: str) -> str:
+    """Quote an SQL identifier (raw CSV headers contain spaces and parentheses)"""
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def literal(value: str) -> str:
+    """Quote a value as an SQL string literal"""
+    return "'" + value.replace("'", "''") + "'"
+
+
+class Rule(Protocol):
+    """A cleaning rule: which rows to keep and, optionally, how to convert a raw text column"""
+
+    @property
+    def name(self) -> str:
+        """Identifies the rule in cleaning reports"""
+        ...
+
+    def apply(self, batch: pa.RecordBatch) -> tuple[pa.RecordBatch, pa.Array]:
+        """Converted batch and a mask of the rows to keep"""
+        ...
+
+    def condition(self, columns: Sequence[str]) -> str:
+        """The keep-condition as SQL over the raw text columns"""
+        ...
+
+    def expressions(self) -> dict[str, str]:
+        """SQL expressions replacing raw columns"""
+        ...
+
+
+@dataclass(frozen=True)
+class DropNulls:
+    """Drop rows with a missing value in any column"""
+
+    name: str = "drop_nulls"
+
+    def apply(self, batch: pa.RecordBatch) -> tuple[pa.RecordBatch, pa.Array]:
+        return batch, functools.reduce(pc.and_, (pc.is_valid(column) for column in batch.columns))
+
+    def condition(self, columns: Sequence[str]) -> str:
+        return " AND ".join(f"{quote(column)} IS NOT NULL" for column in columns)
+
+    def expressions(self) -> dict[str, str]:
+        return {}
+
+
+@dataclass(frozen=True)
+class ParseDate:
+    """Parse a text column into a DATE, dropping rows that don't match `format`"""
+
+    column: str
+    format: str = "%Y-%m-%d"
+
+    @property
+    def name(self) -> str:
+        return f"parse_date:{self.column}"
+
+    def apply(self, batch: pa.RecordBatch) -> tuple[pa.RecordBatch, pa.Array]:
+        parsed = pc.strptime(batch[self.column], format=self.format, unit="s", error_is_null=True)
+        batch = _replace(batch, self.column, pc.cast(parsed, pa.date32()))
+        return batch, pc.is_valid(parsed)
+
+    def condition(self, columns: Sequence[str]) -> str:
+        return f"try_strptime({quote(self.column)}, {literal(self.format)}) IS NOT NULL"
+
+    def expressions(self) -> dict[str, str]:
+        return {self.column: f"try_strptime({quote(self.column)}, {literal(self.format)})::DATE"}
+
+
+@dataclass(frozen=True)
+class ParseTime:
+    """Parse a text column into a TIME, dropping rows that aren't exactly one of `formats`
+
+    The width check rejects values such as "7:05" that strptime would accept for "%H:%M",
+    matching the zero-padded layout of the extracts.
+    """
+
+    column: str
+    formats: tuple[str, ...] = ("%H:%M:%S", "%H:%M")
+
+    @property
+    def name(self) -> str:
+        return f"parse_time:{self.column}"
+
+    @property
+    def widths(self) -> list[int]:
+        return sorted({len(datetime.time().strftime(fmt)) for fmt in self.formats})
+
+    def apply(self, batch: pa.RecordBatch) -> tuple[pa.RecordBatch, pa.Array]:
+        values = batch[self.column]
+        parsed = pc.coalesce(*(pc.strptime(values, format=fmt, unit="s", error_is_null=True) for fmt in self.formats))
+        mask = pc.and_(pc.is_in(pc.utf8_length(values), value_set=pa.array(self.widths)), pc.is_valid(parsed))
+        return _replace(batch, self.column, pc.cast(parsed, pa.time32("s"))), mask
+
+    def condition(self, columns: Sequence[str]) -> str:
+        return f"{self._strptime()} IS NOT NULL"
+
+    def expressions(self) -> dict[str, str]:
+        return {self.column: f"{self._strptime()}::TIME"}
+
+    def _strptime(self) -> str:
+        # Only try the formats of the value's width; failed parses are what make try_strptime slow
+        column = quote(self.column)
+        cases = []
+        for width in self.widths:
+            formats = [fmt for fmt in self.formats if len(datetime.time().strftime(fmt)) == width]
+            cases.append(f"WHEN {width} THEN try_strptime({column}, [{', '.join(map(literal, formats))}])")
+        return f"(CASE length({column}) {' '.join(cases)} END)"
+
+
+def _replace(batch: pa.RecordBatch, column: str, values: pa.Array) -> pa.RecordBatch:
+    i = batch.schema.get_field_index(column)
+    arrays = list(batch.columns)
+    arrays[i] = values
+    return pa.RecordBatch.from_arrays(arrays, names=batch.schema.names)
+
+
+@dataclass
+class CleaningReport:
+    """Rows read, and rows dropped by each rule in order"""
+
+    rows_in: int = 0
+    dropped: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def rows_out(self) -> int:
+        return self.rows_in - sum(self.dropped.values())
+
+    def __str__(self) -> str:
+        lines = [f"{self.rows_in} rows read, {self.rows_out} kept"]
+        lines += [f"  {name}: -{count}" for name, count in self.dropped.items()]
+        return "\n".join(lines)
+
+
+class Pipeline:
+    """Ordered cleaning rules that run as Arrow kernels over CSV chunks or push down as one SQL query
+
+    Every raw column is read as text; rules filter rows and parse dates and times into native
+    types, then the remaining columns are cast to the table's types and renamed.
+    """
+
+    def __init__(self, columns: Sequence["Column"], rules: Sequence[Rule]):
+        self.columns = list(columns)
+        self.rules = list(rules)
+
+    @property
+    def sources(self) -> list[str]:
+        return [column.source for column in self.columns]
+
+    @property
+    def schema(self) -> pa.Schema:
+        """Arrow schema of the cleaned table"""
+        return pa.schema([(column.name, arrow_types()[column.type]) for column in self.columns])
+
+    def read_csv(self, path: str | Path, block_size: int = 16 << 20) -> Iterator[pa.RecordBatch]:
+        """Stream the raw columns of a CSV as text record batches"""
+        reader = pcsv.open_csv(
+            path,
+            read_options=pcsv.ReadOptions(block_size=block_size),
+            convert_options=pcsv.ConvertOptions(
+                column_types=dict.fromkeys(self.sources, pa.string()),
+                include_columns=self.sources,
+                null_values=NULL_STRINGS,
+                strings_can_be_null=True,
+            ),
+        )
+        yield from reader
+
+    def clean_batch(self, batch: pa.RecordBatch, report: CleaningReport) -> pa.RecordBatch:
+        """Apply the rules to one batch, counting the dropped rows, and cast it to `schema`"""
+        report.rows_in += batch.num_rows
+        for rule in self.rules:
+            batch, mask = rule.apply(batch)
+            mask = pc.fill_null(mask, False)
+            kept = pc.sum(mask).as_py() or 0
+            report.dropped[rule.name] = report.dropped.get(rule.name, 0) + batch.num_rows - kept
+            batch = batch.filter(mask)
+
+        arrays = []
+        for column in self.columns:
+            values, target = batch[column.source], arrow_types()[column.type]
+            if values.type == target:
+                arrays.append(values)
+            elif column.type == "boolean":
+                lowered = pc.utf8_lower(values)
+                truthy = pc.is_in(lowered, value_set=pa.array(TRUE_STRINGS))
+                known = pc.or_(truthy, pc.is_in(lowered, value_set=pa.array(FALSE_STRINGS)))
+                arrays.append(pc.if_else(known, truthy, pa.scalar(None, pa.bool_())))
+            else:
+                arrays.append(pc.cast(values, target))
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+    def run(self, path: str | Path, block_size: int = 16 << 20) -> tuple[pa.Table, CleaningReport]:
+        """Clean a CSV chunk by chunk; only the kept rows are held in memory"""
+        report = CleaningReport(dropped={rule.name: 0 for rule in self.rules})
+        batches = [self.clean_batch(batch, report) for batch in self.read_csv(path, block_size)]
+        return pa.Table.from_batches(batches, schema=self.schema), report
+
+    def select_sql(self, types: dict[str, str] | None = None) -> str:
+        """SELECT list over the raw text columns, with parsed values and the table's column names
+
+        `types` maps logical column types to SQL types to cast to; without it the text is left
+        for the INSERT to cast.
+        """
+        expressions: dict[str, str] = {}
+        for rule in self.rules:
+            expressions.update(rule.expressions())
+        select = []
+        for column in self.columns:
+            expression = expressions.get(column.source, quote(column.source))
+            if types:
+                expression = f"CAST({expression} AS {types[column.type]})"
+            select.append(f"{expression} AS {column.name}")
+        return ",\n".join(select)
+
+    def where_sql(self) -> str:
+        """The rules' keep-conditions as one WHERE clause"""
+        return " AND ".join(f"({rule.condition(self.sources)})" for rule in self.rules) or "true"
+
+    def report_sql(self, source: str) -> str:
+        """Aggregate query counting the rows each rule drops from `source`, in rule order"""
+        counts, kept = ["count(*)"], "true"
+        for rule in self.rules:
+            condition = f"coalesce({rule.condition(self.sources)}, false)"
+            counts.append(f"count(*) FILTER (WHERE {kept} AND NOT {condition})")
+            kept = f"{kept} AND {condition}"
+        return f"SELECT {', '.join(counts)} FROM {source}"
+
+    def report_from_row(self, row: Sequence[Any]) -> CleaningReport:
+        """Build a report from the result row of `report_sql`"""
+        rows_in, *dropped = row
+        return CleaningReport(rows_in=rows_in, dropped={rule.name: n for rule, n in zip(self.rules, dropped)})
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import functools
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from dapgpt.lazy import lazy_import
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+else:
+    np = lazy_import("numpy")
+    pd = lazy_import("pandas")
+
+
+@functools.cache
+def arrow_string() -> pd.StringDtype:
+    """Arrow-backed strings with NaN for missing values, i.e. pandas 3's default str dtype"""
+    try:
+        return pd.StringDtype("pyarrow", na_value=np.nan)
+    except TypeError:
+        # pandas 2.2 spells the same dtype as a storage name
+        return pd.StringDtype("pyarrow_numpy")
+
+
+@dataclass
+class CompactionReport:
+    """Memory of a DataFrame before and after `compact_frame`, and the dtype changes made"""
+
+    before_bytes: int
+    after_bytes: int
+    changes: dict[str, tuple[str, str]] = field(default_factory=dict)
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.before_bytes - self.after_bytes
+
+    @property
+    def ratio(self) -> float:
+        """Memory after compaction relative to before"""
+        return self.after_bytes / self.before_bytes if self.before_bytes else 1.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.before_bytes / 2**20:.1f} MB -> {self.after_bytes / 2**20:.1f} MB "
+            f"({1 - self.ratio:.0%} saved, {len(self.changes)} columns converted)"
+        )
+
+
+def _is_text(column: pd.Series) -> bool:
+    return pd.api.types.is_string_dtype(column.dtype) and pd.api.types.infer_dtype(column, skipna=True) in (
+        "string",
+        "empty",
+    )
+
+
+def _downcast_float(column: pd.Series) -> pd.Series:
+    """float32 when every value survives the round trip, otherwise the column unchanged"""
+    narrow = column.astype(np.float32)
+    exact = (narrow.astype(column.dtype) == column) | column.isna()
+    return narrow if exact.all() else column
+
+
+def compact_column(column: pd.Series, max_category_ratio: float = 0.5) -> pd.Series:
+    """The column in the smallest dtype that holds the same values
+
+    64-bit integers become int32 when every value fits in 16 bits, leaving headroom for the
+    arithmetic agents do on them (sums, differences and products of two values can't
+    overflow); floats become float32 only when that is lossless. Text columns whose distinct values are at most
+    `max_category_ratio` of the rows become categoricals; other text is stored as Arrow
+    strings.
+    """
+    if pd.api.types.is_bool_dtype(column.dtype):
+        return column
+    if pd.api.types.is_integer_dtype(column.dtype) and isinstance(column.dtype, np.dtype):
+        small = np.iinfo(np.int16)
+        if column.dtype.itemsize > 4 and (not len(column) or (column.min() >= small.min and column.max() <= small.max)):
+            return column.astype(np.int32)
+        return column
+    if pd.api.types.is_float_dtype(column.dtype) and column.dtype == np.float64:
+        return _downcast_float(column)
+    if _is_text(column):
+        if len(column) and column.nunique(dropna=True) <= max_category_ratio * len(column):
+            return column.astype("category")
+        return column if column.dtype == arrow_string() else column.astype(arrow_string())
+    return column
+
+
+def compact_frame(df: pd.DataFrame, max_category_ratio: float = 0.5) -> tuple[pd.DataFrame, CompactionReport]:
+    """A copy of df with every column compacted (see `compact_column`), and what that saved"""
+    before = int(df.memory_usage(deep=True).sum())
+    columns = []
+    changes = {}
+    for name, column in df.items():
+        compacted = compact_column(column, max_category_ratio)
+        if compacted.dtype != column.dtype:
+            changes[str(name)] = (str(column.dtype), str(compacted.dtype))
+        columns.append(compacted)
+    compacted = pd.concat(columns, axis=1) if columns else df.copy()
+    return compacted, CompactionReport(before, int(compacted.memory_usage(deep=True).sum()), changes)
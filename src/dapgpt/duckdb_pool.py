@@ -0,0 +1,222 @@
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+import duckdb
+from duckdb_engine import ConnectionWrapper
+
+# Settings for DuckDB connections that serve queries: cache Parquet footers between queries
+DUCKDB_SETTINGS = {"parquet_metadata_cache": "true"}
+
+
+def configure_duckdb(con: Any) -> None:
+    """Apply the serving settings to a DuckDB (DB-API) connection"""
+    for name, value in DUCKDB_SETTINGS.items():
+        con.execute(f"SET {name} = {value}")
+
+
+class DuckDBPool:
+    """Process-wide access to one DuckDB file: a cursor per checkout off a shared read-only
+    connection, plus a writer path that runs one write at a time
+
+    The database is opened once per process instead of once per session, rerun or script,
+    and readers query it concurrently, each on its own cursor. A writer waits for the active
+    readers to finish, keeps new ones waiting, and closes the read-only connection, because
+    DuckDB can't hold the same file read-only and read-write in one process. Readers reopen
+    it on their next query. Other processes holding the file are waited for up to
+    `lock_timeout` seconds.
+
+    The open read-only connection holds the file's lock between queries, so a loader in
+    another process waits `lock_timeout` seconds and then fails while this process serves
+    the file. Load through `writer` in the serving process, or `close` the pool first.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        threads: int | None = None,
+        memory_limit: str | None = None,
+        lock_timeout: float = 30.0,
+    ):
+        self.path = Path(path)
+        self.threads = threads
+        self.memory_limit = memory_limit
+        self.lock_timeout = lock_timeout
+        self._cond = threading.Condition()
+        self._con: duckdb.DuckDBPyConnection | None = None
+        self._depth: dict[int, int] = {}
+        self._readers = 0
+        self._writing = False
+        self._writers_waiting = 0
+        self._counters = {
+            "opens": 0,
+            "reads": 0,
+            "writes": 0,
+            "peak_readers": 0,
+            "read_wait_s": 0.0,
+            "write_wait_s": 0.0,
+        }
+
+    @property
+    def config(self) -> dict[str, Any]:
+        """DuckDB settings applied to every connection of the pool"""
+        config: dict[str, Any] = {}
+        if self.threads:
+            config["threads"] = self.threads
+        if self.memory_limit:
+            config["memory_limit"] = self.memory_limit
+        return config
+
+    @contextmanager
+    def reader(self) -> Iterator[duckdb.DuckDBPyConnection]:
+        """A cursor for the duration of a block of reads"""
+        cursor = self.acquire()
+        try:
+            yield cursor
+        finally:
+            self.release(cursor)
+
+    def acquire(self) -> duckdb.DuckDBPyConnection:
+        """Check out a new cursor; pair every call with `release`
+
+        Every checkout gets its own cursor, so two connections on one thread (e.g. two
+        SQLAlchemy connections) never share a result set.
+        """
+        ident = threading.get_ident()
+        t0 = time.perf_counter()
+        with self._cond:
+            # A thread that already reads may nest reads even when a writer is waiting
+            if not self._depth.get(ident):
+                while self._writing or self._writers_waiting:
+                    self._cond.wait()
+            self._depth[ident] = self._depth.get(ident, 0) + 1
+            self._readers += 1
+            self._counters["reads"] += 1
+            self._counters["read_wait_s"] += time.perf_counter() - t0
+            self._counters["peak_readers"] = max(self._counters["peak_readers"], self._readers)
+            try:
+                if self._con is None:
+                    self._con = self._connect(read_only=True)
+                return self._con.cursor()
+            except BaseException:
+                self._release(ident)
+                raise
+
+    def release(self, cursor: duckdb.DuckDBPyConnection, ident: int | None = None) -> None:
+        """Close a cursor checked out by this thread (or by thread `ident`)"""
+        cursor.close()
+        with self._cond:
+            self._release(ident or threading.get_ident())
+
+    def sqlalchemy_connection(self) -> ConnectionWrapper:
+        """DB-API connection for `sa.create_engine(..., creator=...)`; closing it releases the cursor"""
+        return _PooledConnection(self, self.acquire(), threading.get_ident())
+
+    @contextmanager
+    def writer(self) -> Iterator[duckdb.DuckDBPyConnection]:
+        """A read-write connection, once no reader or other writer is active
+
+        Must not be entered by a thread that is inside `reader`.
+        """
+        t0 = time.perf_counter()
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writing or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writing = True
+            self._close_reader()
+        try:
+            con = self._connect(read_only=False)
+            with self._cond:
+                self._counters["write_wait_s"] += time.perf_counter() - t0
+            try:
+                yield con
+            finally:
+                con.close()
+        finally:
+            with self._cond:
+                self._writing = False
+                self._counters["writes"] += 1
+                self._cond.notify_all()
+
+    def close(self) -> None:
+        """Close the read-only connection, releasing the file to other processes; the next read reopens it"""
+        with self._cond:
+            while self._readers:
+                self._cond.wait()
+            self._close_reader()
+
+    def stats(self) -> dict[str, float]:
+        """Utilization: active readers (open cursors), checkouts, writes and time spent waiting"""
+        with self._cond:
+            return {"readers": self._readers, **self._counters}
+
+    def _release(self, ident: int) -> None:
+        self._depth[ident] -= 1
+        if not self._depth[ident]:
+            del self._depth[ident]
+        self._readers -= 1
+        self._cond.notify_all()
+
+    def _close_reader(self) -> None:
+        if self._con is not None:
+            self._con.close()
+            self._con = None
+
+    def _connect(self, read_only: bool) -> duckdb.DuckDBPyConnection:
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            try:
+                con = duckdb.connect(str(self.path), read_only=read_only, config=self.config)
+                break
+            except duckdb.IOException as e:
+                # Another process holds the file lock
+                if "lock" not in str(e).lower() or time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+        configure_duckdb(con)
+        with self._cond:
+            self._counters["opens"] += 1
+        return con
+
+
+class _PooledConnection(ConnectionWrapper):
+    """duckdb_engine connection over a pooled cursor; closing it releases the cursor to the pool"""
+
+    def __init__(self, pool: DuckDBPool, cursor: duckdb.DuckDBPyConnection, ident: int):
+        super().__init__(cursor)
+        self._pool = pool
+        self._cursor = cursor
+        self._ident = ident
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self._pool.release(self._cursor, self._ident)
+
+
+_pools: dict[Path, DuckDBPool] = {}
+_pools_lock = threading.Lock()
+
+
+def pool_for(db_path: str | Path) -> DuckDBPool:
+    """The process-wide pool of a database file
+
+    DAPGPT_DUCKDB_THREADS and DAPGPT_DUCKDB_MEMORY_LIMIT cap the threads and memory DuckDB
+    uses for queries served by the pool.
+    """
+    path = Path(db_path).resolve()
+    with _pools_lock:
+        if path not in _pools:
+            threads = os.getenv("DAPGPT_DUCKDB_THREADS")
+            _pools[path] = DuckDBPool(
+                path,
+                threads=int(threads) if threads else None,
+                memory_limit=os.getenv("DAPGPT_DUCKDB_MEMORY_LIMIT"),
+            )
+        return _pools[path]
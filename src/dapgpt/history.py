@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+from dapgpt.lazy import lazy_import
+from dapgpt.prompt import count_tokens
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.messages import BaseMessage
+
+lc_messages = lazy_import("langchain_core.messages")
+
+Summarizer = Callable[[str, list["BaseMessage"]], str]
+
+SUMMARY_PROMPT = """Progressively summarize the conversation, adding onto the previous summary \
+and returning a new summary. Keep facts, numbers, column names and open questions; drop pleasantries.
+
+Current summary:
+{summary}
+
+New lines of conversation:
+{lines}
+
+New summary:"""
+
+
+def llm_summarizer(llm: BaseChatModel) -> Summarizer:
+    """Summarizer that folds old turns into the running summary with an LLM call"""
+
+    def summarize(summary: str, messages: list[BaseMessage]) -> str:
+        lines = "\n".join(f"{message.type}: {message.content}" for message in messages)
+        response = llm.invoke(SUMMARY_PROMPT.format(summary=summary or "(empty)", lines=lines))
+        return str(response.content).strip()
+
+    return summarize
+
+
+class ChatHistory:
+    """Chat history that sends a bounded prompt: a running summary plus a sliding window of recent turns
+
+    Every message is kept for display, but only the last `max_turns` exchanges (and at most
+    `max_tokens` tokens of them) are sent verbatim; older turns are folded into the summary.
+    """
+
+    def __init__(
+        self,
+        system_prompt: str,
+        summarizer: Summarizer,
+        max_turns: int = 4,
+        max_tokens: int = 1500,
+        model: str = "gpt-3.5-turbo",
+    ):
+        self.system = lc_messages.SystemMessage(content=system_prompt)
+        self.summarizer = summarizer
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.model = model
+        self.messages: list[BaseMessage] = []
+        self.summary = ""
+        self._window_start = 0
+
+    @property
+    def window(self) -> list[BaseMessage]:
+        """Recent messages sent verbatim"""
+        return self.messages[self._window_start :]
+
+    def append(self, message: BaseMessage) -> None:
+        """Add a message, folding the oldest turns into the summary once an exchange completes"""
+        self.messages.append(message)
+        if isinstance(message, lc_messages.AIMessage):
+            self._compact()
+
+    def prompt_messages(self) -> list[BaseMessage]:
+        """Messages to send to the model for the next turn"""
+        prompt: list[BaseMessage] = [self.system]
+        if self.summary:
+            prompt.append(lc_messages.SystemMessage(content=f"Summary of the earlier conversation:\n{self.summary}"))
+        return prompt + self.window
+
+    def prompt_tokens(self) -> int:
+        """Approximate token footprint of the next prompt"""
+        return sum(count_tokens(str(message.content), self.model) + 4 for message in self.prompt_messages())
+
+    def _window_tokens(self) -> int:
+        return sum(count_tokens(str(message.content), self.model) + 4 for message in self.window)
+
+    def _compact(self) -> None:
+        folded: list[BaseMessage] = []
+        while len(self.window) > 2 and (
+            sum(isinstance(message, lc_messages.HumanMessage) for message in self.window) > self.max_turns
+            or self._window_tokens() > self.max_tokens
+        ):
+            # Fold a whole exchange (the user message and everything up to the next one)
+            end = self._window_start + 1
+            while end < len(self.messages) - 1 and not isinstance(self.messages[end], lc_messages.HumanMessage):
+                end += 1
+            folded.extend(self.messages[self._window_start : end])
+            self._window_start = end
+
+        if folded:
+            self.summary = self.summarizer(self.summary, folded)
@@ -0,0 +1,129 @@
+import glob
+import hashlib
+import time
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from dapgpt.schemas import DATASETS
+
+MANIFEST_TABLE = "_load_manifest"
+
+
+def expand_paths(pattern: str | Path) -> list[Path]:
+    """CSV files matching a path or glob, in load order"""
+    return [Path(path) for path in sorted(glob.glob(str(pattern)))]
+
+
+def file_checksum(path: str | Path, chunk_size: int = 1 << 20) -> str:
+    """Content hash of a file, read in chunks"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def ensure_manifest(con: Any) -> None:
+    """Create the manifest of loaded files (works on DuckDB and SQLite connections)"""
+    con.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+            dataset TEXT,
+            path TEXT,
+            size BIGINT,
+            mtime_ns BIGINT,
+            checksum TEXT,
+            rows_loaded BIGINT,
+            watermark TEXT,
+            loaded_at TEXT
+        )
+        """
+    )
+
+
+def reset(con: Any, dataset: str, kind: str = "TABLE") -> None:
+    """Forget everything loaded for a dataset so the next load is a full refresh"""
+    ensure_manifest(con)
+    con.execute(f"DROP {kind} IF EXISTS {dataset}")
+    con.execute(f"DELETE FROM {MANIFEST_TABLE} WHERE dataset = ?", [dataset])
+
+
+def pending_files(con: Any, dataset: str, paths: Iterable[str | Path]) -> list[tuple[Path, str]]:
+    """Files not loaded yet, with their checksums
+
+    A file whose path, size and mtime match the manifest is skipped without being read, so
+    re-running on unchanged input costs a single manifest query. A file that was touched or
+    copied but whose contents were already loaded is re-stamped and skipped as well.
+    """
+    ensure_manifest(con)
+    rows = con.execute(f"SELECT path, size, mtime_ns, checksum FROM {MANIFEST_TABLE} WHERE dataset = ?", [dataset])
+    manifest = rows.fetchall()
+    stamps = {(path, size, mtime_ns) for path, size, mtime_ns, _ in manifest}
+    checksums = {checksum for *_, checksum in manifest}
+
+    pending = []
+    for path in map(Path, paths):
+        stat = path.stat()
+        if (str(path.resolve()), stat.st_size, stat.st_mtime_ns) in stamps:
+            continue
+        checksum = file_checksum(path)
+        if checksum in checksums:
+            record_file(con, dataset, path, checksum, rows_loaded=0)
+            continue
+        checksums.add(checksum)
+        pending.append((path, checksum))
+    return pending
+
+
+def record_file(con: Any, dataset: str, path: Path, checksum: str, rows_loaded: int) -> None:
+    """Add a loaded file to the manifest together with the table's new watermark"""
+    stat = path.stat()
+    con.execute(
+        f"INSERT INTO {MANIFEST_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            dataset,
+            str(path.resolve()),
+            stat.st_size,
+            stat.st_mtime_ns,
+            checksum,
+            rows_loaded,
+            watermark(con, dataset),
+            time.strftime("%Y-%m-%dT%H:%M:%S"),
+        ],
+    )
+
+
+def watermark(con: Any, dataset: str) -> str | None:
+    """Latest order date in the table, as an ISO date string"""
+    (value,) = con.execute(f"SELECT max({DATASETS[dataset].date}) FROM {dataset}").fetchone()
+    return None if value is None else str(value)[:10]
+
+
+def new_rows(con: Any, dataset: str, table: pa.Table, chunk_size: int = 500) -> pa.Table:
+    """Rows of a cleaned extract (see `Pipeline.run`) that are not in the table yet
+
+    Rows are deduplicated on the dataset key against the table and within the batch, whatever
+    their date, so overlapping extracts and late-arriving rows load exactly once. Only the
+    batch's own keys are looked up, `chunk_size` at a time, so the cost follows the batch
+    rather than the table.
+    """
+    spec = DATASETS[dataset]
+    keys = pc.unique(table[spec.key].drop_null()).to_pylist()
+    existing: list[Any] = []
+    for start in range(0, len(keys), chunk_size):
+        chunk = keys[start : start + chunk_size]
+        placeholders = ", ".join("?" * len(chunk))
+        rows = con.execute(f"SELECT {spec.key} FROM {dataset} WHERE {spec.key} IN ({placeholders})", chunk)
+        existing += [key for (key,) in rows.fetchall()]
+    if existing:
+        stored = pa.array(existing, type=table.schema.field(spec.key).type)
+        table = table.filter(pc.invert(pc.is_in(table[spec.key], value_set=stored)))
+
+    # Keep the first row of every key
+    first = table.append_column("_row", pa.array(range(table.num_rows), pa.int64()))
+    rows = first.group_by(spec.key, use_threads=False).aggregate([("_row", "min")])["_row_min"]
+    return table.take(rows.take(pc.sort_indices(rows)))
@@ -0,0 +1,27 @@
+from collections.abc import Sequence
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import Generation
+
+from dapgpt.cache import ResponseCache, make_key, normalize_query, response_cache
+
+
+class LangChainResponseCache(BaseCache):
+    """Expose a ResponseCache to LangChain, e.g. `set_llm_cache(LangChainResponseCache())`"""
+
+    def __init__(self, cache: ResponseCache = response_cache):
+        self.cache = cache
+
+    def lookup(self, prompt: str, llm_string: str) -> RETURN_VAL_TYPE | None:
+        """Look up cached generations for a prompt and LLM configuration"""
+        value = self.cache.get(make_key("langchain", normalize_query(prompt), llm_string))
+        return loads(value) if value is not None else None
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        """Cache the generations for a prompt and LLM configuration"""
+        self.cache.put(make_key("langchain", normalize_query(prompt), llm_string), dumps(list(return_val)))
+
+    def clear(self, **kwargs: object) -> None:
+        """Clear the underlying response cache"""
+        self.cache.clear()
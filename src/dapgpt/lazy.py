@@ -0,0 +1,35 @@
+import importlib
+import sys
+from types import ModuleType
+from typing import Any
+
+
+class LazyModule(ModuleType):
+    """Stand-in for a module that imports it on first attribute access
+
+    After the import the module's namespace is copied in, so later lookups cost the same as
+    on the module itself; attributes the module gains afterwards (e.g. submodules imported
+    later) are still forwarded.
+    """
+
+    def __getattr__(self, name: str) -> Any:
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, name)
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Module `name`, imported when one of its attributes is first used rather than now
+
+    Use it for heavy dependencies that not every entry point needs. Type checkers should
+    still see the real module, so import it for them and lazily at runtime:
+
+        if TYPE_CHECKING:
+            import pandas as pd
+        else:
+            pd = lazy_import("pandas")
+
+    Modules doing so should start with `from __future__ import annotations`, since
+    evaluating an annotation such as `pd.DataFrame` counts as a use.
+    """
+    return sys.modules.get(name) or LazyModule(name)
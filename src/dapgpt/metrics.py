@@ -0,0 +1,197 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_span: contextvars.ContextVar["Span | None"] = contextvars.ContextVar("dapgpt_span", default=None)
+
+
+@dataclass
+class Span:
+    """One timed unit of work (an LLM call, a tool call, an agent step, ...)"""
+
+    name: str
+    kind: str
+    span_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    parent_id: str | None = None
+    trace_id: str | None = None
+    start: float = field(default_factory=time.time)
+    duration_s: float | None = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    retries: int = 0
+    error: str | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    _t0: float = field(default_factory=time.perf_counter, repr=False)
+
+    @property
+    def elapsed_s(self) -> float:
+        """Seconds since the span started (its duration once finished)"""
+        return time.perf_counter() - self._t0 if self.duration_s is None else self.duration_s
+
+
+def current_span() -> Span | None:
+    """The span active in the current thread or task, if any"""
+    return _current_span.get()
+
+
+class MetricsRecorder:
+    """Collects spans, appends them to a JSONL file and keeps Prometheus-style aggregates
+
+    Spans nest automatically: a span started while another is active (in the same thread
+    or task) becomes its child. Aggregates can be written to a textfile-collector file or
+    served over HTTP with `serve`.
+    """
+
+    def __init__(
+        self,
+        jsonl_path: str | Path | None = None,
+        prom_path: str | Path | None = None,
+        prom_interval: float = 5.0,
+    ):
+        self.jsonl_path = Path(jsonl_path) if jsonl_path else None
+        self.prom_path = Path(prom_path) if prom_path else None
+        # The textfile is rewritten at most every `prom_interval` seconds
+        self.prom_interval = prom_interval
+        self._prom_written = 0.0
+        self._lock = threading.Lock()
+        self._jsonl = None
+        self._counts: dict[tuple[str, str], int] = defaultdict(int)
+        self._errors: dict[tuple[str, str], int] = defaultdict(int)
+        self._seconds: dict[tuple[str, str], float] = defaultdict(float)
+        self._buckets: dict[tuple[str, str], list[int]] = defaultdict(lambda: [0] * len(LATENCY_BUCKETS))
+        self._tokens: dict[str, int] = defaultdict(int)
+        self._retries = 0
+        if self.jsonl_path:
+            self.jsonl_path.parent.mkdir(parents=True, exist_ok=True)
+            self._jsonl = self.jsonl_path.open("a", buffering=1)
+
+    def start(self, name: str, kind: str, parent: Span | None = None, **attributes: Any) -> Span:
+        """Start a span; its parent defaults to the currently active span"""
+        parent = parent or _current_span.get()
+        span = Span(name=name, kind=kind, attributes=attributes)
+        span.parent_id = parent.span_id if parent else None
+        span.trace_id = parent.trace_id if parent else span.span_id
+        return span
+
+    def finish(self, span: Span, error: BaseException | str | None = None) -> None:
+        """Close a span, write it out and fold it into the aggregates"""
+        span.duration_s = span.elapsed_s
+        if error is not None:
+            span.error = str(error) or type(error).__name__
+        key = (span.kind, span.name)
+        with self._lock:
+            self._counts[key] += 1
+            self._seconds[key] += span.duration_s
+            self._errors[key] += span.error is not None
+            buckets = self._buckets[key]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if span.duration_s <= bound:
+                    buckets[i] += 1
+            self._tokens["prompt"] += span.prompt_tokens
+            self._tokens["completion"] += span.completion_tokens
+            self._retries += span.retries
+            if self._jsonl is not None:
+                record = {k: v for k, v in asdict(span).items() if k != "_t0"}
+                self._jsonl.write(json.dumps(record, default=str) + "\n")
+            flush_prom = self.prom_path is not None and time.monotonic() - self._prom_written >= self.prom_interval
+            if flush_prom:
+                self._prom_written = time.monotonic()
+        if flush_prom:
+            self.write_prometheus()
+
+    @contextmanager
+    def span(self, name: str, kind: str = "step", **attributes: Any) -> Iterator[Span]:
+        """Time a block as a span nested under the active one"""
+        span = self.start(name, kind, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            _current_span.reset(token)
+            self.finish(span, e)
+            raise
+        _current_span.reset(token)
+        self.finish(span)
+
+    def record_retry(self, span: Span | None = None) -> None:
+        """Count a retry against the given (or active) span"""
+        span = span or _current_span.get()
+        if span is not None:
+            span.retries += 1
+        else:
+            with self._lock:
+                self._retries += 1
+
+    def prometheus_text(self) -> str:
+        """Aggregates in the Prometheus text exposition format"""
+        lines = [
+            "# HELP dapgpt_span_seconds Wall time of LLM calls, tool calls and agent steps",
+            "# TYPE dapgpt_span_seconds histogram",
+        ]
+        with self._lock:
+            for (kind, name), count in sorted(self._counts.items()):
+                labels = f'kind="{kind}",name="{_escape(name)}"'
+                for bound, n in zip(LATENCY_BUCKETS, self._buckets[(kind, name)]):
+                    lines.append(f'dapgpt_span_seconds_bucket{{{labels},le="{bound}"}} {n}')
+                lines.append(f'dapgpt_span_seconds_bucket{{{labels},le="+Inf"}} {count}')
+                lines.append(f"dapgpt_span_seconds_sum{{{labels}}} {self._seconds[(kind, name)]:.6f}")
+                lines.append(f"dapgpt_span_seconds_count{{{labels}}} {count}")
+            lines += ["# HELP dapgpt_span_errors_total Spans that ended with an error", "# TYPE dapgpt_span_errors_total counter"]
+            for (kind, name), errors in sorted(self._errors.items()):
+                lines.append(f'dapgpt_span_errors_total{{kind="{kind}",name="{_escape(name)}"}} {errors}')
+            lines += ["# HELP dapgpt_tokens_total LLM tokens used", "# TYPE dapgpt_tokens_total counter"]
+            for token_type in ("prompt", "completion"):
+                lines.append(f'dapgpt_tokens_total{{type="{token_type}"}} {self._tokens[token_type]}')
+            lines += ["# HELP dapgpt_retries_total Retried LLM calls", "# TYPE dapgpt_retries_total counter"]
+            lines.append(f"dapgpt_retries_total {self._retries}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str | Path | None = None) -> None:
+        """Atomically write the aggregates to a node-exporter textfile"""
+        path = Path(path) if path else self.prom_path
+        if path is None:
+            return
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp_path.write_text(self.prometheus_text())
+        tmp_path.replace(path)
+
+    def serve(self, port: int = 9464, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serve /metrics on a background thread"""
+        recorder = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+                pass
+
+            def do_GET(self) -> None:
+                body = recorder.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Process-wide recorder; set DAPGPT_METRICS_JSONL / DAPGPT_METRICS_PROM to persist spans and aggregates
+metrics = MetricsRecorder(jsonl_path=os.getenv("DAPGPT_METRICS_JSONL"), prom_path=os.getenv("DAPGPT_METRICS_PROM"))
@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from dapgpt.cleaning import NULL_STRINGS, literal, quote
+from dapgpt.lazy import lazy_import
+from dapgpt.profile import DatasetProfile, ProfileCache, profile_cache
+from dapgpt.sampling import sample_rows
+
+if TYPE_CHECKING:
+    import duckdb
+    import pandas as pd
+    import pyarrow as pa
+else:
+    duckdb = lazy_import("duckdb")
+    pd = lazy_import("pandas")
+    pa = lazy_import("pyarrow")
+
+# DuckDB types profiled like pandas' numeric columns; everything else is described as categorical
+_NUMERIC = {
+    "TINYINT",
+    "SMALLINT",
+    "INTEGER",
+    "BIGINT",
+    "HUGEINT",
+    "UTINYINT",
+    "USMALLINT",
+    "UINTEGER",
+    "UBIGINT",
+    "UHUGEINT",
+    "FLOAT",
+    "DOUBLE",
+}
+
+
+def spool_upload(upload: Any, directory: str | Path | None = None, chunk_size: int = 8 << 20) -> tuple[Path, str]:
+    """Copy an upload (anything file-like, e.g. a Streamlit UploadedFile) to disk in chunks
+
+    Returns the file and the hash of its bytes; the file is named after the hash, so the same
+    upload is only written once.
+    """
+    directory = Path(directory or os.getenv("DAPGPT_SPOOL_DIR") or Path(tempfile.gettempdir()) / "dapgpt-uploads")
+    directory.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.blake2b(digest_size=16)
+    # Write to a temporary file first so a concurrent session never queries a partial upload
+    tmp_path = directory / f"upload.{os.getpid()}.{threading.get_ident()}.tmp"
+    upload.seek(0)
+    with open(tmp_path, "wb") as f:
+        while chunk := upload.read(chunk_size):
+            digest.update(chunk)
+            f.write(chunk)
+    key = digest.hexdigest()
+    path = directory / f"{key}.csv"
+    if path.exists():
+        tmp_path.unlink()
+    else:
+        tmp_path.replace(path)
+    return path, key
+
+
+class CSVDataset:
+    """A CSV file on disk that DuckDB queries in place, for data that doesn't fit in memory
+
+    Every query streams the file, so memory stays within DuckDB's `memory_limit` (hash
+    aggregates spill to disk) no matter how large the file is. `profile` builds the same
+    DatasetProfile the agent gets for a DataFrame from a few aggregate scans.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        fingerprint: str | None = None,
+        memory_limit: str | None = None,
+        threads: int | None = None,
+    ):
+        self.path = Path(path)
+        self.fingerprint = fingerprint or self.path.stem
+        config: dict[str, Any] = {"preserve_insertion_order": False}
+        if memory_limit:
+            config["memory_limit"] = memory_limit
+        if threads:
+            config["threads"] = threads
+        self._con = duckdb.connect(config=config)
+        # Like pandas.read_csv: its missing-value strings, and dates, times and booleans kept as text
+        nulls = ", ".join(literal(value) for value in NULL_STRINGS)
+        options = f"header = true, nullstr = [{nulls}], auto_type_candidates = ['BIGINT', 'DOUBLE', 'VARCHAR']"
+        source = f"read_csv({literal(str(self.path))}, {options}"
+        self._con.execute(f"CREATE VIEW data AS SELECT * FROM {source})")
+        dtypes = self._con.execute("DESCRIBE data").fetchall()
+        # DuckDB also reads hex ("0x1f") as integers, pandas keeps the text
+        integers = [name for name, dtype, *_ in dtypes if dtype == "BIGINT"]
+        if integers:
+            checks = ", ".join(f"bool_or(lower(trim({quote(name)})) SIMILAR TO '-?0x.*')" for name in integers)
+            head = f"SELECT * FROM {source}, all_varchar = true) LIMIT 20480"
+            [sniffed] = self._con.execute(f"SELECT {checks} FROM ({head})").fetchall()
+            hex_columns = [name for name, is_hex in zip(integers, sniffed) if is_hex]
+            if hex_columns:
+                types = ", ".join(f"{literal(name)}: 'VARCHAR'" for name in hex_columns)
+                self._con.execute(f"CREATE OR REPLACE VIEW data AS SELECT * FROM {source}, types = {{{types}}})")
+        self.dtypes = {name: dtype for name, dtype, *_ in self._con.execute("DESCRIBE data").fetchall()}
+        self._rows: int | None = None
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        if self._rows is None:
+            self._rows = self.query("SELECT count(*) AS n FROM data")["n"][0].as_py()
+        return self._rows, len(self.dtypes)
+
+    def query(self, sql: str) -> pa.Table:
+        """Run a query against the `data` view and return its result as Arrow"""
+        # One cursor per call, so sessions on different threads can query concurrently
+        with self._con.cursor() as cursor:
+            return cursor.execute(sql).fetch_arrow_table()
+
+    def head(self, n: int = 5) -> pd.DataFrame:
+        """The first rows, read with a LIMIT query"""
+        return self.query(f"SELECT * FROM data LIMIT {int(n)}").to_pandas()
+
+    def column_stats(self, candidates: int = 10) -> dict[str, dict[str, float | str]]:
+        """describe()-style statistics computed by streaming aggregates
+
+        Numeric columns get count, mean, std, min, approximate quartiles and max;
+        other columns get count, unique, and the most frequent (top) of the `candidates` values
+        an approximate top-k sketch finds, by their exact frequencies (freq).
+        """
+        aggregates: list[str] = ["count(*)"]
+        for name, dtype in self.dtypes.items():
+            col = quote(name)
+            if dtype in _NUMERIC:
+                aggregates += [
+                    f"count({col})",
+                    f"avg({col}::DOUBLE)",
+                    f"stddev_samp({col}::DOUBLE)",
+                    f"min({col})::DOUBLE",
+                    f"approx_quantile({col}::DOUBLE, [0.25, 0.5, 0.75])",
+                    f"max({col})::DOUBLE",
+                ]
+            else:
+                top_k = f"approx_top_k({col}::VARCHAR, {int(candidates)})"
+                aggregates += [f"count({col})", f"count(DISTINCT {col})", top_k]
+        with self._con.cursor() as cursor:
+            [row] = cursor.execute(f"SELECT {', '.join(aggregates)} FROM data").fetchall()
+        values = list(row)
+        self._rows = values.pop(0)
+
+        stats: dict[str, dict[str, float | str]] = {}
+        tops: dict[str, list[str]] = {}
+        for name, dtype in self.dtypes.items():
+            if dtype in _NUMERIC:
+                count, mean, std, low, quartiles, high = values[:6]
+                del values[:6]
+                column = {"count": count, "mean": mean, "std": std, "min": low, "max": high}
+                column.update(zip(("25%", "50%", "75%"), quartiles or ()))
+            else:
+                count, unique, top = values[:3]
+                del values[:3]
+                column = {"count": count, "unique": unique}
+                if top:
+                    tops[name] = top
+            stats[name] = {
+                stat: float(value) if isinstance(value, int | float) else value
+                for stat, value in column.items()
+                if value is not None
+            }
+
+        if tops:
+            counts = ", ".join(
+                f"count(*) FILTER (WHERE {quote(name)}::VARCHAR = {literal(value)})"
+                for name, values in tops.items()
+                for value in values
+            )
+            with self._con.cursor() as cursor:
+                [row] = cursor.execute(f"SELECT {counts} FROM data").fetchall()
+            freqs = iter(row)
+            for name, values in tops.items():
+                freq, top = max((next(freqs), value) for value in values)
+                stats[name].update(top=top, freq=float(freq))
+        return stats
+
+    def sample(self, n: int = 10, strategy: str = "outliers", seed: int = 0, candidates: int = 10_000) -> pd.DataFrame:
+        """Representative rows (see `sampling.sample_rows`) picked from a reservoir sample of `candidates` rows
+
+        For the outliers strategy the rows holding each numeric column's minimum and maximum
+        (found with min_by/max_by) are added to the candidates.
+        """
+        sql = f"SELECT * FROM data USING SAMPLE reservoir({int(candidates)} ROWS) REPEATABLE ({int(seed)})"
+        numeric = [quote(name) for name, dtype in self.dtypes.items() if dtype in _NUMERIC]
+        if strategy == "outliers" and numeric:
+            extremes = ", ".join(f"{side}_by(d, d.{col})" for col in numeric for side in ("min", "max"))
+            sql = (
+                f"SELECT unnest(row, recursive := false) FROM (SELECT unnest([{extremes}]) AS row FROM data AS d) "
+                f"WHERE row IS NOT NULL UNION ALL ({sql})"
+            )
+        rows = self.query(sql).to_pandas()
+        return sample_rows(rows, n=n, strategy=strategy, seed=seed)
+
+    def profile(self, sample_size: int = 10, sample_strategy: str = "outliers") -> DatasetProfile:
+        """The agent's dataset context, without loading the data"""
+        stats = self.column_stats()
+        return DatasetProfile(
+            fingerprint=self.fingerprint,
+            shape=self.shape,
+            dtypes=dict(self.dtypes),
+            stats=stats,
+            sample=self.sample(sample_size, sample_strategy).to_csv(index=False),
+            sampling=f"{sample_strategy}{sample_size}",
+        )
+
+    def cached_profile(self, cache: ProfileCache = profile_cache) -> DatasetProfile:
+        """The profile from `cache`, computed with the cache's sampling settings on a miss"""
+        return cache.get_or_build(self.fingerprint, lambda: self.profile(cache.sample_size, cache.sample_strategy))
+
+    def close(self) -> None:
+        self._con.close()
+
+
+# Open uploads, least recently used first; DAPGPT_OUT_OF_CORE_UPLOADS sets how many are kept
+MAX_OPEN_UPLOADS = int(os.getenv("DAPGPT_OUT_OF_CORE_UPLOADS", "8"))
+_datasets: OrderedDict[str, CSVDataset] = OrderedDict()
+_file_ids: dict[str, str] = {}
+# Every upload dataset still alive, including evicted ones a session or background task holds on to
+_live: weakref.WeakValueDictionary[str, CSVDataset] = weakref.WeakValueDictionary()
+# Reentrant: the last reference to an evicted dataset may be dropped while the lock is held
+_datasets_lock = threading.RLock()
+
+
+def _discard_spool(key: str, path: Path) -> None:
+    """Delete an upload's spooled file once no dataset uses it any more"""
+    with _datasets_lock:
+        if key not in _datasets and key not in _live:
+            path.unlink(missing_ok=True)
+
+
+def open_upload(upload: Any, directory: str | Path | None = None) -> CSVDataset:
+    """The process-wide CSVDataset of an upload, spooling it to disk the first time it is seen
+
+    Uploads are recognized by Streamlit's `file_id` on reruns and by their content hash
+    across sessions. DAPGPT_DUCKDB_MEMORY_LIMIT and DAPGPT_DUCKDB_THREADS cap what DuckDB
+    uses for the queries. Beyond MAX_OPEN_UPLOADS the least recently opened dataset leaves
+    the registry; it keeps working for whoever still holds it, and its connection is closed
+    and its spooled file deleted once nobody does.
+    """
+    file_id = getattr(upload, "file_id", None)
+    with _datasets_lock:
+        key = _file_ids.get(file_id) if file_id else None
+        if key is not None and key in _datasets:
+            _datasets.move_to_end(key)
+            return _datasets[key]
+
+    while True:
+        path, key = spool_upload(upload, directory)
+        with _datasets_lock:
+            dataset = _datasets.get(key) or _live.get(key)
+            # The spooled file may have been deleted by an evicted dataset going away since it was written
+            if dataset is None and path.exists():
+                threads = os.getenv("DAPGPT_DUCKDB_THREADS")
+                dataset = CSVDataset(
+                    path,
+                    key,
+                    memory_limit=os.getenv("DAPGPT_DUCKDB_MEMORY_LIMIT"),
+                    threads=int(threads) if threads else None,
+                )
+                _live[key] = dataset
+                weakref.finalize(dataset, _discard_spool, key, path).atexit = False
+            if dataset is not None:
+                break
+    with _datasets_lock:
+        if file_id:
+            _file_ids[file_id] = key
+        _datasets[key] = dataset
+        _datasets.move_to_end(key)
+        # Keep the newest dataset even if the limit is below one
+        evicted = []
+        while len(_datasets) > max(MAX_OPEN_UPLOADS, 1):
+            evicted.append(_datasets.popitem(last=False)[0])
+        if evicted:
+            live = set(_datasets)
+            for stale in [other for other, k in _file_ids.items() if k not in live]:
+                del _file_ids[stale]
+    return dataset
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+from dapgpt.lazy import lazy_import
+from dapgpt.metrics import metrics
+from dapgpt.outofcore import CSVDataset
+from dapgpt.profile import DatasetProfile
+from dapgpt.prompt import build_context
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from dapgpt.agent import DataAnalysisAgent
+else:
+    pd = lazy_import("pandas")
+
+
+class ProfilePrefetcher:
+    """Profiles datasets in background threads as soon as they are uploaded, ahead of the first question
+
+    `submit` returns a future of the agent's DatasetProfile; the profile also lands in the
+    agent's profile cache. The worker builds a throwaway prompt context as well, which loads
+    the model's tokenizer. Sessions that submit the same dataset object (the upload cache
+    shares it) share one future. `cancel` drops a session's interest: the task is cancelled
+    once nobody waits for it and it hasn't started yet, and a running task finishes into
+    the cache. `result` records whether the profile was ready when the question came.
+    """
+
+    def __init__(self, max_workers: int = 2):
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="dapgpt-prefetch")
+        self._lock = threading.Lock()
+        # id of the dataset -> its future and the number of sessions waiting for it
+        self._inflight: dict[int, tuple[Future, int]] = {}
+        self._counters: dict[str, float] = dict.fromkeys(
+            ["submitted", "shared", "cancelled", "ready", "waited", "missed"], 0
+        )
+        self._counters["wait_s"] = 0.0
+
+    def submit(self, agent: DataAnalysisAgent, data: pd.DataFrame | CSVDataset) -> Future[DatasetProfile]:
+        """Start profiling `data` for `agent` in the background"""
+        key = id(data)
+        with self._lock:
+            if key in self._inflight:
+                future, holders = self._inflight[key]
+                self._inflight[key] = (future, holders + 1)
+                self._counters["shared"] += 1
+                return future
+            future = self._executor.submit(self._profile, agent, data)
+            self._inflight[key] = (future, 1)
+            self._counters["submitted"] += 1
+        # The dataset (and so its id) is kept alive by the task until it is done
+        future.add_done_callback(lambda _: self._forget(key, future))
+        return future
+
+    def cancel(self, future: Future) -> bool:
+        """Drop one session's interest in a prefetch; whether the task was cancelled"""
+        with self._lock:
+            key = next((k for k, (f, _) in self._inflight.items() if f is future), None)
+            if key is None:
+                return False
+            _, holders = self._inflight[key]
+            if holders > 1:
+                self._inflight[key] = (future, holders - 1)
+                return False
+        # Outside the lock: cancelling runs the done callback, which takes it
+        cancelled = future.cancel()
+        with self._lock:
+            self._counters["cancelled"] += cancelled
+        return cancelled
+
+    def result(self, future: Future[DatasetProfile], timeout: float | None = None) -> DatasetProfile | None:
+        """Wait for a prefetched profile; None if the prefetch was cancelled or failed, so the caller profiles itself"""
+        ready = future.done()
+        t0 = time.perf_counter()
+        try:
+            profile = future.result(timeout)
+        except Exception:
+            profile = None
+        with self._lock:
+            self._counters["missed" if profile is None else "ready" if ready else "waited"] += 1
+            self._counters["wait_s"] += time.perf_counter() - t0
+        return profile
+
+    def stats(self) -> dict[str, float]:
+        """Submitted, shared and cancelled prefetches, how many were ready, awaited or missing when asked for"""
+        with self._lock:
+            return {"inflight": len(self._inflight), **self._counters}
+
+    def _profile(self, agent: DataAnalysisAgent, data: pd.DataFrame | CSVDataset) -> DatasetProfile:
+        with metrics.span("profile", kind="prefetch"):
+            profile = agent._profile(data)
+            build_context(profile, "", agent.token_budget, agent.model)
+        return profile
+
+    def _forget(self, key: int, future: Future) -> None:
+        with self._lock:
+            if self._inflight.get(key, (None,))[0] is future:
+                del self._inflight[key]
+
+
+# Process-wide workers shared by every Streamlit session; DAPGPT_PREFETCH_WORKERS sets how many
+profile_prefetcher = ProfilePrefetcher(max_workers=int(os.getenv("DAPGPT_PREFETCH_WORKERS", "2")))
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import numbers
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from dapgpt.lazy import lazy_import
+from dapgpt.sampling import sample_rows
+
+if TYPE_CHECKING:
+    import pandas as pd
+else:
+    pd = lazy_import("pandas")
+
+
+@dataclass(frozen=True)
+class DatasetProfile:
+    """Precomputed dataset context used to build the agent prompts"""
+
+    fingerprint: str
+    shape: tuple[int, int]
+    dtypes: dict[str, str]
+    stats: dict[str, dict[str, float | str]]
+    sample: str
+    sampling: str
+
+    @property
+    def key(self) -> str:
+        """Cache key: the content fingerprint plus the sampling settings used for the sample rows"""
+        return self.make_key(self.fingerprint, self.sampling)
+
+    @staticmethod
+    def make_key(fingerprint: str, sampling: str) -> str:
+        """The `key` of a profile with this fingerprint and sampling, without building it"""
+        return f"{fingerprint}-{sampling}"
+
+
+def fingerprint(df: pd.DataFrame) -> str:
+    """Content fingerprint of a DataFrame
+
+    Hashes the schema, the shape and every row (index included), so editing any value
+    changes it and cached profiles and answers are never served for stale data.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(df.shape).encode())
+    digest.update(json.dumps([[str(col), str(dtype)] for col, dtype in df.dtypes.items()]).encode())
+    if len(df):
+        digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def column_stats(df: pd.DataFrame) -> dict[str, dict[str, float | str]]:
+    """Per-column describe() statistics (numeric and categorical) as plain Python values"""
+    if df.columns.empty:
+        return {}
+    described = df.describe(include="all")
+    return {
+        str(col): {
+            str(stat): float(value) if isinstance(value, numbers.Real) else str(value)
+            for stat, value in described[col].items()
+            if pd.notna(value)
+        }
+        for col in described.columns
+    }
+
+
+def build_profile(
+    df: pd.DataFrame,
+    key: str | None = None,
+    sample_size: int = 10,
+    sample_strategy: str = "outliers",
+) -> DatasetProfile:
+    """Compute the dataset profile from scratch"""
+    return DatasetProfile(
+        fingerprint=key or fingerprint(df),
+        shape=df.shape,
+        dtypes={str(col): str(df[col].dtype) for col in df.columns},
+        stats=column_stats(df),
+        sample=sample_rows(df, n=sample_size, strategy=sample_strategy).to_csv(index=False),
+        sampling=f"{sample_strategy}{sample_size}",
+    )
+
+
+class ProfileCache:
+    """LRU cache of dataset profiles keyed by content fingerprint, with an optional on-disk tier"""
+
+    def __init__(
+        self,
+        maxsize: int = 32,
+        directory: str | Path | None = None,
+        sample_size: int = 10,
+        sample_strategy: str = "outliers",
+    ):
+        self.maxsize = maxsize
+        self.sample_size = sample_size
+        self.sample_strategy = sample_strategy
+        self.directory = Path(directory) if directory else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, DatasetProfile] = OrderedDict()
+        self._lock = threading.Lock()
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def get_or_compute(self, df: pd.DataFrame) -> DatasetProfile:
+        """Return the cached profile for df, profiling it only on a miss"""
+        key = fingerprint(df)
+        return self.get_or_build(key, lambda: build_profile(df, key, self.sample_size, self.sample_strategy))
+
+    def get_or_build(self, fingerprint: str, build: Callable[[], DatasetProfile]) -> DatasetProfile:
+        """Return the cached profile of a dataset fingerprint, calling `build` only on a miss"""
+        profile = self.get(DatasetProfile.make_key(fingerprint, f"{self.sample_strategy}{self.sample_size}"))
+        if profile is None:
+            profile = build()
+            self.put(profile)
+        return profile
+
+    def get(self, key: str) -> DatasetProfile | None:
+        """Look up a profile in memory first, then on disk"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        profile = self._read(key)
+        with self._lock:
+            if profile is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(profile)
+        return profile
+
+    def put(self, profile: DatasetProfile) -> None:
+        """Store a profile in memory and, when configured, on disk"""
+        with self._lock:
+            self._remember(profile)
+        self._write(profile)
+
+    def clear(self) -> None:
+        """Drop all in-memory entries and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+    def _remember(self, profile: DatasetProfile) -> None:
+        self._entries[profile.key] = profile
+        self._entries.move_to_end(profile.key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _path(self, key: str) -> Path | None:
+        return self.directory / f"{key}.json" if self.directory else None
+
+    def _read(self, key: str) -> DatasetProfile | None:
+        path = self._path(key)
+        if path is None or not path.exists():
+            return None
+        try:
+            data = json.loads(path.read_text())
+            data["shape"] = tuple(data["shape"])
+            return DatasetProfile(**data)
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+
+    def _write(self, profile: DatasetProfile) -> None:
+        path = self._path(profile.key)
+        if path is None:
+            return
+        # Write to a temporary file first so concurrent readers never see a partial profile
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(json.dumps(asdict(profile)))
+        tmp_path.replace(path)
+
+
+# Process-wide cache shared by every agent instance (e.g. across Streamlit reruns)
+profile_cache = ProfileCache(directory=os.getenv("DAPGPT_PROFILE_CACHE_DIR"))
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import io
+import json
+import re
+from dataclasses import dataclass, field
+from functools import cached_property, lru_cache
+from typing import TYPE_CHECKING, Any
+
+from dapgpt.lazy import lazy_import
+from dapgpt.profile import DatasetProfile
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import tiktoken
+else:
+    pd = lazy_import("pandas")
+    tiktoken = lazy_import("tiktoken")
+
+NUMERIC_STATS = ("count", "mean", "std", "min", "25%", "50%", "75%", "max")
+CATEGORICAL_STATS = ("count", "unique", "top", "freq")
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str) -> Any:
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # tiktoken fetches its BPE files on first use; remember the failure instead of retrying per call
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4") -> int:
+    """Count tokens with the model's tokenizer, falling back to ~4 characters per token"""
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _fmt(value: float | str) -> str:
+    if isinstance(value, float):
+        return f"{value:.0f}" if value.is_integer() and abs(value) < 1e15 else f"{value:.4g}"
+    return str(value).replace("|", "/")
+
+
+def _stats_line(name: str, dtype: str, stats: dict[str, float | str]) -> str:
+    if "mean" in stats:
+        values = [stats.get(stat, "") for stat in NUMERIC_STATS]
+    else:
+        values = [stats.get(stat, "") for stat in CATEGORICAL_STATS] + [""] * (len(NUMERIC_STATS) - len(CATEGORICAL_STATS))
+    return "|".join([name, dtype, *(_fmt(value) for value in values)])
+
+
+def column_priority(profile: DatasetProfile, query: str) -> list[str]:
+    """Columns ordered by relevance: those mentioned in the query first, then dataset order"""
+    text = " ".join(query.casefold().split())
+
+    def mentioned(col: str) -> bool:
+        name = col.casefold()
+        return any(re.search(rf"(?<!\w){re.escape(form)}(?!\w)", text) for form in {name, name.replace("_", " ")})
+
+    columns = list(profile.dtypes)
+    return [col for col in columns if mentioned(col)] + [col for col in columns if not mentioned(col)]
+
+
+@dataclass
+class PromptContext:
+    """Compact dataset context for a prompt, together with its token accounting
+
+    The baseline (what the verbose encoding would cost) is counted on first access to
+    `baseline_tokens` or `saved_tokens`, so requests that don't report savings skip it.
+    """
+
+    schema: str
+    statistics: str
+    sample: str
+    tokens: int
+    dropped_columns: list[str] = field(default_factory=list)
+    profile: DatasetProfile | None = field(default=None, repr=False, compare=False)
+    model: str = "gpt-4"
+
+    @cached_property
+    def baseline_tokens(self) -> int:
+        return baseline_tokens(self.profile, self.model) if self.profile is not None else self.tokens
+
+    @property
+    def saved_tokens(self) -> int:
+        return max(0, self.baseline_tokens - self.tokens)
+
+
+def baseline_tokens(profile: DatasetProfile, model: str = "gpt-4") -> int:
+    """Tokens the original verbose encoding (indented JSON schema, describe() and sample tables) would use"""
+    numeric = {col: stats for col, stats in profile.stats.items() if "mean" in stats}
+    describe = pd.DataFrame(numeric).to_string() if numeric else ""
+    sample = pd.read_csv(io.StringIO(profile.sample)).to_string() if profile.sample.strip() else ""
+    return count_tokens(json.dumps(profile.dtypes, indent=2) + describe + sample, model)
+
+
+def build_context(profile: DatasetProfile, query: str, token_budget: int = 3000, model: str = "gpt-4") -> PromptContext:
+    """Serialize the profile as pipe-separated tables that fit within `token_budget` tokens
+
+    Columns are taken in priority order (see `column_priority`). Each gets a full statistics
+    row while the budget allows, then just a name|dtype schema entry, and whatever still does
+    not fit is summarized as a count. Sample rows are added last, restricted to the columns
+    with statistics.
+    """
+    schema_lines: list[str] = []
+    stats_lines: list[str] = ["column|dtype|" + "|".join(NUMERIC_STATS) + " (categorical: count|unique|top|freq)"]
+    stats_columns: list[str] = []
+    dropped: list[str] = []
+    used = count_tokens(stats_lines[0], model)
+    # Statistics get up to 60% of the budget and schema entries up to 80%, leaving the rest
+    # (minus room for the dropped-columns summary) for sample rows
+    stats_budget = token_budget * 3 // 5
+    schema_budget = token_budget * 4 // 5 - 32
+
+    for col in column_priority(profile, query):
+        dtype = profile.dtypes[col]
+        line = _stats_line(col, dtype, profile.stats.get(col, {}))
+        cost = count_tokens(line, model) + 1
+        if used + cost <= stats_budget:
+            stats_lines.append(line)
+            stats_columns.append(col)
+            used += cost
+            continue
+        entry = f"{col}|{dtype}"
+        cost = count_tokens(entry, model) + 1
+        if used + cost <= schema_budget:
+            schema_lines.append(entry)
+            used += cost
+        else:
+            dropped.append(col)
+
+    if dropped:
+        dtypes = pd.Series([profile.dtypes[col] for col in dropped]).value_counts()
+        summary = f"... {len(dropped)} more columns (" + ", ".join(f"{n} {dtype}" for dtype, n in dtypes.items()) + ")"
+        schema_lines.append(summary)
+        used += count_tokens(summary, model)
+
+    sample_lines: list[str] = []
+    if profile.sample.strip() and stats_columns:
+        sample = pd.read_csv(io.StringIO(profile.sample), usecols=stats_columns)[stats_columns]
+        rows = sample.to_csv(index=False, float_format="%.4g").splitlines()
+        for row in rows:
+            cost = count_tokens(row, model) + 1
+            if used + cost > token_budget:
+                break
+            sample_lines.append(row)
+            used += cost
+        if len(sample_lines) == 1:
+            sample_lines = []
+
+    return PromptContext(
+        schema="\n".join(schema_lines),
+        statistics="\n".join(stats_lines) if stats_columns else "",
+        sample="\n".join(sample_lines),
+        tokens=used,
+        dropped_columns=dropped,
+        profile=profile,
+        model=model,
+    )
@@ -0,0 +1,102 @@
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable
+from typing import Any
+
+from dapgpt.cache import make_key
+
+# Quoted string literals and identifiers, which normalization must leave untouched
+_QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+_READ_ONLY = re.compile(r"^\s*\(*\s*(select|with|values|show|describe|explain)\b", re.IGNORECASE)
+# Functions whose result changes between runs of the same query
+_VOLATILE = re.compile(r"\b(random|uuid|gen_random_uuid|now|current_date|current_time|current_timestamp|today)\b")
+
+
+def normalize_sql(query: str) -> str:
+    """Collapse whitespace and case outside quotes and drop trailing semicolons
+
+    String literals keep their case, so `WHERE category = 'Books'` and
+    `WHERE category = 'books'` stay different queries.
+    """
+    parts = _QUOTED.split(query.strip().rstrip(";").strip())
+    return "".join(part if i % 2 else re.sub(r"\s+", " ", part).casefold() for i, part in enumerate(parts))
+
+
+def is_cacheable(query: str) -> bool:
+    """Whether a query only reads data and is deterministic, i.e. its result may be cached"""
+    text = normalize_sql(query)
+    unquoted = _QUOTED.sub("''", text)
+    return _READ_ONLY.match(text) is not None and ";" not in unquoted and _VOLATILE.search(unquoted) is None
+
+
+def is_single_statement(query: str) -> bool:
+    """Whether a query holds one statement: no ';' outside quoted text, except a trailing one"""
+    return ";" not in _QUOTED.sub("''", query.strip().rstrip(";"))
+
+
+def referenced_tables(query: str, tables: Iterable[str]) -> list[str]:
+    """The tables out of `tables` a query mentions, matched on whole words"""
+    text = normalize_sql(query).casefold()
+    return sorted(table for table in tables if re.search(rf"\b{re.escape(table.casefold())}\b", text))
+
+
+class QueryResultCache:
+    """LRU of SQL query results keyed on the normalized query and the data versions of its tables
+
+    Loaders bump a table's version after committing a write (see `dapgpt.catalog`), so a
+    result computed before a reload is never looked up again. Callers must read the versions
+    before executing the query: a result is then stored under versions at most as new as the
+    data it was computed from.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(database: str, query: str, versions: dict[str, int], *options: Any) -> str:
+        """Cache key of a query against given table versions"""
+        return make_key("sql", database, normalize_sql(query), sorted(versions.items()), *options)
+
+    def get(self, key: str) -> Any | None:
+        """Return the cached result for key, or None on a miss"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def put(self, key: str, result: Any) -> None:
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict[str, float]:
+        """Hit/miss counters, hit rate and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+
+# Process-wide cache shared by the SQL chains, tools and agents
+query_cache = QueryResultCache()
@@ -0,0 +1,280 @@
+import contextlib
+import json
+import os
+import re
+import threading
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import Any, Literal
+
+import pyarrow as pa
+import sqlalchemy as sa
+from langchain_community.utilities import SQLDatabase
+
+from dapgpt.metrics import metrics
+from dapgpt.results import ResultSummary, fetch_arrow, fetch_batches
+
+_SELECT = re.compile(r"^\s*\(*\s*(select|with|values)\b", re.IGNORECASE)
+# Plan operators that output every pair of input rows; DuckDB doesn't estimate them itself
+_PRODUCTS = {"CROSS_PRODUCT", "NESTED_LOOP_JOIN", "BLOCKWISE_NL_JOIN"}
+
+
+def is_select(sql: str) -> bool:
+    """Whether a statement is a query (SELECT, WITH or VALUES)"""
+    return _SELECT.match(sql) is not None
+
+
+class QueryRejected(sa.exc.SQLAlchemyError):
+    """A query the guard refused or stopped; the SQL tools hand the message back to the agent"""
+
+
+@dataclass
+class GuardDecision:
+    """What the guard does with a query: "allow" it, "limit" its result or "reject" it"""
+
+    action: str
+    sql: str
+    estimated_rows: int | None = None
+    reason: str = ""
+
+
+def plan_rows(node: dict[str, Any]) -> tuple[int, int]:
+    """Estimated output rows of a DuckDB JSON plan node, and the most rows any join below it produces"""
+    children = [plan_rows(child) for child in node.get("children", [])]
+    info = node.get("extra_info", {})
+    estimate = info.get("Estimated Cardinality")
+    if estimate is not None:
+        rows = int(estimate)
+    elif node["name"] in _PRODUCTS:
+        rows = 1
+        for child_rows, _ in children:
+            rows *= child_rows
+    elif node["name"] == "UNGROUPED_AGGREGATE":
+        rows = 1
+    elif node["name"] == "TOP_N" and str(info.get("Top", "")).isdigit():
+        rows = int(info["Top"])
+    else:
+        rows = max((child_rows for child_rows, _ in children), default=0)
+    joins = [peak for _, peak in children]
+    if node["name"] in _PRODUCTS or "JOIN" in node["name"]:
+        joins.append(rows)
+    return rows, max(joins, default=0)
+
+
+class QueryGuard:
+    """Checks generated SQL before it runs and bounds how long it runs and how much it returns
+
+    On DuckDB, EXPLAIN estimates the rows of every operator in the plan; queries where a join
+    or the result exceeds `max_estimated_rows` (e.g. a cross join of two large tables) are
+    rejected with a message asking for filters or aggregation. Scans and aggregates over
+    large tables are fine, as long as what they return stays within the budget. Other
+    dialects don't estimate cardinality and are only limited. SELECTs are wrapped in a
+    LIMIT of `max_result_rows`, so an unbounded `SELECT *` can't flood the agent's context,
+    and statements running longer than `timeout` seconds are interrupted. Every decision
+    is recorded as a "query_guard" span by the metrics recorder.
+    """
+
+    def __init__(
+        self,
+        max_estimated_rows: int | None = 10_000_000,
+        max_result_rows: int | None = 100,
+        timeout: float | None = 30.0,
+    ):
+        self.max_estimated_rows = max_estimated_rows
+        self.max_result_rows = max_result_rows
+        self.timeout = timeout
+        # Held while a timer interrupts a connection, so a stopped timer never interrupts one being returned
+        self._lock = threading.Lock()
+
+    def estimate(self, engine: sa.Engine, sql: str, limit: int | None = None) -> int | None:
+        """Rows the query's largest join or its result (capped at `limit`) is expected to have, or None if unknown"""
+        if engine.dialect.name != "duckdb":
+            return None
+        try:
+            with engine.connect() as connection:
+                rows = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}").fetchall()
+        except sa.exc.DBAPIError:
+            # Invalid SQL fails again when it runs, with the error the agent needs to see
+            return None
+        estimated = 0
+        for node in json.loads(rows[0][1]):
+            output, joins = plan_rows(node)
+            estimated = max(estimated, joins, output if limit is None else min(output, limit))
+        return estimated
+
+    def decide(self, engine: sa.Engine, sql: str, limit: bool = True) -> GuardDecision:
+        if not is_select(sql):
+            return GuardDecision("allow", sql, reason="not a SELECT")
+        body = sql.strip().rstrip(";")
+        limited = limit and self.max_result_rows is not None
+        estimated = self.estimate(engine, body, self.max_result_rows if limited else None)
+        if self.max_estimated_rows is not None and estimated is not None and estimated > self.max_estimated_rows:
+            return GuardDecision(
+                "reject",
+                sql,
+                estimated,
+                f"the query is estimated to produce {estimated:,} rows in a join or its result, over the budget "
+                f"of {self.max_estimated_rows:,}; filter the tables, join on keys or aggregate before joining",
+            )
+        if not limited:
+            return GuardDecision("allow", sql, estimated)
+        limited_sql = f"SELECT * FROM (\n{body}\n) AS guarded LIMIT {self.max_result_rows}"
+        return GuardDecision("limit", limited_sql, estimated, f"result capped at {self.max_result_rows} rows")
+
+    def review(self, engine: sa.Engine, sql: str, limit: bool = True) -> str:
+        """The SQL to run in place of `sql`; raises QueryRejected if it must not run
+
+        Pass `limit=False` when the caller bounds the result itself (e.g. by summarizing it).
+        """
+        span = metrics.start("review", kind="query_guard")
+        decision = self.decide(engine, sql, limit)
+        span.name = decision.action
+        span.attributes.update(sql=sql, estimated_rows=decision.estimated_rows, reason=decision.reason)
+        metrics.finish(span)
+        if decision.action == "reject":
+            raise QueryRejected(f"Query rejected: {decision.reason}")
+        return decision.sql
+
+    def install(self, engine: sa.Engine) -> None:
+        """Interrupt statements on `engine` that run longer than `timeout`
+
+        The timer runs until the result is fetched (see `connect`), the next statement, or
+        until the connection is returned to the pool, so fetching the result counts too:
+        DuckDB computes streamed results as they are fetched.
+        """
+        timeout = self.timeout
+        if timeout is None:
+            return
+
+        def start_timer(conn: sa.Connection, cursor: Any, statement: str, *args: Any) -> None:
+            self._stop(conn.info)
+            timer = threading.Timer(timeout, self._interrupt, (conn.info, conn.connection.dbapi_connection, statement))
+            timer.daemon = True
+            conn.info["query_guard_timer"] = timer
+            timer.start()
+
+        def checkin(dbapi_connection: Any, record: Any) -> None:
+            self._stop(record.info)
+
+        def timed_out(context: sa.engine.ExceptionContext) -> None:
+            if context.connection is None:
+                return
+            self.raise_if_interrupted(context.connection, context.original_exception)
+
+        sa.event.listen(engine, "before_cursor_execute", start_timer)
+        sa.event.listen(engine, "checkin", checkin)
+        sa.event.listen(engine, "handle_error", timed_out)
+
+    def raise_if_interrupted(self, connection: sa.Connection, error: BaseException) -> None:
+        """Raise QueryRejected from `error` if the timeout interrupted the connection's statement"""
+        if self._stop(connection.info):
+            raise QueryRejected(
+                f"Query interrupted after {self.timeout:g}s; make it cheaper, e.g. filter or aggregate earlier"
+            ) from error
+
+    @contextlib.contextmanager
+    def connect(self, engine: sa.Engine) -> Iterator[sa.Connection]:
+        """A connection of `engine` on which a statement the timeout interrupts raises QueryRejected
+
+        Use it to fetch results from the driver's cursor: SQLAlchemy doesn't see errors raised
+        there, e.g. by DuckDB's `fetch_record_batch`. The timeout stops when the block ends.
+        """
+        with engine.connect() as connection:
+            try:
+                yield connection
+            except QueryRejected:
+                raise
+            except Exception as e:
+                self.raise_if_interrupted(connection, e)
+                raise
+            finally:
+                self._stop(connection.info)
+
+    def _stop(self, info: dict[Any, Any]) -> bool:
+        """Cancel a connection's timer and clear its timed-out flag; returns whether the timer had fired"""
+        with self._lock:
+            timer = info.pop("query_guard_timer", None)
+            timed_out = info.pop("query_guard_timed_out", False)
+        if timer is not None:
+            timer.cancel()
+        return bool(timed_out)
+
+    def _interrupt(self, info: dict[Any, Any], dbapi_connection: Any, statement: str) -> None:
+        with self._lock:
+            # A timer stopped while it was about to fire leaves the connection alone
+            if info.get("query_guard_timer") is not threading.current_thread():
+                return
+            info["query_guard_timed_out"] = True
+            span = metrics.start("timeout", kind="query_guard", sql=statement, timeout=self.timeout)
+            # DuckDB's and sqlite3's connections can be interrupted from another thread
+            if dbapi_connection is not None:
+                dbapi_connection.interrupt()
+            metrics.finish(span)
+
+
+class GuardedSQLDatabase(SQLDatabase):
+    """SQLDatabase whose `run` (and so the SQL tools and chains) goes through a QueryGuard
+
+    SELECT results are fetched as Arrow and returned as a `ResultSummary` text of at most
+    `summary_tokens` tokens instead of the repr of a list of tuples; `summary_tokens=None`
+    restores the stock output.
+    """
+
+    def __init__(
+        self, engine: sa.Engine, guard: QueryGuard | None = None, summary_tokens: int | None = 800, **kwargs: Any
+    ):
+        super().__init__(engine, **kwargs)
+        self.guard = guard
+        self.summary_tokens = summary_tokens
+
+    @property
+    def engine(self) -> sa.Engine:
+        """The engine queries run on, without the guard"""
+        return self._engine
+
+    def run(
+        self,
+        command: Any,
+        fetch: Literal["all", "one", "cursor"] = "all",
+        include_columns: bool = False,
+        *,
+        parameters: dict[str, Any] | None = None,
+        execution_options: dict[str, Any] | None = None,
+    ) -> Any:
+        summary_tokens = (
+            self.summary_tokens
+            if isinstance(command, str)
+            and fetch == "all"
+            and not include_columns
+            and not parameters
+            and not execution_options
+            and is_select(command)
+            else None
+        )
+        if self.guard is not None and isinstance(command, str) and fetch in ("all", "one"):
+            # A summary is bounded by its token budget, so it may aggregate over the whole result
+            command = self.guard.review(self._engine, command, limit=summary_tokens is None)
+        if summary_tokens is not None:
+            with self._connect() as connection:
+                summary = ResultSummary.from_batches(fetch_batches(connection, command))
+            return summary.to_text(summary_tokens)
+        return super().run(command, fetch, include_columns, parameters=parameters, execution_options=execution_options)
+
+    def run_arrow(self, command: str) -> pa.Table:
+        """A query's result as an Arrow table, e.g. for `results.to_pandas`; the guard's result limit applies"""
+        if self.guard is not None:
+            command = self.guard.review(self._engine, command)
+        with self._connect() as connection:
+            return fetch_arrow(connection, command)
+
+    def _connect(self) -> contextlib.AbstractContextManager[sa.Connection]:
+        return self.guard.connect(self._engine) if self.guard is not None else self._engine.connect()
+
+
+# Process-wide guard; DAPGPT_QUERY_MAX_ESTIMATED_ROWS, DAPGPT_QUERY_MAX_RESULT_ROWS and
+# DAPGPT_QUERY_TIMEOUT override the limits
+query_guard = QueryGuard(
+    max_estimated_rows=int(os.getenv("DAPGPT_QUERY_MAX_ESTIMATED_ROWS", "10000000")),
+    max_result_rows=int(os.getenv("DAPGPT_QUERY_MAX_RESULT_ROWS", "100")),
+    timeout=float(os.getenv("DAPGPT_QUERY_TIMEOUT", "30")),
+)
@@ -0,0 +1,52 @@
+import asyncio
+import random
+import time
+from collections.abc import Awaitable, Callable
+
+
+class TokenBucket:
+    """Async token bucket limiting how many requests can start per second
+
+    The bucket holds up to `capacity` tokens and refills at `rate` tokens per second;
+    each request takes one token and waits when the bucket is empty. `clock` and `sleep`
+    default to the monotonic clock and `asyncio.sleep`.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: int | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.capacity)
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def per_minute(cls, requests_per_minute: float, capacity: int | None = None) -> "TokenBucket":
+        """Build a bucket from a requests-per-minute quota"""
+        return cls(requests_per_minute / 60, capacity)
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it"""
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await self._sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """Exponential backoff with full jitter for the given retry attempt (0-based)"""
+    return random.uniform(0, min(cap, base * 2**attempt))  # noqa: S311
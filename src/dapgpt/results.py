@@ -0,0 +1,170 @@
+from collections.abc import Iterator, Sequence
+from typing import Any
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import sqlalchemy as sa
+
+from dapgpt.prompt import count_tokens
+
+
+class ResultConversionError(sa.exc.SQLAlchemyError):
+    """A result whose rows don't fit the Arrow types inferred for its columns"""
+
+
+def _arrays(rows: Sequence[Any], types: list[pa.DataType | None]) -> list[pa.Array]:
+    # Column types are inferred from the first batch and then fixed, so every batch has one schema.
+    # Columns that are all NULL there, or mix types (SQLite allows both), become text.
+    arrays = []
+    for i, values in enumerate(zip(*rows)):
+        type_ = types[i]
+        if type_ is None:
+            try:
+                inferred = pa.array(values).type
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                inferred = pa.null()
+            type_ = types[i] = pa.string() if pa.types.is_null(inferred) else inferred
+        if pa.types.is_string(type_):
+            values = tuple(value if value is None or isinstance(value, str) else str(value) for value in values)
+        arrays.append(pa.array(values, type=type_))
+    return arrays
+
+
+def fetch_batches(bind: sa.Engine | sa.Connection, sql: str, batch_size: int = 65_536) -> Iterator[pa.RecordBatch]:
+    """Stream a query's result as Arrow record batches
+
+    DuckDB hands over its result as Arrow directly; other drivers' rows are transposed into
+    columns one batch at a time, typed like the first batch (see ResultConversionError).
+    The statement runs through the engine (or on the given connection), so its event hooks
+    (e.g. the query guard's timeout) apply.
+    """
+    if isinstance(bind, sa.Engine):
+        with bind.connect() as connection:
+            yield from fetch_batches(connection, sql, batch_size)
+        return
+    result = bind.exec_driver_sql(sql)
+    if result.cursor is None or result.cursor.description is None:
+        return
+    if bind.dialect.name == "duckdb":
+        yield from result.cursor.fetch_record_batch(batch_size)
+        return
+    names = [column[0] for column in result.cursor.description]
+    types: list[pa.DataType | None] = [None] * len(names)
+    while rows := result.cursor.fetchmany(batch_size):
+        try:
+            arrays = _arrays(rows, types)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as error:
+            raise ResultConversionError(f"Result column types changed between rows: {error}") from error
+        yield pa.RecordBatch.from_arrays(arrays, names=names)
+
+
+def fetch_arrow(bind: sa.Engine | sa.Connection, sql: str) -> pa.Table:
+    """A query's whole result as an Arrow table"""
+    batches = list(fetch_batches(bind, sql))
+    return pa.Table.from_batches(batches) if batches else pa.table({})
+
+
+def to_pandas(table: pa.Table) -> pd.DataFrame:
+    """DataFrame backed by the Arrow buffers (no copy), e.g. for `st.dataframe`"""
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def _fmt(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.0f}" if value.is_integer() and abs(value) < 1e15 else f"{value:.4g}"
+    return str(value).replace("|", "/").replace("\n", " ")
+
+
+class ResultSummary:
+    """Row count, per-column aggregates and the first rows of a result, built batch by batch
+
+    Only `keep_rows` rows are held in memory, so arbitrarily large results can be summarized.
+    """
+
+    def __init__(self, schema: pa.Schema | None = None, keep_rows: int = 200):
+        self.schema = schema
+        self.keep_rows = keep_rows
+        self.rows = 0
+        self.head: list[pa.RecordBatch] = []
+        self.stats: dict[str, dict[str, Any]] = {}
+
+    @classmethod
+    def from_batches(cls, batches: Iterator[pa.RecordBatch], keep_rows: int = 200) -> "ResultSummary":
+        summary = cls(keep_rows=keep_rows)
+        for batch in batches:
+            summary.update(batch)
+        return summary
+
+    def update(self, batch: pa.RecordBatch) -> None:
+        if self.schema is None:
+            self.schema = batch.schema
+        kept = sum(head.num_rows for head in self.head)
+        if kept < self.keep_rows:
+            self.head.append(batch.slice(0, self.keep_rows - kept))
+        self.rows += batch.num_rows
+
+        for name, column in zip(batch.schema.names, batch.columns):
+            stats = self.stats.setdefault(name, {"count": 0, "min": None, "max": None})
+            stats["count"] += len(column) - column.null_count
+            if column.null_count == len(column) or not _orderable(column.type):
+                continue
+            min_max = pc.min_max(column)
+            low, high = min_max["min"].as_py(), min_max["max"].as_py()
+            stats["min"] = low if stats["min"] is None else min(stats["min"], low)
+            stats["max"] = high if stats["max"] is None else max(stats["max"], high)
+            if pa.types.is_integer(column.type) or pa.types.is_floating(column.type):
+                stats["sum"] = stats.get("sum", 0) + (pc.sum(column).as_py() or 0)
+
+    def table(self) -> pa.Table:
+        """The rows kept from the start of the result"""
+        if self.schema is None:
+            return pa.table({})
+        return pa.Table.from_batches(self.head, schema=self.schema)
+
+    def to_text(self, max_tokens: int = 800, model: str = "gpt-4") -> str:
+        """Pipe-separated text for an LLM within `max_tokens`
+
+        A result that fits is listed in full. Otherwise the row count and per-column
+        aggregates come first, followed by as many leading rows as the budget allows.
+        """
+        if self.schema is None:
+            return ""
+        header = "|".join(self.schema.names)
+        lines = ["|".join(_fmt(value) for value in row.values()) for row in self.table().to_pylist()]
+        full = "\n".join([header, *lines])
+        if self.rows == len(lines) and count_tokens(full, model) <= max_tokens:
+            return full
+
+        parts = [f"{self.rows} rows x {len(self.schema)} columns", "column|type|non-null|min|max|mean"]
+        for field in self.schema:
+            stats = self.stats.get(field.name, {"count": 0})
+            mean = stats["sum"] / stats["count"] if "sum" in stats and stats["count"] else None
+            values = (stats["count"], stats.get("min"), stats.get("max"), mean)
+            parts.append("|".join([field.name, str(field.type), *(_fmt(value) for value in values)]))
+        parts += ["", "first rows:", header]
+        used = count_tokens("\n".join(parts), model) + 16
+        shown = 0
+        for line in lines:
+            cost = count_tokens(line, model) + 1
+            if used + cost > max_tokens:
+                break
+            parts.append(line)
+            used += cost
+            shown += 1
+        parts.append(f"(showing {shown} of {self.rows} rows)")
+        return "\n".join(parts)
+
+
+def _orderable(type_: pa.DataType) -> bool:
+    return (
+        pa.types.is_integer(type_)
+        or pa.types.is_floating(type_)
+        or pa.types.is_decimal(type_)
+        or pa.types.is_temporal(type_)
+        or pa.types.is_string(type_)
+        or pa.types.is_large_string(type_)
+        or pa.types.is_boolean(type_)
+    )
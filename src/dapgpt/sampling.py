@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
+from typing import TYPE_CHECKING
+
+from dapgpt.lazy import lazy_import
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+else:
+    np = lazy_import("numpy")
+    pd = lazy_import("pandas")
+
+STRATEGIES = ("reservoir", "stratified", "outliers")
+
+
+class _BottomK:
+    """Keeps the k rows with the smallest random keys seen so far (a one-pass reservoir sample)"""
+
+    def __init__(self, k: int):
+        self.k = k
+        self.keys = np.empty(0)
+        self.positions = np.empty(0, dtype=np.int64)
+        self.rows: pd.DataFrame | None = None
+
+    def update(self, chunk: pd.DataFrame, keys: np.ndarray, positions: np.ndarray) -> None:
+        if self.k <= 0 or not len(chunk):
+            return
+        # Only rows that beat the current k-th smallest key can enter the sample
+        if len(self.keys) >= self.k:
+            candidates = keys < self.keys.max()
+            chunk, keys, positions = chunk[candidates], keys[candidates], positions[candidates]
+            if not len(chunk):
+                return
+
+        rows = chunk if self.rows is None else pd.concat([self.rows, chunk])
+        keys = np.concatenate([self.keys, keys])
+        positions = np.concatenate([self.positions, positions])
+        if len(keys) > self.k:
+            keep = np.argpartition(keys, self.k - 1)[: self.k]
+            rows, keys, positions = rows.iloc[keep], keys[keep], positions[keep]
+        self.rows, self.keys, self.positions = rows, keys, positions
+
+    def take(self, k: int, exclude: set[int] | None = None) -> tuple[pd.DataFrame | None, np.ndarray]:
+        """The k lowest-key rows, optionally skipping some row positions"""
+        if self.rows is None:
+            return None, np.empty(0, dtype=np.int64)
+        order = np.argsort(self.keys, kind="stable")
+        if exclude:
+            order = order[~np.isin(self.positions[order], list(exclude))]
+        order = order[:k]
+        return self.rows.iloc[order], self.positions[order]
+
+
+def _chunks(data: pd.DataFrame | Iterable[pd.DataFrame], chunksize: int) -> Iterator[pd.DataFrame]:
+    if isinstance(data, pd.DataFrame):
+        for start in range(0, len(data), chunksize):
+            yield data.iloc[start : start + chunksize]
+    else:
+        yield from data
+
+
+def _allocate(counts: dict, n: int) -> dict:
+    """Split n rows across strata proportionally to their size, giving every stratum at least one row"""
+    strata = sorted(counts, key=lambda s: counts[s], reverse=True)
+    if len(strata) >= n:
+        return dict.fromkeys(strata[:n], 1)
+
+    total = sum(counts.values())
+    remaining = n - len(strata)
+    shares = {s: remaining * counts[s] / total for s in strata}
+    quotas = {s: 1 + int(shares[s]) for s in strata}
+    leftover = n - sum(quotas.values())
+    for s in sorted(strata, key=lambda s: shares[s] - int(shares[s]), reverse=True)[:leftover]:
+        quotas[s] += 1
+    return {s: min(q, counts[s]) for s, q in quotas.items()}
+
+
+def _default_stratum_column(chunk: pd.DataFrame) -> str | None:
+    """Lowest-cardinality categorical column of the first chunk"""
+    candidates = chunk.select_dtypes(include=["object", "category", "string", "bool"]).columns
+    if not len(candidates):
+        return None
+    return min(candidates, key=lambda col: chunk[col].nunique(dropna=False))
+
+
+def sample_rows(
+    data: pd.DataFrame | Iterable[pd.DataFrame],
+    n: int = 10,
+    strategy: str = "reservoir",
+    seed: int = 0,
+    stratify_by: str | None = None,
+    chunksize: int = 100_000,
+) -> pd.DataFrame:
+    """Pick a fixed-size representative sample of rows in a single pass
+
+    `data` is either a DataFrame or an iterable of DataFrame chunks (e.g. `pd.read_csv(...,
+    chunksize=...)`), so frames larger than memory can be sampled while holding at most one
+    chunk plus the sample. Strategies:
+
+    - reservoir: uniform random rows
+    - stratified: rows allocated proportionally across the values of `stratify_by`
+      (defaults to the lowest-cardinality categorical column)
+    - outliers: the rows holding each numeric column's minimum and maximum (up to half of
+      the sample), topped up with uniform random rows
+
+    The same seed and chunking always return the same rows, in their original order.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown sampling strategy {strategy!r}, expected one of {STRATEGIES}")
+
+    rng = np.random.default_rng(seed)
+    reservoir = _BottomK(n)
+    strata: dict = {}
+    counts: dict = {}
+    extremes: dict[tuple[str, str], tuple[float, int, pd.DataFrame]] = {}
+    offset = 0
+    columns = None
+
+    for chunk in _chunks(data, chunksize):
+        if columns is None:
+            columns = chunk.columns
+            if strategy == "stratified" and stratify_by is None:
+                stratify_by = _default_stratum_column(chunk)
+        keys = rng.random(len(chunk))
+        positions = np.arange(offset, offset + len(chunk))
+        offset += len(chunk)
+
+        if strategy == "stratified" and stratify_by is not None:
+            for value, idx in chunk.groupby(stratify_by, observed=True, dropna=False, sort=False).indices.items():
+                counts[value] = counts.get(value, 0) + len(idx)
+                strata.setdefault(value, _BottomK(n)).update(chunk.iloc[idx], keys[idx], positions[idx])
+        else:
+            reservoir.update(chunk, keys, positions)
+
+        if strategy == "outliers" and len(chunk):
+            numeric = chunk.select_dtypes(include="number")
+            values = numeric.to_numpy(dtype=float, na_value=np.nan)
+            for j, col in enumerate(numeric.columns):
+                column = values[:, j]
+                if np.isnan(column).all():
+                    continue
+                for side, pos in (("min", np.nanargmin(column)), ("max", np.nanargmax(column))):
+                    value = column[pos]
+                    best = extremes.get((col, side))
+                    if best is None or (value < best[0] if side == "min" else value > best[0]):
+                        extremes[(col, side)] = (value, positions[pos], chunk.iloc[[int(pos)]])
+
+    if columns is None:
+        # No rows: an empty frame keeps the columns and dtypes, so the prompt still shows the schema
+        return data.iloc[0:0] if isinstance(data, pd.DataFrame) else pd.DataFrame()
+
+    parts: list[pd.DataFrame | None] = []
+    picked: list[np.ndarray] = []
+    if strategy == "stratified" and strata:
+        for value, quota in _allocate(counts, n).items():
+            rows, positions = strata[value].take(quota)
+            parts.append(rows)
+            picked.append(positions)
+    else:
+        chosen: dict[int, pd.DataFrame] = {}
+        for _, position, row in extremes.values():
+            if len(chosen) >= n // 2:
+                break
+            chosen.setdefault(int(position), row)
+        rows, positions = reservoir.take(n - len(chosen), exclude=set(chosen))
+        parts.extend([*chosen.values(), rows])
+        picked.extend([np.array(list(chosen), dtype=np.int64), positions])
+
+    kept = [part for part in parts if part is not None]
+    if not kept:
+        return pd.DataFrame(columns=columns)
+    sample = pd.concat(kept)
+    order = np.argsort(np.concatenate(picked), kind="stable")
+    return sample.iloc[order]
+
+
+def sample_csv(path: str, n: int = 10, strategy: str = "reservoir", seed: int = 0, chunksize: int = 100_000) -> pd.DataFrame:
+    """Sample a CSV file without loading it, reading it in chunks of `chunksize` rows"""
+    with pd.read_csv(path, chunksize=chunksize) as reader:
+        return sample_rows(reader, n=n, strategy=strategy, seed=seed)
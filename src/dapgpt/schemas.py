@@ -0,0 +1,116 @@
+from dataclasses import dataclass
+
+from dapgpt.cleaning import DropNulls, ParseDate, ParseTime, Pipeline, Rule
+
+# Logical column types -> column types per backend
+TYPES = {
+    "duckdb": {
+        "text": "VARCHAR",
+        "integer": "INTEGER",
+        "float": "FLOAT",
+        "date": "DATE",
+        "time": "TIME",
+        "boolean": "BOOLEAN",
+    },
+    "sqlite": {
+        "text": "TEXT",
+        "integer": "INTEGER",
+        "float": "REAL",
+        "date": "DATE",
+        "time": "TIME",
+        "boolean": "INTEGER",
+    },
+}
+
+
+@dataclass(frozen=True)
+class Column:
+    """A table column and the raw CSV column it is loaded from"""
+
+    name: str
+    source: str
+    type: str
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """Table layout, dedup key and cleaning rules of one dataset, shared by every backend"""
+
+    name: str
+    columns: tuple[Column, ...]
+    key: str
+    date: str = "order_date"
+    rules: tuple[Rule, ...] = ()
+
+    def column(self, name: str) -> Column:
+        """Look up a column by its table name"""
+        return next(column for column in self.columns if column.name == name)
+
+    def ddl(self, backend: str) -> str:
+        """CREATE TABLE statement for a backend ("duckdb" or "sqlite")"""
+        columns = ",\n".join(f"    {column.name} {TYPES[backend][column.type]}" for column in self.columns)
+        return f"CREATE TABLE IF NOT EXISTS {self.name} (\n{columns}\n)"
+
+    @property
+    def pipeline(self) -> Pipeline:
+        """The cleaning rules bound to the table's columns"""
+        return Pipeline(self.columns, self.rules)
+
+
+DATASETS = {
+    "amazon": Dataset(
+        name="amazon",
+        key="order_id",
+        rules=(DropNulls(), ParseDate("Order_Date"), ParseTime("Order_Time"), ParseTime("Pickup_Time")),
+        columns=(
+            Column("order_id", "Order_ID", "text"),
+            Column("agent_age", "Agent_Age", "integer"),
+            Column("agent_rating", "Agent_Rating", "float"),
+            Column("store_latitude", "Store_Latitude", "float"),
+            Column("store_longitude", "Store_Longitude", "float"),
+            Column("drop_latitude", "Drop_Latitude", "float"),
+            Column("drop_longitude", "Drop_Longitude", "float"),
+            Column("order_date", "Order_Date", "date"),
+            Column("order_time", "Order_Time", "time"),
+            Column("pickup_time", "Pickup_Time", "time"),
+            Column("weather", "Weather", "text"),
+            Column("traffic", "Traffic", "text"),
+            Column("vehicle", "Vehicle", "text"),
+            Column("area", "Area", "text"),
+            Column("delivery_time", "Delivery_Time", "integer"),
+            Column("category", "Category", "text"),
+        ),
+    ),
+    "zomato": Dataset(
+        name="zomato",
+        key="id",
+        rules=(
+            DropNulls(),
+            ParseDate("Order_Date", "%d-%m-%Y"),
+            ParseTime("Time_Orderd", ("%H:%M",)),
+            ParseTime("Time_Order_picked", ("%H:%M",)),
+        ),
+        columns=(
+            Column("id", "ID", "text"),
+            Column("delivery_person_id", "Delivery_person_ID", "text"),
+            Column("delivery_person_age", "Delivery_person_Age", "float"),
+            Column("delivery_person_ratings", "Delivery_person_Ratings", "float"),
+            Column("restaurant_latitude", "Restaurant_latitude", "float"),
+            Column("restaurant_longitude", "Restaurant_longitude", "float"),
+            Column("delivery_location_latitude", "Delivery_location_latitude", "float"),
+            Column("delivery_location_longitude", "Delivery_location_longitude", "float"),
+            Column("order_date", "Order_Date", "date"),
+            Column("time_ordered", "Time_Orderd", "time"),
+            Column("time_order_picked", "Time_Order_picked", "time"),
+            Column("weather_conditions", "Weather_conditions", "text"),
+            Column("road_traffic_density", "Road_traffic_density", "text"),
+            Column("vehicle_condition", "Vehicle_condition", "text"),
+            Column("type_of_order", "Type_of_order", "text"),
+            Column("type_of_vehicle", "Type_of_vehicle", "text"),
+            Column("multiple_deliveries", "multiple_deliveries", "float"),
+            Column("festival", "Festival", "boolean"),
+            Column("city", "City", "text"),
+            Column("time_taken", "Time_taken (min)", "integer"),
+        ),
+    ),
+}
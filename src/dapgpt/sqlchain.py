@@ -0,0 +1,146 @@
+import re
+import threading
+import time
+from dataclasses import dataclass
+from operator import itemgetter
+from typing import Any
+
+import sqlalchemy as sa
+from langchain.chains import create_sql_query_chain
+from langchain_community.agent_toolkits import create_sql_agent
+from langchain_community.tools.sql_database.tool import QuerySQLDataBaseTool
+from langchain_community.utilities import SQLDatabase
+from langchain_core.language_models import BaseChatModel
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import Runnable, RunnableConfig, RunnablePassthrough
+
+from dapgpt.metrics import metrics
+from dapgpt.query_cache import is_single_statement
+from dapgpt.query_guard import GuardedSQLDatabase, is_select
+
+ANSWER_PROMPT = """Given the following user question, corresponding SQL query, and SQL result, answer the user question.\n
+    Question: {question}\n
+    SQL Query: {query}\n
+    SQL Result: {result}\n
+    Answer:
+    """
+
+
+def build_sql_answer_chain(llm: BaseChatModel, db: SQLDatabase) -> Runnable:
+    """Question -> SQL query -> query result -> natural language answer, in two LLM calls"""
+    write_query = create_sql_query_chain(llm, db)
+    execute_query = QuerySQLDataBaseTool(db=db)
+    answer = PromptTemplate.from_template(ANSWER_PROMPT) | llm | StrOutputParser()
+    return RunnablePassthrough.assign(query=write_query).assign(result=itemgetter("query") | execute_query) | answer
+
+
+def extract_sql(text: str) -> str:
+    """The SQL statement in a query-writing completion, without code fences or SQLQuery:/SQLResult: labels"""
+    fenced = re.search(r"```(?:sql)?\s*(.*?)```", text, re.DOTALL | re.IGNORECASE)
+    if fenced:
+        text = fenced.group(1)
+    text = re.split(r"\bSQLResult:", text)[0]
+    return text.split("SQLQuery:")[-1].strip()
+
+
+def validate_sql(db: GuardedSQLDatabase, sql: str) -> str | None:
+    """Check a query without running it and return what is wrong with it, or None
+
+    Only a single SELECT passes; semicolons inside string literals and quoted names don't
+    count as statement separators. The database binds it with EXPLAIN, which fails on syntax
+    errors and on tables or columns that don't exist, without scanning any data.
+    """
+    if not is_select(sql) or not is_single_statement(sql):
+        return "not a single SELECT statement"
+    try:
+        with db.engine.connect() as connection:
+            connection.exec_driver_sql(f"EXPLAIN {sql.strip().rstrip(';')}")
+    except sa.exc.DBAPIError as e:
+        return str(e.orig)
+    return None
+
+
+@dataclass
+class HybridAnswer:
+    """An answer and how it was produced: "single_shot" (query chain) or "agent" (fallback)"""
+
+    question: str
+    answer: str
+    path: str
+    latency_s: float
+    sql: str | None = None
+    fallback_reason: str | None = None
+
+
+class HybridSQLExecutor:
+    """Answer with the two-call query chain first and escalate to the SQL agent only when it fails
+
+    The query chain writes SQL from the table info in its prompt (served from the schema
+    catalog with `open_sql_database`). The SQL is validated locally (see `validate_sql`) and
+    run through the database's guard; if it is invalid or errors, the question goes to the
+    multi-step agent, which lists tables, reads schemas and retries on its own. Every
+    question is recorded as an "sql_executor" span named after the path that served it, and
+    `stats()` estimates the time the fast path saved from the agent's mean latency.
+    """
+
+    def __init__(self, llm: BaseChatModel, db: GuardedSQLDatabase, agent: Runnable | None = None):
+        self.llm = llm
+        self.db = db
+        self.write_query = create_sql_query_chain(llm, db)
+        self.answer = PromptTemplate.from_template(ANSWER_PROMPT) | llm | StrOutputParser()
+        self._agent = agent
+        self._lock = threading.Lock()
+        self._counts = {"single_shot": 0, "agent": 0}
+        self._seconds = {"single_shot": 0.0, "agent": 0.0}
+        # Time spent in the agent alone, i.e. without the failed single-shot attempt
+        self._agent_seconds = 0.0
+
+    @property
+    def agent(self) -> Runnable:
+        if self._agent is None:
+            self._agent = create_sql_agent(self.llm, db=self.db, agent_type="tool-calling", top_k=100)
+        return self._agent
+
+    def invoke(self, question: str, config: RunnableConfig | None = None) -> HybridAnswer:
+        t0 = time.perf_counter()
+        with metrics.span("question", kind="sql_executor") as span:
+            sql = extract_sql(self.write_query.invoke({"question": question}, config=config))
+            reason = validate_sql(self.db, sql)
+            if reason is None:
+                result = self.db.run_no_throw(sql)
+                if isinstance(result, str) and result.startswith("Error:"):
+                    reason = result
+
+            if reason is None:
+                answer = self.answer.invoke({"question": question, "query": sql, "result": result}, config=config)
+                path = "single_shot"
+            else:
+                t_agent = time.perf_counter()
+                answer = self.agent.invoke({"input": question}, config=config)["output"]
+                path = "agent"
+                agent_seconds = time.perf_counter() - t_agent
+            span.name = path
+            span.attributes.update(sql=sql, fallback_reason=reason)
+
+        latency = time.perf_counter() - t0
+        with self._lock:
+            self._counts[path] += 1
+            self._seconds[path] += latency
+            if path == "agent":
+                self._agent_seconds += agent_seconds
+        return HybridAnswer(question, answer, path, latency, sql, reason)
+
+    def stats(self) -> dict[str, Any]:
+        """Questions and mean latency per path, and the estimated seconds saved by the fast path"""
+        with self._lock:
+            stats: dict[str, Any] = {
+                path: {"count": count, "mean_s": self._seconds[path] / count if count else None}
+                for path, count in self._counts.items()
+            }
+            single, agent = self._counts["single_shot"], self._counts["agent"]
+            stats["saved_s"] = None
+            if single and agent:
+                saved = self._agent_seconds / agent - self._seconds["single_shot"] / single
+                stats["saved_s"] = single * max(saved, 0.0)
+            return stats
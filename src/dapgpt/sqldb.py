@@ -0,0 +1,62 @@
+import threading
+from typing import Any
+
+import sqlalchemy as sa
+
+from dapgpt.catalog import CatalogSQLDatabase, catalog_for
+from dapgpt.duckdb_pool import configure_duckdb, pool_for
+from dapgpt.query_guard import GuardedSQLDatabase, query_guard
+
+# Databases opened with a catalog, with the table versions they were opened at
+_databases: dict[tuple[Any, ...], tuple[dict[str, int], GuardedSQLDatabase]] = {}
+_databases_lock = threading.Lock()
+
+
+def open_sql_database(uri: str, catalog: bool = True, **kwargs: Any) -> GuardedSQLDatabase:
+    """GuardedSQLDatabase over the loaded datasets
+
+    On DuckDB views are included, so datasets stored as Parquet partitions behind a view are
+    visible. Bookkeeping tables such as the load manifest (names starting with "_") are
+    hidden from the chains and agents. For database files, table info is served from the
+    schema catalog next to the file (see `dapgpt.catalog`) unless `catalog` is False.
+
+    DuckDB files are queried through the process-wide pool (see `dapgpt.duckdb_pool`), so
+    opening the database again, e.g. on every Streamlit rerun, only checks out a cursor.
+    Queries run through `run` (the SQL tools and chains) pass the process-wide query guard.
+    A database opened with its catalog is reused until a loader invalidates one of its
+    tables (see `catalog.invalidate`), so reopening it doesn't list and inspect the tables.
+    """
+    url = sa.make_url(uri)
+    key: tuple[Any, ...] | None = None
+    versions: dict[str, int] = {}
+    if catalog and url.database not in (None, "", ":memory:"):
+        versions = catalog_for(url.database).versions()
+        key = (url.render_as_string(hide_password=False), tuple(sorted(kwargs.items())))
+        try:
+            with _databases_lock:
+                opened = _databases.get(key)
+        except TypeError:
+            # Unhashable options (e.g. custom_table_info): not reused
+            key = opened = None
+        if opened is not None and opened[0] == versions:
+            return opened[1]
+
+    if url.get_backend_name() == "duckdb" and url.database not in (None, "", ":memory:"):
+        engine = sa.create_engine(url, creator=pool_for(url.database).sqlalchemy_connection, poolclass=sa.NullPool)
+    else:
+        engine = sa.create_engine(url)
+    if engine.dialect.name == "duckdb":
+        if url.database in (None, "", ":memory:"):
+            sa.event.listen(engine, "connect", lambda dbapi_connection, _: configure_duckdb(dbapi_connection))
+        kwargs.setdefault("view_support", True)
+    query_guard.install(engine)
+    internal = [name for name in sa.inspect(engine).get_table_names() if name.startswith("_")]
+    if catalog and engine.url.database not in (None, "", ":memory:"):
+        db = CatalogSQLDatabase(
+            engine, catalog_for(engine.url.database), guard=query_guard, ignore_tables=internal or None, **kwargs
+        )
+        if key is not None:
+            with _databases_lock:
+                _databases[key] = (versions, db)
+        return db
+    return GuardedSQLDatabase(engine, guard=query_guard, ignore_tables=internal or None, **kwargs)
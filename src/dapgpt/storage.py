@@ -0,0 +1,76 @@
+import shutil
+from pathlib import Path
+from typing import Any
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from dapgpt.cleaning import literal
+from dapgpt.schemas import TYPES, Dataset
+
+PARQUET_DIR = Path("data/parquet")
+
+
+def dataset_dir(root: str | Path, spec: Dataset) -> Path:
+    """Directory holding the Hive partitions of one dataset"""
+    return Path(root).resolve() / spec.name
+
+
+def write_partitions(
+    data: pa.Table | pa.RecordBatchReader, root: str | Path, spec: Dataset, basename: str
+) -> None:
+    """Append rows as Parquet files partitioned by the dataset's date (`<date>=YYYY-MM-DD/`)
+
+    Files are named after `basename` (e.g. the source file's checksum), so re-writing the
+    same batch replaces its files instead of duplicating them. Column min/max statistics are
+    written to every file footer, which lets readers skip files and row groups.
+    """
+    ds.write_dataset(
+        data,
+        dataset_dir(root, spec),
+        format="parquet",
+        partitioning=ds.partitioning(pa.schema([(spec.date, pa.date32())]), flavor="hive"),
+        basename_template=f"{basename}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        file_options=ds.ParquetFileFormat().make_write_options(compression="zstd", write_statistics=True),
+    )
+
+
+def create_view(con: Any, root: str | Path, spec: Dataset) -> None:
+    """(Re)create the dataset's DuckDB view over its Parquet partitions
+
+    The view keeps the table's column order and types, so `SQLDatabase.from_uri` and the
+    agents see the same schema as with a table. Filters on the date prune partitions and
+    only the referenced columns are read. Before any file exists the view is empty.
+    """
+    directory = dataset_dir(root, spec)
+    columns = ", ".join(
+        f"CAST({column.name} AS {TYPES['duckdb'][column.type]}) AS {column.name}" for column in spec.columns
+    )
+    if any(directory.glob("**/*.parquet")):
+        source = f"""read_parquet(
+            {literal(str(directory / "**" / "*.parquet"))},
+            hive_partitioning = true,
+            hive_types = {{{spec.date}: DATE}}
+        )"""
+        con.execute(f"CREATE OR REPLACE VIEW {spec.name} AS SELECT {columns} FROM {source}")
+    else:
+        empty = ", ".join(f"NULL::{TYPES['duckdb'][column.type]} AS {column.name}" for column in spec.columns)
+        con.execute(f"CREATE OR REPLACE VIEW {spec.name} AS SELECT {empty} LIMIT 0")
+
+
+def drop_partitions(root: str | Path, spec: Dataset) -> None:
+    """Delete every Parquet file of the dataset"""
+    shutil.rmtree(dataset_dir(root, spec), ignore_errors=True)
+
+
+def file_stats(con: Any, root: str | Path, spec: Dataset) -> Any:
+    """Row counts and min/max of every column per file and row group, read from the Parquet footers"""
+    return con.execute(
+        f"""
+        SELECT file_name, row_group_id, path_in_schema AS column_name, row_group_num_rows AS rows,
+               stats_min_value AS min, stats_max_value AS max
+        FROM parquet_metadata({literal(str(dataset_dir(root, spec) / "**" / "*.parquet"))})
+        ORDER BY ALL
+        """
+    ).df()
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any
+
+from dapgpt.cleaning import NULL_STRINGS
+from dapgpt.compact import CompactionReport, compact_frame
+from dapgpt.lazy import lazy_import
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pcsv
+else:
+    pd = lazy_import("pandas")
+    pa = lazy_import("pyarrow")
+    pc = lazy_import("pyarrow.compute")
+    pcsv = lazy_import("pyarrow.csv")
+
+
+def content_key(data: bytes) -> str:
+    """Hash of an upload's bytes"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def parse_csv(data: bytes) -> pd.DataFrame:
+    """Parse CSV bytes with Arrow's multithreaded reader into the DataFrame `pd.read_csv` would give
+
+    The bytes are wrapped in one Arrow buffer and parsed once, as text; each column is then
+    cast to the first of int64, float64 and bool that fits all its values. Dates, times and
+    hex integers (e.g. "0x1f"), which Arrow would infer, stay text as in pandas. Missing
+    values are the strings pandas treats as missing.
+    """
+    buffer = pa.py_buffer(data)
+    # The column names come from the header line alone
+    header = buffer.slice(0, data.find(b"\n") + 1) if b"\n" in data else buffer
+    names = pcsv.read_csv(pa.BufferReader(header)).column_names
+    convert_options = pcsv.ConvertOptions(
+        column_types=dict.fromkeys(names, pa.string()), null_values=NULL_STRINGS, strings_can_be_null=True
+    )
+    table = pcsv.read_csv(
+        pa.BufferReader(buffer), read_options=pcsv.ReadOptions(use_threads=True), convert_options=convert_options
+    )
+    for i, column in enumerate(table.columns):
+        table = table.set_column(i, table.field(i).name, _infer_type(column))
+    return table.to_pandas()
+
+
+def _infer_type(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    for type_ in (pa.int64(), pa.float64(), pa.bool_()):
+        try:
+            converted = column.cast(type_)
+        except pa.ArrowInvalid:
+            continue
+        # Arrow parses hex integers, pandas keeps them as text
+        if pa.types.is_integer(type_) and pc.any(pc.match_substring_regex(column, "^-?0[xX]")).as_py():
+            return column
+        return converted
+    return column
+
+
+class UploadCache:
+    """Process-wide LRU of parsed uploads, bounded by the DataFrames' memory
+
+    Entries are keyed by the hash of the uploaded bytes, so every session uploading the same
+    file shares one DataFrame; callers must not modify it. Streamlit's per-upload `file_id`
+    is remembered too, so a rerun finds its DataFrame without hashing the bytes again.
+    With `compact`, parsed frames are stored compacted (see `compact.compact_frame`) and
+    `report` tells what that saved.
+    """
+
+    def __init__(self, max_bytes: int = 512 << 20, compact: bool = True):
+        self.max_bytes = max_bytes
+        self.compact = compact
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, tuple[pd.DataFrame, int]] = OrderedDict()
+        self._file_ids: dict[str, str] = {}
+        self._reports: dict[str, CompactionReport] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def load(self, upload: Any) -> pd.DataFrame:
+        """The DataFrame of an uploaded CSV (anything with `getvalue()`, e.g. a Streamlit UploadedFile)"""
+        file_id = getattr(upload, "file_id", None)
+        with self._lock:
+            key = self._file_ids.get(file_id) if file_id else None
+            if key is not None and key in self._entries:
+                return self._hit(key)
+
+        data = upload.getvalue()
+        key = content_key(data)
+        with self._lock:
+            if file_id:
+                self._file_ids[file_id] = key
+            if key in self._entries:
+                return self._hit(key)
+            self.misses += 1
+
+        df = parse_csv(data)
+        if self.compact:
+            df, report = compact_frame(df)
+            with self._lock:
+                self._reports[key] = report
+        self.put(key, df)
+        return df
+
+    def report(self, upload: Any) -> CompactionReport | None:
+        """How much compaction saved on a loaded upload, if it was compacted"""
+        file_id = getattr(upload, "file_id", None)
+        with self._lock:
+            key = self._file_ids.get(file_id) if file_id else None
+            return self._reports.get(key) if key is not None and key in self._entries else None
+
+    def put(self, key: str, df: pd.DataFrame) -> None:
+        size = int(df.memory_usage(deep=True).sum())
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries[key][1]
+            self._entries[key] = (df, size)
+            self._entries.move_to_end(key)
+            self._bytes += size
+            # Keep the newest entry even if it alone exceeds the budget
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+            live = set(self._entries)
+            self._file_ids = {file_id: k for file_id, k in self._file_ids.items() if k in live}
+            self._reports = {k: report for k, report in self._reports.items() if k in live}
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._file_ids.clear()
+            self._reports.clear()
+            self._bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict[str, int]:
+        """Hit/miss counters, entries and the memory they hold"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "compaction_saved_bytes": sum(report.saved_bytes for report in self._reports.values()),
+            }
+
+    def _hit(self, key: str) -> pd.DataFrame:
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return self._entries[key][0]
+
+
+# Process-wide cache shared by every Streamlit session; DAPGPT_UPLOAD_CACHE_MB bounds its memory
+upload_cache = UploadCache(max_bytes=int(os.getenv("DAPGPT_UPLOAD_CACHE_MB", "512")) << 20)
@@ -0,0 +1,68 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pandas as pd
+
+from dapgpt.agent import DataAnalysisAgent
+from dapgpt.metrics import MetricsRecorder
+from dapgpt.profile import ProfileCache
+
+
+def rate_limited():
+    request = httpx.Request("POST", "http://mock/chat/completions")
+    return openai.RateLimitError(
+        "rate limited", response=httpx.Response(429, headers={"retry-after": "0"}, request=request), body=None
+    )
+
+
+class FakeClient:
+    """AsyncOpenAI stand-in answering with the query and rate limiting the first `limited` calls"""
+
+    def __init__(self, limited=0):
+        self.limited = limited
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, messages, temperature, max_tokens):
+        self.calls += 1
+        if self.calls <= self.limited:
+            raise rate_limited()
+        await asyncio.sleep(0)
+        query = messages[-1]["content"].rsplit("Query: ", 1)[1]
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=f"answer to {query}"))], usage=None
+        )
+
+
+def make_agent(tmp_path):
+    return DataAnalysisAgent(
+        profile_cache=ProfileCache(directory=tmp_path), response_cache=None, metrics=MetricsRecorder()
+    )
+
+
+def test_analyze_many_answers_in_order_with_each_items_context(tmp_path):
+    agent = make_agent(tmp_path)
+    small = pd.DataFrame({"a": range(3)})
+    wide = pd.DataFrame({f"c{i}": range(50) for i in range(20)})
+    items = [(small, "q0"), (wide, "q1"), (small, "q2")]
+    analyses = asyncio.run(agent.analyze_many(items, max_workers=3, requests_per_minute=60_000, client=FakeClient()))
+    assert [a.answer for a in analyses] == ["answer to q0", "answer to q1", "answer to q2"]
+    assert analyses[0].context.tokens == analyses[2].context.tokens < analyses[1].context.tokens
+    assert agent.last_context is None
+
+
+def test_analyze_many_retries_rate_limits_then_gives_up(tmp_path):
+    agent = make_agent(tmp_path)
+    df = pd.DataFrame({"a": range(3)})
+    client = FakeClient(limited=2)
+    [analysis] = asyncio.run(agent.analyze_many([(df, "q")], max_retries=2, requests_per_minute=60_000, client=client))
+    assert analysis.answer == "answer to q"
+    assert client.calls == 3
+
+    client = FakeClient(limited=10)
+    [analysis] = asyncio.run(agent.analyze_many([(df, "q")], max_retries=2, requests_per_minute=60_000, client=client))
+    assert analysis.answer.startswith("Error during analysis")
+    assert analysis.context is None
+    assert client.calls == 3
@@ -0,0 +1,52 @@
+import time
+
+from langchain_core.outputs import Generation
+
+from dapgpt.cache import ResponseCache, normalize_query
+from dapgpt.langchain_cache import LangChainResponseCache
+
+
+def test_normalize_query_collapses_whitespace_but_keeps_case():
+    assert normalize_query("  rows where\n weather =  Sunny ") == "rows where weather = Sunny"
+    assert normalize_query("weather = Sunny") != normalize_query("weather = sunny")
+
+
+def test_langchain_cache_keys_are_case_sensitive():
+    cache = LangChainResponseCache(ResponseCache())
+    cache.update("Count rows where weather is  Sunny", "llm", [Generation(text="12")])
+    assert cache.lookup("Count rows where weather is Sunny", "llm")[0].text == "12"
+    assert cache.lookup("count rows where weather is sunny", "llm") is None
+    assert cache.lookup("Count rows where weather is Sunny", "other llm") is None
+
+
+def test_response_cache_persists_and_evicts(tmp_path):
+    path = tmp_path / "responses.sqlite"
+    cache = ResponseCache(path, maxsize=1, max_disk_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, key.upper())
+    assert cache.stats()["size"] == 1
+    reopened = ResponseCache(path)
+    assert reopened.get("a") is None
+    assert reopened.get("b") == "B"
+    assert reopened.get("c") == "C"
+
+
+def test_response_cache_expires_entries(tmp_path):
+    cache = ResponseCache(tmp_path / "responses.sqlite", ttl=-1)
+    cache.put("a", "A")
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_memory_hits_keep_disk_entries_from_being_evicted(tmp_path):
+    path = tmp_path / "responses.sqlite"
+    cache = ResponseCache(path, max_disk_entries=2, touch_batch=1)
+    cache.put("a", "A")
+    time.sleep(0.01)
+    cache.put("b", "B")
+    time.sleep(0.01)
+    assert cache.get("a") == "A"
+    cache.put("c", "C")
+    reopened = ResponseCache(path)
+    assert reopened.get("a") == "A"
+    assert reopened.get("b") is None
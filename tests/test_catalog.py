@@ -0,0 +1,90 @@
+import json
+import os
+
+import sqlalchemy as sa
+
+from dapgpt.catalog import CatalogSQLDatabase, SchemaCatalog, catalog_path, invalidate
+from dapgpt.query_cache import QueryResultCache
+from dapgpt.query_guard import QueryGuard
+from dapgpt.sqldb import open_sql_database
+
+
+def make_db(tmp_path):
+    path = tmp_path / "orders.sqlite"
+    engine = sa.create_engine(f"sqlite:///{path}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE orders (id INTEGER, city TEXT)")
+        connection.exec_driver_sql("INSERT INTO orders VALUES (1, 'Athens'), (2, 'Patras')")
+    return engine, catalog_path(path)
+
+
+def test_cached_results_are_dropped_when_another_process_bumps_the_version(tmp_path):
+    engine, path = make_db(tmp_path)
+    SchemaCatalog(path).invalidate("orders")
+    results = QueryResultCache()
+    db = CatalogSQLDatabase(engine, SchemaCatalog(path), results=results)
+    assert db.run("SELECT count(*) AS n FROM orders") == "n\n2"
+    assert db.run("SELECT count(*) AS n FROM orders") == "n\n2"
+    assert results.hits == 1
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO orders VALUES (3, 'Volos')")
+    # Another process bumps the version within the same mtime tick: same mtime, size and inode
+    stat = path.stat()
+    data = json.loads(path.read_text())
+    data["versions"]["orders"] = 2
+    with open(path, "r+") as f:
+        f.write(json.dumps(data, default=str))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert (path.stat().st_mtime_ns, path.stat().st_size, path.stat().st_ino) == (
+        stat.st_mtime_ns,
+        stat.st_size,
+        stat.st_ino,
+    )
+
+    assert db.run("SELECT count(*) AS n FROM orders") == "n\n3"
+
+
+def test_table_info_is_built_once_per_version(tmp_path):
+    engine, path = make_db(tmp_path)
+    catalog = SchemaCatalog(path)
+    db = CatalogSQLDatabase(engine, catalog, results=None)
+    info = db.get_table_info()
+    assert "CREATE TABLE orders" in info
+    assert "id: 2 values, 2 distinct, 1 .. 2" in info
+    assert db.get_table_info() == info
+    assert catalog.stats() == {"hits": 1, "misses": 1, "tables": 1}
+
+    SchemaCatalog(path).invalidate("orders")
+    assert catalog.get("orders") is None
+
+
+def test_open_sql_database_is_reused_until_a_table_is_invalidated(tmp_path):
+    engine, _ = make_db(tmp_path)
+    uri = f"sqlite:///{tmp_path / 'orders.sqlite'}"
+    db = open_sql_database(uri)
+    assert open_sql_database(uri) is db
+    assert db.get_usable_table_names() == ["orders"]
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE cities (name TEXT)")
+    invalidate(tmp_path / "orders.sqlite", "cities")
+    reopened = open_sql_database(uri)
+    assert reopened is not db
+    assert reopened.get_usable_table_names() == ["cities", "orders"]
+
+
+def test_table_info_leaves_out_stats_the_guard_interrupts(tmp_path):
+    engine, path = make_db(tmp_path)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE big (i INTEGER, k INTEGER)")
+        connection.exec_driver_sql(
+            "INSERT INTO big WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 3000000) "
+            "SELECT i, i % 1000 FROM n"
+        )
+    guard = QueryGuard(timeout=0.05)
+    guard.install(engine)
+    db = CatalogSQLDatabase(engine, SchemaCatalog(path), guard=guard, results=None, sample_rows_in_table_info=0)
+    info = db.get_table_info(["big"])
+    assert "CREATE TABLE big" in info
+    assert "Column stats" not in info
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+from dapgpt.compact import compact_column, compact_frame
+
+
+def test_compacted_integers_keep_arithmetic_exact():
+    df = pd.DataFrame({"start": [5, 200, 10], "end": [0, 250, 0], "big": [1, 2, 3_000_000_000]})
+    compacted, report = compact_frame(df)
+    assert compacted["start"].dtype == np.int32
+    assert compacted["big"].dtype == np.int64
+    assert "big" not in report.changes
+    assert (compacted["end"] - compacted["start"]).tolist() == [-5, 50, -10]
+    assert (compacted["start"] * compacted["end"]).tolist() == [0, 50_000, 0]
+    assert compacted["end"].sum() == 250
+
+
+def test_floats_are_narrowed_only_when_lossless():
+    assert compact_column(pd.Series([0.5, 1.25, np.nan])).dtype == np.float32
+    assert compact_column(pd.Series([0.1, 1 / 3])).dtype == np.float64
+
+
+def test_repetitive_text_becomes_categorical():
+    df = pd.DataFrame({"city": ["a", "b"] * 50, "id": [f"row{i}" for i in range(100)]})
+    compacted, report = compact_frame(df)
+    assert isinstance(compacted["city"].dtype, pd.CategoricalDtype)
+    assert not isinstance(compacted["id"].dtype, pd.CategoricalDtype)
+    assert compacted["id"].tolist() == df["id"].tolist()
+    assert report.after_bytes <= report.before_bytes
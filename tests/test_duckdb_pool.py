@@ -0,0 +1,42 @@
+import threading
+
+import sqlalchemy as sa
+
+from dapgpt.duckdb_pool import DuckDBPool
+
+
+def make_pool(tmp_path):
+    pool = DuckDBPool(tmp_path / "pool.duckdb")
+    with pool.writer() as con:
+        con.execute("CREATE TABLE t AS SELECT i FROM range(10) r(i)")
+    return pool
+
+
+def test_connections_on_one_thread_do_not_share_results(tmp_path):
+    pool = make_pool(tmp_path)
+    engine = sa.create_engine("duckdb://", creator=pool.sqlalchemy_connection, poolclass=sa.NullPool)
+    with engine.connect() as first, engine.connect() as second:
+        rows = first.exec_driver_sql("SELECT i FROM t ORDER BY i")
+        assert second.exec_driver_sql("SELECT count(*) FROM t").scalar() == 10
+        assert [i for (i,) in rows] == list(range(10))
+    assert pool.stats()["readers"] == 0
+
+
+def test_concurrent_writers_count_every_write_and_wait(tmp_path):
+    pool = make_pool(tmp_path)
+
+    def write(i):
+        with pool.writer() as con:
+            con.execute("INSERT INTO t VALUES (?)", [100 + i])
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with pool.reader() as cursor:
+        assert cursor.execute("SELECT count(*) FROM t").fetchone() == (18,)
+    stats = pool.stats()
+    assert stats["writes"] == 9
+    assert stats["opens"] == 10
+    pool.close()
@@ -0,0 +1,51 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from dapgpt.history import ChatHistory
+
+
+def recording_summarizer(calls):
+    def summarize(summary, messages):
+        calls.append([message.content for message in messages])
+        return f"{summary}+{len(messages)}"
+
+    return summarize
+
+
+def exchange(history, i, answer="ok"):
+    history.append(HumanMessage(content=f"q{i}"))
+    history.append(AIMessage(content=answer))
+
+
+def test_only_the_last_turns_are_sent_and_older_ones_are_summarized():
+    calls = []
+    history = ChatHistory("system", recording_summarizer(calls), max_turns=2, max_tokens=10_000)
+    for i in range(4):
+        exchange(history, i)
+
+    assert len(history.messages) == 8
+    assert [message.content for message in history.window] == ["q2", "ok", "q3", "ok"]
+    assert calls == [["q0", "ok"], ["q1", "ok"]]
+    prompt = history.prompt_messages()
+    assert isinstance(prompt[1], SystemMessage)
+    assert history.summary in prompt[1].content
+    assert prompt[2:] == history.window
+
+
+def test_the_window_is_also_bounded_by_tokens():
+    calls = []
+    history = ChatHistory("system", recording_summarizer(calls), max_turns=10, max_tokens=200)
+    for i in range(3):
+        exchange(history, i, answer="word " * 100)
+
+    assert history.window[0].content == "q2"
+    assert len(calls) == 2
+
+
+def test_the_latest_exchange_is_kept_even_over_budget():
+    calls = []
+    history = ChatHistory("system", recording_summarizer(calls), max_turns=1, max_tokens=1)
+    exchange(history, 0)
+
+    assert [message.content for message in history.window] == ["q0", "ok"]
+    assert calls == []
+    assert history.prompt_messages()[1:] == history.window
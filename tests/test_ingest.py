@@ -0,0 +1,72 @@
+import sqlite3
+
+import duckdb
+import pyarrow as pa
+import pyarrow.compute as pc
+import pytest
+
+from dapgpt import ingest
+from dapgpt.schemas import DATASETS
+
+SPEC = DATASETS["amazon"]
+HEADER = ",".join(column.source for column in SPEC.columns)
+
+
+def extract(tmp_path, name, orders):
+    """A daily amazon extract with one row per (order id, order date)"""
+    lines = [HEADER] + [
+        f"{order_id},30,4.5,22.7,75.8,22.8,75.9,{date},11:30:00,11:45:00,Sunny,Low,motorcycle,Urban,120,Books"
+        for order_id, date in orders
+    ]
+    path = tmp_path / name
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+def insert(con, table):
+    values = [pc.cast(c, pa.string()) if pa.types.is_date(c.type) or pa.types.is_time(c.type) else c for c in table.columns]
+    placeholders = ", ".join("?" * table.num_columns)
+    con.executemany(f"INSERT INTO amazon VALUES ({placeholders})", list(zip(*(c.to_pylist() for c in values))))
+
+
+@pytest.fixture(params=["duckdb", "sqlite"])
+def con(request):
+    con = duckdb.connect() if request.param == "duckdb" else sqlite3.connect(":memory:")
+    con.execute(SPEC.ddl(request.param))
+    yield con
+    con.close()
+
+
+def load(con, path):
+    pending = ingest.pending_files(con, "amazon", [path])
+    if not pending:
+        return 0
+    table, _ = SPEC.pipeline.run(path)
+    table = ingest.new_rows(con, "amazon", table, chunk_size=7)
+    insert(con, table)
+    ingest.record_file(con, "amazon", path, pending[0][1], table.num_rows)
+    return table.num_rows
+
+
+def test_overlapping_extracts_load_every_new_key_once(con, tmp_path):
+    day1 = extract(tmp_path, "day1.csv", [(f"a{i}", "2022-03-02") for i in range(20)])
+    assert load(con, day1) == 20
+    assert ingest.watermark(con, "amazon") == "2022-03-02"
+
+    # Day 2 repeats day 1 and adds new orders, some of them late arrivals dated before the watermark
+    late = [(f"b{i}", "2022-03-01") for i in range(15)]
+    fresh = [(f"c{i}", "2022-03-03") for i in range(5)]
+    day2 = extract(tmp_path, "day2.csv", [(f"a{i}", "2022-03-02") for i in range(20)] + late + fresh + fresh[:2])
+    assert load(con, day2) == 20
+    (rows, keys) = con.execute("SELECT count(*), count(DISTINCT order_id) FROM amazon").fetchone()
+    assert rows == keys == 40
+
+
+def test_rerunning_a_loaded_file_is_a_no_op(con, tmp_path):
+    day1 = extract(tmp_path, "day1.csv", [("a1", "2022-03-02"), ("a2", "2022-03-02")])
+    assert load(con, day1) == 2
+    assert load(con, day1) == 0
+    copy = tmp_path / "copy.csv"
+    copy.write_bytes(day1.read_bytes())
+    assert load(con, copy) == 0
+    assert con.execute("SELECT count(*) FROM amazon").fetchone() == (2,)
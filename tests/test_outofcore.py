@@ -0,0 +1,83 @@
+import gc
+import io
+from collections import OrderedDict
+
+import pandas as pd
+import pytest
+
+from dapgpt import outofcore
+from dapgpt.outofcore import open_upload
+
+CSV = b"""id,city,amount,rating,ordered
+0x1f,Athens,10,4.5,2022-03-01
+0x20,Patras,20,NaN,2022-03-02
+0x21,Athens,30,3.0,2022-03-03
+0x22,,40,5.0,2022-03-04
+"""
+
+
+class Upload(io.BytesIO):
+    """Stand-in for Streamlit's UploadedFile"""
+
+    def __init__(self, data, file_id):
+        super().__init__(data)
+        self.file_id = file_id
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    monkeypatch.setattr(outofcore, "_datasets", OrderedDict())
+    monkeypatch.setattr(outofcore, "_file_ids", {})
+    yield
+    for dataset in outofcore._datasets.values():
+        dataset.close()
+
+
+def test_open_upload_reads_like_pandas(tmp_path):
+    dataset = open_upload(Upload(CSV, "a"), tmp_path)
+    expected = pd.read_csv(io.BytesIO(CSV))
+    assert dataset.shape == expected.shape
+    assert dataset.dtypes["id"] == "VARCHAR"
+    assert dataset.dtypes["amount"] == "BIGINT"
+    assert dataset.dtypes["ordered"] == "VARCHAR"
+    assert dataset.head(2)["id"].tolist() == ["0x1f", "0x20"]
+
+    stats = dataset.column_stats()
+    assert stats["amount"]["mean"] == expected["amount"].mean()
+    assert stats["rating"]["count"] == expected["rating"].count()
+    assert stats["city"]["top"] == "Athens"
+    assert stats["city"]["freq"] == 2
+    assert stats["city"]["unique"] == 2
+
+    profile = dataset.profile(sample_size=2)
+    assert profile.shape == expected.shape
+    assert len(pd.read_csv(io.StringIO(profile.sample))) == 2
+
+
+def test_open_upload_shares_datasets_by_file_id_and_content(tmp_path):
+    dataset = open_upload(Upload(CSV, "a"), tmp_path)
+    assert open_upload(Upload(b"", "a"), tmp_path) is dataset
+    assert open_upload(Upload(CSV, "b"), tmp_path) is dataset
+    assert len(list(tmp_path.glob("*.csv"))) == 1
+
+
+def test_evicted_upload_keeps_working_until_released(tmp_path, monkeypatch):
+    monkeypatch.setattr(outofcore, "MAX_OPEN_UPLOADS", 1)
+    first = open_upload(Upload(CSV, "a"), tmp_path)
+    first_path = first.path
+    second = open_upload(Upload(CSV + b"0x23,Volos,50,1.0,2022-03-05\n", "b"), tmp_path)
+    assert second.shape == (5, 5)
+    assert list(outofcore._datasets) == [second.fingerprint]
+    assert list(outofcore._file_ids) == ["b"]
+    # Still held (by another session, a prefetch, a stream), so still queryable
+    assert first_path.exists()
+    assert first.head()["id"].tolist() == ["0x1f", "0x20", "0x21", "0x22"]
+
+    # Opening the same content again revives the evicted dataset instead of replacing its file
+    assert open_upload(Upload(CSV, "c"), tmp_path) is first
+    second_path = second.path
+    assert second_path.exists()
+    del second
+    gc.collect()
+    assert not second_path.exists()
+    assert list(tmp_path.glob("*.csv")) == [first_path]
@@ -0,0 +1,58 @@
+import threading
+
+import pandas as pd
+
+from dapgpt.prefetch import ProfilePrefetcher
+from dapgpt.profile import build_profile
+
+
+class FakeAgent:
+    token_budget = 500
+    model = "gpt-4"
+
+    def __init__(self, gate=None):
+        self.gate = gate
+        self.profiled = []
+
+    def _profile(self, data):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.profiled.append(data)
+        return build_profile(data)
+
+
+def frame():
+    return pd.DataFrame({"price": [1.5, 2.0, 3.25], "city": ["a", "b", "a"]})
+
+
+def test_sessions_submitting_the_same_dataset_share_one_profile():
+    prefetcher = ProfilePrefetcher(max_workers=2)
+    agent = FakeAgent()
+    df = frame()
+    first = prefetcher.submit(agent, df)
+    second = prefetcher.submit(agent, df)
+    assert first is second
+    assert prefetcher.result(first, timeout=5).shape == (3, 2)
+    assert agent.profiled == [df]
+    stats = prefetcher.stats()
+    assert (stats["submitted"], stats["shared"], stats["missed"]) == (1, 1, 0)
+    assert stats["ready"] + stats["waited"] == 1
+
+
+def test_a_queued_prefetch_is_cancelled_once_no_session_waits_for_it():
+    gate = threading.Event()
+    prefetcher = ProfilePrefetcher(max_workers=1)
+    agent = FakeAgent(gate)
+    busy, queued = frame(), frame()
+    running = prefetcher.submit(agent, busy)
+    future = prefetcher.submit(agent, queued)
+    assert prefetcher.submit(agent, queued) is future
+
+    assert not prefetcher.cancel(future)
+    assert prefetcher.cancel(future)
+    gate.set()
+    assert prefetcher.result(future) is None
+    assert prefetcher.result(running, timeout=5) is not None
+    assert agent.profiled == [busy]
+    stats = prefetcher.stats()
+    assert (stats["cancelled"], stats["missed"]) == (1, 1)
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from dapgpt.profile import ProfileCache, fingerprint
+
+
+def make_frame(n=100_000):
+    return pd.DataFrame({"a": np.arange(n), "b": np.linspace(0, 1, n), "c": np.where(np.arange(n) % 2, "x", "y")})
+
+
+def test_fingerprint_is_stable_for_equal_content():
+    assert fingerprint(make_frame()) == fingerprint(make_frame())
+
+
+def test_fingerprint_changes_when_any_value_is_edited():
+    df = make_frame()
+    before = fingerprint(df)
+    df.loc[5, "b"] = 1e9
+    assert fingerprint(df) != before
+
+
+def test_fingerprint_changes_with_dtypes_and_columns():
+    df = make_frame(100)
+    assert fingerprint(df.astype({"a": "int32"})) != fingerprint(df)
+    assert fingerprint(df.rename(columns={"a": "z"})) != fingerprint(df)
+
+
+def test_profile_cache_recomputes_after_an_edit(tmp_path):
+    cache = ProfileCache(directory=tmp_path)
+    df = make_frame(1000)
+    first = cache.get_or_compute(df)
+    assert cache.get_or_compute(df) is first
+    df.loc[5, "b"] = 1e9
+    edited = cache.get_or_compute(df)
+    assert edited.fingerprint != first.fingerprint
+    assert edited.stats["b"]["max"] == 1e9
+    assert cache.misses == 2
+    assert ProfileCache(directory=tmp_path).get(first.key) == first
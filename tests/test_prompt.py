@@ -0,0 +1,17 @@
+import pandas as pd
+
+from dapgpt import prompt
+from dapgpt.profile import build_profile
+
+
+def test_baseline_tokens_are_counted_only_when_read(monkeypatch):
+    profile = build_profile(pd.DataFrame({"price": [1.5, 2.0, 3.25], "city": ["a", "b", "a"]}))
+    calls = []
+    baseline = prompt.baseline_tokens
+    monkeypatch.setattr(prompt, "baseline_tokens", lambda *args: calls.append(args) or baseline(*args))
+
+    context = prompt.build_context(profile, "price by city")
+    assert calls == []
+    assert context.saved_tokens == max(0, context.baseline_tokens - context.tokens)
+    assert context.baseline_tokens > 0
+    assert len(calls) == 1
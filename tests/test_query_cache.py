@@ -0,0 +1,9 @@
+from dapgpt.query_cache import is_single_statement
+
+
+def test_semicolons_in_quoted_text_dont_split_statements():
+    assert is_single_statement("SELECT * FROM orders WHERE note = 'a;b';")
+    assert is_single_statement('SELECT "odd;name" FROM orders')
+    assert is_single_statement("SELECT 'it''s; fine'")
+    assert not is_single_statement("SELECT 1; DROP TABLE orders")
+    assert not is_single_statement("SELECT ';'; DELETE FROM orders")
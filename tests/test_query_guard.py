@@ -0,0 +1,79 @@
+import time
+
+import pytest
+import sqlalchemy as sa
+
+from dapgpt.query_guard import GuardedSQLDatabase, QueryGuard, QueryRejected
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sa.create_engine(f"duckdb:///{tmp_path / 'guard.duckdb'}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE big AS SELECT i AS x, i % 7 AS y FROM range(100000) t(i)")
+        connection.exec_driver_sql("CREATE TABLE small AS SELECT i AS k FROM range(1000) t(i)")
+    return engine
+
+
+def test_group_by_over_table_larger_than_budget_is_allowed(engine):
+    guard = QueryGuard(max_estimated_rows=10_000)
+    decision = guard.decide(engine, "SELECT y, avg(x) FROM big GROUP BY y", limit=False)
+    assert decision.action == "allow"
+    assert decision.estimated_rows < 10_000
+
+
+def test_aggregate_and_top_n_over_large_table_are_allowed(engine):
+    guard = QueryGuard(max_estimated_rows=10_000)
+    assert guard.decide(engine, "SELECT count(*) FROM big", limit=False).action == "allow"
+    assert guard.decide(engine, "SELECT x FROM big ORDER BY x DESC LIMIT 10", limit=False).action == "allow"
+
+
+def test_cross_product_over_budget_is_rejected(engine):
+    guard = QueryGuard(max_estimated_rows=10_000)
+    with pytest.raises(QueryRejected):
+        guard.review(engine, "SELECT count(*) FROM big, small")
+
+
+def test_result_over_budget_is_rejected_unless_limited(engine):
+    guard = QueryGuard(max_estimated_rows=10_000, max_result_rows=100)
+    assert guard.decide(engine, "SELECT * FROM big").action == "limit"
+    assert guard.decide(engine, "SELECT * FROM big", limit=False).action == "reject"
+
+
+def test_timeout_covers_streaming_the_result(engine):
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE large AS SELECT i AS x FROM range(5000000) t(i)")
+    guard = QueryGuard(max_estimated_rows=None, max_result_rows=None, timeout=0.1)
+    guard.install(engine)
+    db = GuardedSQLDatabase(engine, guard=guard)
+    # DuckDB computes the projection while the summary fetches its batches, after execute returned
+    with pytest.raises(QueryRejected, match="interrupted"):
+        db.run("SELECT x, md5(x::VARCHAR) AS h FROM large")
+    with pytest.raises(QueryRejected, match="interrupted"):
+        db.run_arrow("SELECT x, md5(x::VARCHAR) AS h FROM large")
+    assert db.run("SELECT count(*) AS n FROM large") == "n\n5000000"
+
+
+def test_timeout_stops_once_the_result_is_fetched(engine):
+    guard = QueryGuard(max_estimated_rows=None, timeout=0.05)
+    guard.install(engine)
+    with guard.connect(engine) as connection:
+        assert connection.exec_driver_sql("SELECT count(*) FROM big").scalar() == 100000
+        info = connection.info
+        timer = info["query_guard_timer"]
+    assert "query_guard_timer" not in info
+    timer.join(1)
+    assert not timer.is_alive()
+    assert "query_guard_timed_out" not in info
+
+
+def test_timeout_on_an_idle_connection_does_not_mislabel_later_errors(engine):
+    guard = QueryGuard(max_estimated_rows=None, timeout=0.05)
+    guard.install(engine)
+    with engine.connect() as connection:
+        connection.exec_driver_sql("SELECT 1").fetchall()
+        time.sleep(0.2)
+        with pytest.raises(sa.exc.SQLAlchemyError) as error:
+            connection.exec_driver_sql("SELECT * FROM missing")
+        assert not isinstance(error.value, QueryRejected)
+        assert connection.exec_driver_sql("SELECT count(*) FROM small").scalar() == 1000
@@ -0,0 +1,38 @@
+import asyncio
+
+from dapgpt.ratelimit import TokenBucket, backoff_delay
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_bucket_allows_a_burst_then_paces_at_its_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=3, clock=clock, sleep=clock.sleep)
+
+    async def acquire_all(n):
+        starts = []
+        for _ in range(n):
+            await bucket.acquire()
+            starts.append(clock.now)
+        return starts
+
+    assert asyncio.run(acquire_all(5)) == [0.0, 0.0, 0.0, 0.5, 1.0]
+    # Idle time refills the bucket, but never beyond its capacity
+    clock.now += 10
+    assert asyncio.run(acquire_all(4)) == [11.0, 11.0, 11.0, 11.5]
+
+
+def test_backoff_grows_exponentially_up_to_the_cap():
+    for attempt in range(10):
+        assert 0 <= backoff_delay(attempt, base=1.0, cap=8.0) <= min(8.0, 2**attempt)
@@ -0,0 +1,72 @@
+import pyarrow as pa
+import pytest
+import sqlalchemy as sa
+
+from dapgpt.prompt import count_tokens
+from dapgpt.query_guard import GuardedSQLDatabase
+from dapgpt.results import ResultConversionError, ResultSummary, fetch_arrow, fetch_batches
+
+
+@pytest.fixture(params=["duckdb", "sqlite"])
+def engine(request, tmp_path):
+    engine = sa.create_engine(f"{request.param}:///{tmp_path / 'results.db'}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE t (x INTEGER, name VARCHAR)")
+        connection.exec_driver_sql("INSERT INTO t VALUES (1, 'a'), (2, 'b'), (3, NULL)")
+    return engine
+
+
+def test_fetch_arrow_from_engine_or_connection(engine):
+    table = fetch_arrow(engine, "SELECT x, name FROM t ORDER BY x")
+    assert table.column_names == ["x", "name"]
+    assert table.to_pydict() == {"x": [1, 2, 3], "name": ["a", "b", None]}
+    with engine.connect() as connection:
+        assert fetch_arrow(connection, "SELECT x, name FROM t ORDER BY x").equals(table)
+
+
+def test_summary_aggregates_across_batches():
+    batches = (pa.record_batch({"x": list(range(i, i + 100)), "s": ["v"] * 100}) for i in range(0, 1000, 100))
+    summary = ResultSummary.from_batches(batches, keep_rows=150)
+    assert summary.rows == 1000
+    assert summary.table().num_rows == 150
+    assert summary.stats["x"] == {"count": 1000, "min": 0, "max": 999, "sum": sum(range(1000))}
+
+    text = summary.to_text(max_tokens=200)
+    assert text.startswith("1000 rows x 2 columns")
+    assert "x|int64|1000|0|999|499.5" in text
+    assert count_tokens(text) <= 200
+
+
+def test_small_summary_lists_the_whole_result():
+    summary = ResultSummary.from_batches(iter([pa.record_batch({"n": [3], "name": ["a|b"]})]))
+    assert summary.to_text() == "n|name\n3|a/b"
+
+
+@pytest.fixture
+def sqlite_engine(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'results.sqlite'}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE t (i INTEGER, x, late TEXT)")
+        connection.exec_driver_sql("INSERT INTO t VALUES (1, 1, NULL), (2, 'a', NULL), (3, 2.5, 'z'), (4, NULL, 'y')")
+    return engine
+
+
+def test_sqlite_columns_keep_one_type_across_batches(sqlite_engine):
+    # x mixes integers, text and reals; late is NULL throughout the first batch
+    batches = list(fetch_batches(sqlite_engine, "SELECT x, late FROM t ORDER BY i", batch_size=2))
+    assert len(batches) == 2
+    table = pa.Table.from_batches(batches)
+    assert table.schema.types == [pa.string(), pa.string()]
+    assert table.to_pydict() == {"x": ["1", "a", "2.5", None], "late": [None, None, "z", "y"]}
+
+
+def test_sqlite_values_that_dont_fit_the_inferred_type_raise_a_sqlalchemy_error(sqlite_engine):
+    with pytest.raises(ResultConversionError):
+        list(fetch_batches(sqlite_engine, "SELECT x FROM t WHERE x IS NOT NULL ORDER BY i", batch_size=1))
+    with sqlite_engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE big AS WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 70000) "
+            "SELECT i, CASE WHEN i = 70000 THEN 'text' ELSE i END AS x FROM n"
+        )
+    db = GuardedSQLDatabase(sqlite_engine)
+    assert db.run_no_throw("SELECT x FROM big ORDER BY i").startswith("Error:")
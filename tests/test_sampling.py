@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dapgpt.sampling import sample_rows
+
+
+@pytest.mark.parametrize("strategy", ["reservoir", "stratified", "outliers"])
+def test_empty_frame_keeps_its_schema(strategy):
+    df = pd.DataFrame({"a": pd.Series([], dtype="int64"), "b": pd.Series([], dtype="object")})
+    sample = sample_rows(df, strategy=strategy)
+    assert sample.empty
+    assert sample.dtypes.to_dict() == df.dtypes.to_dict()
+
+
+def test_outliers_include_each_columns_extremes():
+    df = pd.DataFrame({"x": np.arange(1000), "y": np.sin(np.arange(1000))})
+    sample = sample_rows(df, n=10, strategy="outliers")
+    assert {0, 999, int(df["y"].idxmin()), int(df["y"].idxmax())} <= set(sample.index)
+    assert list(sample.index) == sorted(sample.index)
+
+
+def test_chunked_sampling_is_reproducible():
+    df = pd.DataFrame({"x": np.arange(1000), "c": ["a", "b", "c", "d"] * 250})
+    first = sample_rows(df, n=8, strategy="stratified", seed=3, chunksize=128)
+    again = sample_rows((df.iloc[i : i + 128] for i in range(0, 1000, 128)), n=8, strategy="stratified", seed=3)
+    assert first.equals(again)
+    assert set(first["c"]) == {"a", "b", "c", "d"}
@@ -0,0 +1,22 @@
+import io
+
+import pandas as pd
+
+from dapgpt.uploads import parse_csv
+
+CSV = b"""id,price,qty,flag,when,code,note
+1,1.5,3,True,2024-01-02,0x1f,a
+2,,4,False,2024-01-03,0x20,NA
+3,2.25,,true,2024-01-04,7,"x, y"
+"""
+
+
+def test_parse_csv_matches_pandas():
+    parsed = parse_csv(CSV)
+    expected = pd.read_csv(io.BytesIO(CSV))
+    assert list(parsed.dtypes) == list(expected.dtypes)
+    pd.testing.assert_frame_equal(parsed, expected, check_dtype=False)
+
+
+def test_parse_csv_without_rows_keeps_the_columns():
+    assert list(parse_csv(b"a,b\n").columns) == ["a", "b"]